@@ -3,9 +3,21 @@ from __future__ import annotations
 
 import os
 import json
+import time
+import queue
+import atexit
 import threading
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Iterable, Optional
+from typing import Any, Callable, Dict, List, Iterable, Iterator, Optional
+
+try:
+    from agent import activity_segments as segments
+    from agent.activity_rollups import apply_events as _apply_rollups
+except Exception:  # pragma: no cover
+    import activity_segments as segments
+    from activity_rollups import apply_events as _apply_rollups
 
 # Pfad via ENV überschreibbar (kompatibel zu deiner bisherigen Lösung)
 LOG_FILE = os.getenv("ACTIVITY_LOG_FILE", "activity_log.jsonl")
@@ -13,6 +25,17 @@ LOG_FILE = os.getenv("ACTIVITY_LOG_FILE", "activity_log.jsonl")
 # einfacher Prozess-weiter Lock für parallele Writes
 _LOCK = threading.Lock()
 
+# Gepuffertes Schreiben: log_event() legt die fertige Zeile in eine Queue, ein Hintergrund-Thread
+# schreibt gesammelt (ein write() pro Batch) und aktualisiert die Rollups in einer Transaktion.
+# ACTIVITY_LOG_ASYNC=0 → synchron wie früher.
+LOG_ASYNC = os.getenv("ACTIVITY_LOG_ASYNC", "1").lower() not in ("0", "false", "no")
+LOG_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", "0.5"))
+# "never" (Default) | "always" (fsync nach jedem Batch) | "interval" (höchstens alle ACTIVITY_LOG_FSYNC_INTERVAL s)
+LOG_FSYNC = os.getenv("ACTIVITY_LOG_FSYNC", "never").lower()
+LOG_FSYNC_INTERVAL = float(os.getenv("ACTIVITY_LOG_FSYNC_INTERVAL", "5.0"))
+LOG_QUEUE_MAX = int(os.getenv("ACTIVITY_LOG_QUEUE_MAX", "10000"))
+LOG_SEGMENT_CACHE = int(os.getenv("ACTIVITY_LOG_SEGMENT_CACHE", "4"))  # geparste rotierte Segmente im LRU
+
 # Minimal-Schema, das das Admin-Dashboard typischerweise erwartet
 _EXPECTED_KEYS: Iterable[str] = (
     "type", "timestamp", "customer_id", "task",
@@ -41,7 +64,7 @@ def _normalize_event(e: Dict[str, Any]) -> Dict[str, Any]:
         out.setdefault(k, None)
 
     # Token-Felder in ints konvertieren, wenn möglich
-    for k in ("input_tokens", "output_tokens"):
+    for k in ("input_tokens", "output_tokens", "cached_tokens"):
         if out.get(k) is not None:
             try:
                 out[k] = int(out[k])
@@ -50,73 +73,399 @@ def _normalize_event(e: Dict[str, Any]) -> Dict[str, Any]:
                 out[k] = None
     return out
 
+_STOP = ("", None)  # Sentinel für den Writer-Thread
+
+def _is_marker(item: tuple) -> bool:
+    """flush()-Marker: ("", threading.Event) – wird nach dem Schreiben des Batches gesetzt."""
+    return isinstance(item[1], threading.Event)
+_last_fsync = 0.0
+
+def _write_batch(items: List[tuple]) -> None:
+    """Zeilen in einem write() anhängen (O_APPEND → kein Verschachteln mit anderen Prozessen)."""
+    global _last_fsync
+    if not items:
+        return
+    _ensure_parent_dir(LOG_FILE)
+    data = "".join(line for line, _ in items).encode("utf-8")
+    with _LOCK:
+        with segments.log_lock(LOG_FILE):
+            # Tages-/Größenrotation in komprimierte Segmente (agent/activity_segments.py)
+            segments.maybe_rotate(LOG_FILE)
+            fd = os.open(LOG_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+                now = time.monotonic()
+                if LOG_FSYNC == "always" or (LOG_FSYNC == "interval" and now - _last_fsync >= LOG_FSYNC_INTERVAL):
+                    os.fsync(fd)
+                    _last_fsync = now
+            finally:
+                os.close(fd)
+            # Write-time Rollups fürs Dashboard (Sidecar-Store, siehe agent/activity_rollups.py);
+            # unter beiden Locks, damit ein Neuaufbau (writes_paused, auch aus einem anderen Prozess)
+            # keine parallel geschriebenen Zeilen doppelt zählt.
+            # apply_events wartet nie auf den Rollup-Lock – sonst Deadlock mit einem laufenden Neuaufbau
+            _apply_rollups([record for _, record in items])
+
+@contextmanager
+def writes_paused() -> Iterator[None]:
+    """Hält die Schreib-Batches aller Prozesse an (z. B. für einen konsistenten Rollup-Neuaufbau).
+
+    Hält _LOCK und den exklusiven Log-Lock. Innerhalb des Blocks weder log_event() im synchronen
+    Modus noch flush() aufrufen und nur mit iter_events(flush_first=False, lock=False) lesen.
+    """
+    with _LOCK:
+        with segments.log_lock(LOG_FILE):
+            yield
+
+class BufferedWriter:
+    """Queue + Hintergrund-Thread vor einer Schreibfunktion (Batch von (zeile, record)-Tupeln).
+
+    flush() wartet, bis alles bis dahin Eingereihte geschrieben ist. Pro Prozess ein Thread (nach
+    fork() neu gestartet); beim Beenden wird der Rest synchron geschrieben. Auch von agent.tracing genutzt.
+    """
+
+    def __init__(self, write_batch: Callable[[List[tuple]], None], name: str) -> None:
+        self.write_batch = write_batch
+        self.name = name
+        self.pid = -1
+        self.queue: "queue.Queue[tuple]" = queue.Queue(maxsize=LOG_QUEUE_MAX)
+        self.wake = threading.Event()
+        self.stopped = False
+        self.thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            # nach fork() existiert der Thread im Kindprozess nicht → frische Queue + neuer Thread
+            if self.pid == os.getpid() and not self.stopped:
+                return
+            self.pid = os.getpid()
+            self.queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+            self.wake = threading.Event()
+            self.stopped = False
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+            try:
+                # multiprocessing-Kinder enden per os._exit() ohne atexit → dort über Finalize flushen
+                from multiprocessing import util as mp_util
+                mp_util.Finalize(None, self.shutdown, exitpriority=100)
+            except Exception:  # pragma: no cover
+                pass
+
+    def _run(self) -> None:
+        q, wake = self.queue, self.wake
+        while True:
+            first = q.get()
+            # Flush-Intervall abwarten (oder früher bei flush()/Shutdown/voller Queue) und dann alles mitnehmen
+            wake.wait(LOG_FLUSH_INTERVAL)
+            wake.clear()
+            batch = [first]
+            while True:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            items = [item for item in batch if item is not _STOP and not _is_marker(item)]
+            try:
+                self.write_batch(items)
+            except Exception:
+                pass  # Logging darf nie den Request kaputt machen
+            finally:
+                for item in batch:
+                    if _is_marker(item):
+                        item[1].set()
+                    q.task_done()
+            if any(item is _STOP for item in batch):
+                return
+
+    def put(self, item: tuple) -> None:
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.wake.set()
+            self.queue.put(item)  # Rückstau statt Verlust
+        if self.queue.qsize() >= LOG_QUEUE_MAX // 2:
+            self.wake.set()
+
+    def flush(self) -> None:
+        """Wartet, bis alle gepufferten Zeilen geschrieben sind (no-op ohne laufenden Thread)."""
+        thread = self.thread
+        if thread is None or self.pid != os.getpid() or self.stopped:
+            return
+        if threading.current_thread() is thread:
+            return  # Aufruf aus dem Writer selbst – das Warten auf den Marker würde sich selbst blockieren
+        # Marker statt queue.join(): bei Dauerlast würde join() nie zurückkehren
+        done = threading.Event()
+        self.put(("", done))
+        self.wake.set()
+        while not done.wait(1.0):
+            if not thread.is_alive():
+                return
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Thread stoppen und den Rest synchron schreiben (atexit / Prozessende)."""
+        if self.thread is None or self.pid != os.getpid() or self.stopped:
+            return
+        self.stopped = True
+        self.queue.put(_STOP)
+        self.wake.set()
+        self.thread.join(timeout)
+        rest = []
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if _is_marker(item):
+                item[1].set()
+            elif item is not _STOP:
+                rest.append(item)
+        self.write_batch(rest)
+
+_writer = BufferedWriter(_write_batch, "activity-log-writer")
+
+def flush() -> None:
+    """Wartet, bis alle gepufferten Events geschrieben sind (no-op im synchronen Modus)."""
+    _writer.flush()
+
 def log_event(event: Dict[str, Any]) -> None:
     """
     Hängt ein Event (task_run, usage, rating, feedback, ...) als JSONL-Zeile an.
     - Beibehaltung deiner bisherigen Signatur & ENV-Handling
     - Ergänzt robusten UTC-Timestamp und Schema-Normalisierung
+    - Nicht blockierend: serialisiert wird sofort, geschrieben gebündelt im Hintergrund (LOG_ASYNC)
     """
     record = _normalize_event({**event, "timestamp": _now_iso_utc()})
-    _ensure_parent_dir(LOG_FILE)
-    with _LOCK:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    item = (json.dumps(record, ensure_ascii=False) + "\n", record)
+    if LOG_ASYNC:
+        _writer.put(item)
+    else:
+        _write_batch([item])
+
+# Inkrementeller Leser: merkt sich Byte-Offset + bereits geparste Events der Logdatei und
+# parst beim nächsten Aufruf nur neu angehängte Zeilen. Rotation (neuer Inode) oder Kürzen
+# (Datei kleiner als Offset bzw. anderer Dateianfang) → kompletter Neuaufbau.
+# Rotierte Segmente sind unveränderlich; für get_events() ohne Filter bleiben die zuletzt genutzten
+# ACTIVITY_LOG_SEGMENT_CACHE Segmente geparst im Speicher (LRU), alle anderen werden gestreamt.
+_READ_LOCK = threading.Lock()
+_HEAD_BYTES = 64
+_tail: Dict[str, Any] = {"path": None, "inode": None, "offset": 0, "head": b"", "events": []}
+_segment_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+def parse_line(raw: bytes) -> Optional[Dict[str, Any]]:
+    """Eine JSONL-Zeile → normalisiertes Event (None bei Leer-/defekter Zeile)."""
+    line = raw.strip()
+    if not line:
+        return None
+    try:
+        obj = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        # defekte Zeile ignorieren
+        return None
+    return _normalize_event(obj)
+
+def _refresh_tail() -> List[Dict[str, Any]]:
+    try:
+        st = os.stat(LOG_FILE)
+    except FileNotFoundError:
+        _tail.update(path=LOG_FILE, inode=None, offset=0, head=b"", events=[])
+        return _tail["events"]
+    with open(LOG_FILE, "rb") as f:
+        head = f.read(_HEAD_BYTES)
+        known = _tail["head"]
+        rotated = (
+            _tail["path"] != LOG_FILE
+            or _tail["inode"] != st.st_ino
+            or st.st_size < _tail["offset"]
+            or head[: len(known)] != known
+        )
+        if rotated:
+            _tail.update(path=LOG_FILE, inode=st.st_ino, offset=0, head=b"", events=[])
+        if st.st_size == _tail["offset"]:
+            return _tail["events"]
+        f.seek(_tail["offset"])
+        data = f.read(st.st_size - _tail["offset"])
+    # nur vollständige Zeilen übernehmen; ein halb geschriebener Rest wird beim nächsten Mal gelesen
+    end = data.rfind(b"\n") + 1
+    for raw in data[:end].splitlines():
+        event = parse_line(raw)
+        if event is not None:
+            _tail["events"].append(event)
+    _tail["offset"] += end
+    if len(_tail["head"]) < _HEAD_BYTES:
+        _tail["head"] = head[: min(_HEAD_BYTES, _tail["offset"])]
+    return _tail["events"]
 
-def get_events() -> List[Dict[str, Any]]:
+def _iter_segment(segment: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    cached = _segment_cache.get(segment["file"])
+    if cached is not None:
+        yield from cached
+        return
+    try:
+        f = segments.open_segment(LOG_FILE, segment)
+    except FileNotFoundError:
+        return  # inzwischen per Aufbewahrungsfrist entfernt
+    with f:
+        for raw in f:
+            event = parse_line(raw)
+            if event is not None:
+                yield event
+
+def _matches(event: Dict[str, Any], lo: Optional[str], hi: Optional[str], type: Optional[str], customer_id: Optional[str]) -> bool:
+    return (
+        segments.in_range(event.get("timestamp"), lo, hi)
+        and (type is None or event.get("type") == type)
+        and (customer_id is None or event.get("customer_id") == customer_id)
+    )
+
+def get_events(
+    start: Any = None,
+    end: Any = None,
+    type: Optional[str] = None,
+    customer_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
-    Liest alle Events aus der JSONL-Logdatei.
+    Liest die Events aus den rotierten Segmenten + der aktuellen JSONL-Logdatei.
     - Überspringt defekte Zeilen
     - Normalisiert Events (fehlende Keys, Timestamp etc.)
+    - start/end (datetime, Datum oder ISO-String; Datum = ganzer Tag inklusive), type, customer_id:
+      es werden nur Segmente geöffnet, deren Manifest-Eintrag zur Abfrage passt
+    - Inkrementell: nur seit dem letzten Aufruf angehängte Zeilen werden geparst
+      (Liste ist eine Kopie, die Event-Dicts werden zwischen Aufrufen geteilt → nicht verändern)
     """
-    events: List[Dict[str, Any]] = []
-    if not os.path.exists(LOG_FILE):
-        return events
+    flush()  # eigene, noch gepufferte Events mitlesen
+    lo, hi = segments.bounds(start, end)
+    with _READ_LOCK:
+        # geteilter Lock: Manifest und aktives Log stammen aus demselben Stand (keine Rotation dazwischen)
+        with segments.log_lock(LOG_FILE, shared=True):
+            manifest = segments.load_manifest(LOG_FILE)
+            active = list(_refresh_tail())
+        if lo is None and hi is None and type is None and customer_id is None:
+            names = {seg["file"] for seg in manifest}
+            for name in [n for n in _segment_cache if n not in names]:
+                del _segment_cache[name]
+            out: List[Dict[str, Any]] = []
+            for seg in manifest:
+                events = _segment_cache.get(seg["file"])
+                if events is None:
+                    events = list(_iter_segment(seg))
+                    if LOG_SEGMENT_CACHE > 0:
+                        _segment_cache[seg["file"]] = events
+                else:
+                    _segment_cache.move_to_end(seg["file"])
+                while len(_segment_cache) > LOG_SEGMENT_CACHE:
+                    _segment_cache.popitem(last=False)
+                out.extend(events)
+            return out + active
+        out = []
+        for seg in segments.select(manifest, lo, hi, type, customer_id):
+            out.extend(e for e in _iter_segment(seg) if _matches(e, lo, hi, type, customer_id))
+        return out + [e for e in active if _matches(e, lo, hi, type, customer_id)]
 
-    with _LOCK:
-        with open(LOG_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    obj = json.loads(line)
-                except json.JSONDecodeError:
-                    # defekte Zeile ignorieren
-                    continue
-                events.append(_normalize_event(obj))
-    return events
+def iter_events(
+    start: Any = None,
+    end: Any = None,
+    type: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    flush_first: bool = True,
+    lock: bool = True,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streamt die Events (Segmente, dann aktuelle Logdatei) zeilenweise, ohne die ganze Liste aufzubauen.
+    Filter wie get_events(). Liest den Stand zum Zeitpunkt des Aufrufs; ein halb geschriebener
+    letzter Eintrag wird übersprungen. flush_first=False liest ohne auf den Writer-Thread zu warten,
+    lock=False ohne den geteilten Log-Lock (beides für den Rollup-Neuaufbau innerhalb von
+    writes_paused(), das den Lock bereits exklusiv hält – flock() würde sonst blockieren).
+    """
+    if flush_first:
+        flush()
+    lo, hi = segments.bounds(start, end)
+    with (segments.log_lock(LOG_FILE, shared=True) if lock else nullcontext()):
+        manifest = segments.load_manifest(LOG_FILE)
+        try:
+            f = open(LOG_FILE, "rb")
+        except FileNotFoundError:
+            f = None
+    try:
+        for seg in segments.select(manifest, lo, hi, type, customer_id):
+            for event in _iter_segment(seg):
+                if _matches(event, lo, hi, type, customer_id):
+                    yield event
+        if f is None:
+            return
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            event = parse_line(raw)
+            if event is not None and _matches(event, lo, hi, type, customer_id):
+                yield event
+    finally:
+        if f is not None:
+            f.close()
 
 # ---- Legacy-API (optional), falls irgendwo noch verwendet -------------------
-def load_events_as_dataframe():
+def load_events_as_dataframe(start=None, end=None, columns=None):
     """
     Abwärtskompatible Helper-Funktion.
     Gibt wie früher ein pandas.DataFrame zurück – falls pandas nicht installiert,
     wird eine verständliche Exception geworfen.
+    - start/end (Datum/ISO-String, inklusive) und columns begrenzen, was gelesen wird:
+      abgeschlossene Tage kommen aus den Parquet-Partitionen (agent/activity_parquet.py),
+      nur der noch nicht kompaktierte Rest aus dem JSONL
     """
     try:
         import pandas as pd  # lazy import
+        import pyarrow  # noqa: F401
     except Exception as e:
         raise RuntimeError(
-            "pandas wird für load_events_as_dataframe() benötigt. "
-            "Installiere es oder nutze get_events() + pd.DataFrame(get_events())."
+            "pandas und pyarrow werden für load_events_as_dataframe() benötigt. "
+            "Installiere sie oder nutze get_events() + pd.DataFrame(get_events())."
         ) from e
+    try:
+        from agent.activity_parquet import load_events
+    except Exception:  # pragma: no cover
+        from activity_parquet import load_events
 
-    df = pd.DataFrame(get_events())
+    df = load_events(start=start, end=end, columns=columns)
     # leichte Normalisierung der Spaltennamen (siehe neuere streamlit_app)
     if not df.empty:
         df.columns = df.columns.str.strip().str.lower()
     return df
 
 # ---- Optionale Komfort-Helfer (kannst du bei Bedarf nutzen) -----------------
-def log_usage(customer_id: Optional[str], input_tokens: int, output_tokens: int, mode: Optional[str] = None) -> None:
-    """Bequemer Short-Cut für Usage-Events."""
-    log_event({
+def log_usage(
+    customer_id: Optional[str],
+    input_tokens: int,
+    output_tokens: int,
+    mode: Optional[str] = None,
+    *,
+    task: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    model: Optional[str] = None,
+    cached_tokens: Optional[int] = None,
+    latency_ms: Optional[int] = None,
+    cost_usd: Optional[float] = None,
+    estimated: Optional[bool] = None,
+) -> None:
+    """Bequemer Short-Cut für Usage-Events (ein Event pro LLM-Call, siehe agent/usage.py)."""
+    event: Dict[str, Any] = {
         "type": "usage",
         "customer_id": customer_id,
+        "task": task,
+        "conversation_id": conversation_id,
+        "model": model,
         "input_tokens": input_tokens,
         "output_tokens": output_tokens,
+        "cached_tokens": cached_tokens,
+        "latency_ms": latency_ms,
+        "cost_usd": cost_usd,
         "mode": mode,
-    })
+    }
+    if estimated:
+        event["estimated"] = True
+    log_event(event)
 
 def log_rating(customer_id: Optional[str], rating: Optional[float], comment: Optional[str] = None) -> None:
     """Bequemer Short-Cut für Rating/Feedback-Events."""
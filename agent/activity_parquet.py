@@ -0,0 +1,318 @@
+# agent/activity_parquet.py
+"""
+Spaltenbasierter Export des Activity-Logs (Parquet, eine Partition pro Tag) für Auswertungen.
+
+- compact(): überträgt abgeschlossene Tage (vor heute, UTC) nach
+  ACTIVITY_PARQUET_DIR/day=YYYY-MM-DD/part-<quelle>.parquet (Default .cache/activity_parquet):
+  rotierte Segmente (agent/activity_segments.py) als Ganzes, sobald ihr jüngstes Event vor `before` liegt,
+  danach das aktive activity_log.jsonl inkrementell ab dem zuletzt verarbeiteten Byte-Offset
+- Dtypes: type/task/customer_id/model/mode als category, timestamp als datetime64 (UTC),
+  Token-Felder als Int64, cost_usd/rating als float; verschachtelte Werte als JSON-String
+- Idempotent: der Dateiname enthält Segmentname bzw. Inode + Start-Offset des Logs – ein Abbruch vor
+  dem Speichern des Stands überschreibt beim nächsten Lauf dieselben Dateien statt Duplikate zu erzeugen;
+  wurde das Log vor der Rotation schon teilweise kompaktiert, wird dieser Teil im Segment übersprungen
+- load_events(start, end, columns): liest nur die Tages-Partitionen im Zeitraum und nur die
+  benötigten Spalten; noch nicht kompaktierte Events kommen aus Segmenten bzw. dem JSONL-Rest dazu
+- pandas/pyarrow werden erst beim Aufruf importiert
+
+CLI (z. B. nächtlich per Cron):
+  python -m agent.activity_parquet
+"""
+from __future__ import annotations
+
+import os
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    from agent import activity_log, activity_segments
+except Exception:  # pragma: no cover
+    import activity_log
+    import activity_segments
+
+PARQUET_DIR = os.getenv("ACTIVITY_PARQUET_DIR", os.path.join(".cache", "activity_parquet"))
+
+CATEGORICAL_COLUMNS = ("type", "task", "customer_id", "model", "mode")
+INT_COLUMNS = ("input_tokens", "output_tokens", "cached_tokens", "latency_ms")
+FLOAT_COLUMNS = ("cost_usd", "rating")
+
+_STATE = "_state.json"
+DateLike = Union[str, date, datetime]
+
+
+def _state_path() -> str:
+    return os.path.join(PARQUET_DIR, _STATE)
+
+
+def _load_state() -> Dict[str, Any]:
+    try:
+        with open(_state_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(state: Dict[str, Any]) -> None:
+    tmp = _state_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, _state_path())
+
+
+def _resume_offset(st: os.stat_result, state: Optional[Dict[str, Any]] = None) -> int:
+    """Offset, ab dem das aktuelle Log noch nicht kompaktiert ist (0 nach Rotation/Kürzen)."""
+    state = _load_state() if state is None else state
+    if state.get("log") == os.path.abspath(activity_log.LOG_FILE) and state.get("inode") == st.st_ino \
+            and int(state.get("offset", 0)) <= st.st_size \
+            and state.get("head", "") == activity_segments.file_head(activity_log.LOG_FILE):
+        return int(state.get("offset", 0))
+    return 0
+
+
+def _segment_skip(segment: Dict[str, Any], state: Dict[str, Any]) -> int:
+    """Bytes am Segmentanfang, die schon aus dem aktiven Log (vor der Rotation) kompaktiert wurden."""
+    if segment["file"] in state.get("skips", {}):
+        return int(state["skips"][segment["file"]])
+    if state.get("log") == os.path.abspath(activity_log.LOG_FILE) and state.get("inode") == segment.get("source_inode") \
+            and state.get("head", "") == segment.get("source_head"):
+        return int(state.get("offset", 0))
+    return 0
+
+
+def _pending_segments(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    done = set(state.get("segments", []))
+    return [seg for seg in activity_segments.load_manifest(activity_log.LOG_FILE) if seg["file"] not in done]
+
+
+def _iter_segment(segment: Dict[str, Any], skip: int) -> Iterator[Dict[str, Any]]:
+    try:
+        f = activity_segments.open_segment(activity_log.LOG_FILE, segment)
+    except FileNotFoundError:
+        return  # per Aufbewahrungsfrist entfernt
+    with f:
+        if skip:
+            f.seek(skip)
+        for raw in f:
+            event = activity_log.parse_line(raw)
+            if event is not None:
+                yield event
+
+
+def compacted_days() -> List[str]:
+    """Tage (YYYY-MM-DD), für die Parquet-Partitionen vorliegen."""
+    if not os.path.isdir(PARQUET_DIR):
+        return []
+    return sorted(
+        fn[len("day="):] for fn in os.listdir(PARQUET_DIR)
+        if fn.startswith("day=") and any(p.endswith(".parquet") for p in os.listdir(os.path.join(PARQUET_DIR, fn)))
+    )
+
+
+def _flatten(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        k: json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (dict, list, tuple, set)) else v
+        for k, v in event.items()
+    }
+
+
+def _apply_dtypes(df: Any) -> Any:
+    import pandas as pd
+
+    if "timestamp" in df.columns:
+        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce", format="ISO8601")
+    for col in INT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    for col in FLOAT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("string").astype("category")
+    for col in df.columns:
+        if df[col].dtype == object:
+            kinds = {type(v) for v in df[col].dropna()}
+            if len(kinds) > 1:  # gemischte Typen (z. B. int + str) kann Parquet nicht ablegen
+                df[col] = df[col].map(lambda v: v if v is None or v != v else str(v)).astype("string")
+    return df
+
+
+def _to_frame(events: Sequence[Dict[str, Any]]) -> Any:
+    import pandas as pd
+
+    return _apply_dtypes(pd.DataFrame([_flatten(e) for e in events]))
+
+
+def _write_partition(day: str, name: str, events: List[Dict[str, Any]]) -> None:
+    folder = os.path.join(PARQUET_DIR, f"day={day}")
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    tmp = path + ".tmp"
+    _to_frame(events).to_parquet(tmp, engine="pyarrow", index=False)
+    os.replace(tmp, path)
+
+
+def _iter_lines(offset: int) -> Iterator[Tuple[int, int, Optional[Dict[str, Any]]]]:
+    """(Start, Ende, Event) je vollständiger Zeile ab offset."""
+    with open(activity_log.LOG_FILE, "rb") as f:
+        f.seek(offset)
+        pos = offset
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # halb geschriebene Zeile
+            start, pos = pos, pos + len(raw)
+            yield start, pos, activity_log.parse_line(raw)
+
+
+def compact(before: Optional[str] = None) -> Dict[str, Any]:
+    """Kompaktiert alle Tage vor `before` (YYYY-MM-DD, Default heute UTC).
+
+    Liefert {"days": [...], "events": n, "offset": neuer Offset}.
+    """
+    activity_log.flush()
+    before = before or datetime.now(timezone.utc).date().isoformat()
+    state = _load_state()
+    os.makedirs(PARQUET_DIR, exist_ok=True)
+    days = set()
+    total = 0
+
+    # 1) rotierte Segmente – nur vollständig abgeschlossene, damit kein Tag halb übernommen wird
+    done = list(state.get("segments", []))
+    for seg in _pending_segments(state):
+        if str(seg.get("max_ts") or "")[:10] >= before:
+            break  # Segmente sind chronologisch
+        buckets: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for event in _iter_segment(seg, _segment_skip(seg, state)):
+            buckets[str(event.get("timestamp") or "")[:10]].append(event)
+        name = f"part-{seg['file'][:-len('.jsonl.gz')]}.parquet"
+        for day, events in sorted(buckets.items()):
+            _write_partition(day, name, events)
+        days.update(buckets)
+        total += sum(len(v) for v in buckets.values())
+        done.append(seg["file"])
+        # nach jedem Segment sichern; abgelaufene Segmente aus der Liste entfernen
+        current = {s["file"] for s in activity_segments.load_manifest(activity_log.LOG_FILE)}
+        skips = {k: v for k, v in state.get("skips", {}).items() if k != seg["file"]}
+        state = {**state, "segments": [n for n in done if n in current], "skips": skips}
+        _save_state(state)
+
+    # 2) aktives Log ab dem gespeicherten Offset
+    try:
+        st = os.stat(activity_log.LOG_FILE)
+    except FileNotFoundError:
+        return {"days": sorted(days), "events": total, "offset": 0}
+    offset = _resume_offset(st, state)
+    # Bereits kompaktierter Anfang eines noch offenen Segments bleibt über den Inode-Wechsel hinaus bekannt
+    skips = dict(state.get("skips", {}))
+    for seg in _pending_segments(state):
+        if seg["file"] not in skips and _segment_skip(seg, state):
+            skips[seg["file"]] = _segment_skip(seg, state)
+    buckets = defaultdict(list)
+    new_offset = offset
+    for start, end, event in _iter_lines(offset):
+        if event is None:
+            new_offset = end
+            continue
+        day = str(event.get("timestamp") or "")[:10]
+        if day >= before:
+            break  # Log ist chronologisch: ab hier beginnt der offene Zeitraum
+        new_offset = end
+        buckets[day].append(event)
+    name = f"part-{st.st_ino}-{offset}.parquet"
+    for day, events in sorted(buckets.items()):
+        _write_partition(day, name, events)
+    days.update(buckets)
+    total += sum(len(v) for v in buckets.values())
+    _save_state({
+        "log": os.path.abspath(activity_log.LOG_FILE), "inode": st.st_ino, "offset": new_offset,
+        "head": activity_segments.file_head(activity_log.LOG_FILE),
+        "segments": state.get("segments", []), "skips": skips,
+    })
+    return {"days": sorted(days), "events": total, "offset": new_offset}
+
+
+def _bounds(start: Optional[DateLike], end: Optional[DateLike]) -> Tuple[Any, Any]:
+    """Zeitraum → (inkl. Start, exkl. Ende) als UTC-Timestamps; reine Datumsangaben schließen den Endtag ein."""
+    import pandas as pd
+
+    def _ts(value: DateLike, is_end: bool) -> Any:
+        date_only = isinstance(value, date) and not isinstance(value, datetime) or (isinstance(value, str) and len(value) == 10)
+        ts = pd.Timestamp(value)
+        ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+        return ts + timedelta(days=1) if is_end and date_only else ts
+
+    return (_ts(start, False) if start is not None else None, _ts(end, True) if end is not None else None)
+
+
+def load_events(
+    start: Optional[DateLike] = None,
+    end: Optional[DateLike] = None,
+    columns: Optional[Sequence[str]] = None,
+) -> Any:
+    """DataFrame der Events im Zeitraum [start, end] mit nur den gewünschten Spalten."""
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    activity_log.flush()  # eigene, noch gepufferte Events mitlesen
+    lo, hi = _bounds(start, end)
+    lo_day = lo.date().isoformat() if lo is not None else None
+    hi_day = (hi - timedelta(microseconds=1)).date().isoformat() if hi is not None else None
+    wanted = list(columns) if columns else None
+    read_cols = None if wanted is None else sorted(set(wanted) | {"timestamp"})
+
+    frames = []
+    days = compacted_days()
+    for day in days:
+        if (lo_day and day < lo_day) or (hi_day and day > hi_day):
+            continue
+        folder = os.path.join(PARQUET_DIR, f"day={day}")
+        for fn in sorted(os.listdir(folder)):
+            if not fn.endswith(".parquet"):
+                continue
+            path = os.path.join(folder, fn)
+            cols = None if read_cols is None else [c for c in read_cols if c in pq.read_schema(path).names]
+            frames.append(pq.read_table(path, columns=cols).to_pandas())
+
+    # Noch nicht kompaktierter Rest: Segmente im Zeitraum + aktives JSONL ab Offset
+    state = _load_state()
+    lo_iso, hi_iso = activity_segments.bounds(lo_day, hi_day)
+    pending = [
+        _iter_segment(seg, _segment_skip(seg, state))
+        for seg in activity_segments.select(_pending_segments(state), lo_iso, hi_iso)
+    ]
+    try:
+        offset = _resume_offset(os.stat(activity_log.LOG_FILE), state)
+        pending.append(event for _, _, event in _iter_lines(offset))
+    except FileNotFoundError:
+        pass
+    tail = []
+    for source in pending:
+        for event in source:
+            if event is None:
+                continue
+            day = str(event.get("timestamp") or "")[:10]
+            if (lo_day and day < lo_day) or (hi_day and day > hi_day):
+                continue
+            tail.append({k: v for k, v in event.items() if read_cols is None or k in read_cols})
+    if tail:
+        frames.append(_to_frame(tail))
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=wanted or [])
+    df = _apply_dtypes(pd.concat(frames, ignore_index=True))
+    if "timestamp" in df.columns:
+        if lo is not None:
+            df = df[df["timestamp"] >= lo]
+        if hi is not None:
+            df = df[df["timestamp"] < hi]
+        df = df.sort_values("timestamp", kind="stable")
+    df = df.reset_index(drop=True)
+    return df.reindex(columns=wanted) if wanted else df
+
+
+if __name__ == "__main__":
+    result = compact()
+    print(f"{result['events']} Events aus {len(result['days'])} Tag(en) kompaktiert (Offset {result['offset']}).")
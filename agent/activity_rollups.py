@@ -0,0 +1,277 @@
+# agent/activity_rollups.py
+"""
+Laufende Aggregate des Activity-Logs (Sidecar-Store) für das Admin-Dashboard.
+
+- Wird beim Schreiben eines Events fortgeschrieben (activity_log.log_event → apply())
+- Tabellen (SQLite, ACTIVITY_ROLLUP_PATH, Default .cache/activity_rollups.sqlite):
+    tasks_daily    (customer_id, day, task)   → runs
+    usage_totals   (customer_id, model, task) → calls, input/output/cached tokens, cost_usd
+    rating_hist    (customer_id, rating)      → count
+    feedback_terms (term)                     → count
+- Upserts in einer Transaktion pro Batch → prozessübergreifend konsistent (Streamlit + API)
+- Das Dashboard liest damit O(Kunden) Zahlen statt alle Events; rebuild() baut den Store
+  einmalig aus dem bestehenden Log auf (automatisch, wenn die Datei fehlt)
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+ROLLUP_PATH = os.getenv("ACTIVITY_ROLLUP_PATH", os.path.join(".cache", "activity_rollups.sqlite"))
+
+_NO_CUSTOMER = "-"
+_TERM = re.compile(r"[\wäöüÄÖÜß-]{3,}", flags=re.UNICODE)
+# Füllwörter, die in Feedback-Kommentaren sonst die Top-Begriffe dominieren
+_STOPWORDS = frozenset(
+    "und der die das ist nicht ein eine mit für auf sehr aber auch noch war wie bei den dem des "
+    "sich sie wir ich mir mal nur zu von im am es hat".split()
+)
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS tasks_daily (
+        customer_id TEXT NOT NULL, day TEXT NOT NULL, task TEXT NOT NULL, runs INTEGER NOT NULL,
+        PRIMARY KEY (customer_id, day, task))""",
+    """CREATE TABLE IF NOT EXISTS usage_totals (
+        customer_id TEXT NOT NULL, model TEXT NOT NULL, task TEXT NOT NULL,
+        calls INTEGER NOT NULL, input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL,
+        cached_tokens INTEGER NOT NULL, cost_usd REAL NOT NULL,
+        PRIMARY KEY (customer_id, model, task))""",
+    """CREATE TABLE IF NOT EXISTS rating_hist (
+        customer_id TEXT NOT NULL, rating TEXT NOT NULL, count INTEGER NOT NULL,
+        PRIMARY KEY (customer_id, rating))""",
+    """CREATE TABLE IF NOT EXISTS feedback_terms (
+        term TEXT PRIMARY KEY, count INTEGER NOT NULL)""",
+)
+
+
+def _int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def feedback_terms(comment: Any) -> List[str]:
+    """Begriffe eines Feedback-Kommentars (klein, ≥ 3 Zeichen, ohne Füllwörter)."""
+    if not comment:
+        return []
+    return [t for t in (m.lower() for m in _TERM.findall(str(comment))) if t not in _STOPWORDS]
+
+
+class ActivityRollups:
+    """SQLite-Sidecar mit den Aggregaten."""
+
+    def __init__(self, path: str = ROLLUP_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self.created = not os.path.exists(path)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")  # WAL: Aggregat-Updates ohne fsync pro Event
+        try:
+            with conn:  # commit/rollback
+                yield conn
+        finally:
+            conn.close()
+
+    def _apply(self, conn: sqlite3.Connection, event: Dict[str, Any]) -> None:
+        etype = event.get("type")
+        cid = str(event.get("customer_id") or _NO_CUSTOMER)
+        task = str(event.get("task") or "-")
+        if etype == "task_run":
+            day = str(event.get("timestamp") or "")[:10] or "-"
+            conn.execute(
+                "INSERT INTO tasks_daily (customer_id, day, task, runs) VALUES (?, ?, ?, 1) "
+                "ON CONFLICT (customer_id, day, task) DO UPDATE SET runs = runs + 1",
+                (cid, day, task),
+            )
+        elif etype == "usage":
+            conn.execute(
+                "INSERT INTO usage_totals VALUES (?, ?, ?, 1, ?, ?, ?, ?) "
+                "ON CONFLICT (customer_id, model, task) DO UPDATE SET calls = calls + 1, "
+                "input_tokens = input_tokens + excluded.input_tokens, "
+                "output_tokens = output_tokens + excluded.output_tokens, "
+                "cached_tokens = cached_tokens + excluded.cached_tokens, "
+                "cost_usd = cost_usd + excluded.cost_usd",
+                (
+                    cid, str(event.get("model") or "-"), task,
+                    _int(event.get("input_tokens")), _int(event.get("output_tokens")),
+                    _int(event.get("cached_tokens")), _float(event.get("cost_usd")),
+                ),
+            )
+        elif etype == "rating":
+            if event.get("rating") is not None:
+                conn.execute(
+                    "INSERT INTO rating_hist VALUES (?, ?, 1) "
+                    "ON CONFLICT (customer_id, rating) DO UPDATE SET count = count + 1",
+                    (cid, str(event.get("rating"))),
+                )
+            terms = Counter(feedback_terms(event.get("comment")))
+            if terms:
+                conn.executemany(
+                    "INSERT INTO feedback_terms VALUES (?, ?) "
+                    "ON CONFLICT (term) DO UPDATE SET count = count + excluded.count",
+                    list(terms.items()),
+                )
+
+    def apply(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Events in die Aggregate übernehmen (eine Transaktion)."""
+        with self._lock, self._connect() as conn:
+            for event in events:
+                self._apply(conn, event)
+
+    def rebuild(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Aggregate verwerfen und aus den übergebenen Events neu aufbauen; liefert die Anzahl Events."""
+        n = 0
+        with self._lock, self._connect() as conn:
+            for table in ("tasks_daily", "usage_totals", "rating_hist", "feedback_terms"):
+                conn.execute(f"DELETE FROM {table}")
+            for event in events:
+                self._apply(conn, event)
+                n += 1
+        self.created = False
+        return n
+
+    # -----------------------
+    # Lesen (Dashboard)
+    # -----------------------
+    def _rows(self, sql: str, args: tuple = ()) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            cur = conn.execute(sql, args)
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+
+    def customers(self) -> List[str]:
+        rows = self._rows(
+            "SELECT customer_id FROM tasks_daily UNION SELECT customer_id FROM usage_totals "
+            "UNION SELECT customer_id FROM rating_hist"
+        )
+        return sorted(r["customer_id"] for r in rows if r["customer_id"] != _NO_CUSTOMER)
+
+    def usage_summary(self, customer_id: Optional[str] = None, group_by: str = "task") -> List[Dict[str, Any]]:
+        """Token-/Kostensummen je task oder model (optional nur ein Kunde)."""
+        if group_by not in ("task", "model", "customer_id"):
+            raise ValueError(f"Unbekannte Gruppierung: {group_by}")
+        where, args = ("WHERE customer_id = ?", (customer_id,)) if customer_id else ("", ())
+        return self._rows(
+            f"SELECT {group_by}, SUM(calls) AS calls, SUM(input_tokens) AS input_tokens, "
+            "SUM(output_tokens) AS output_tokens, SUM(cached_tokens) AS cached_tokens, "
+            f"ROUND(SUM(cost_usd), 6) AS cost_usd FROM usage_totals {where} GROUP BY {group_by} ORDER BY {group_by}",
+            args,
+        )
+
+    def total_cost(self) -> float:
+        rows = self._rows("SELECT COALESCE(SUM(cost_usd), 0) AS cost FROM usage_totals")
+        return float(rows[0]["cost"])
+
+    def tasks_per_day(self, customer_id: str, days: Optional[int] = None) -> List[Dict[str, Any]]:
+        rows = self._rows(
+            "SELECT day, task, runs FROM tasks_daily WHERE customer_id = ? ORDER BY day DESC, task",
+            (customer_id,),
+        )
+        if days is not None:
+            keep = sorted({r["day"] for r in rows}, reverse=True)[:days]
+            rows = [r for r in rows if r["day"] in keep]
+        return rows
+
+    def rating_histogram(self, customer_id: Optional[str] = None) -> Dict[str, int]:
+        where, args = ("WHERE customer_id = ?", (customer_id,)) if customer_id else ("", ())
+        rows = self._rows(f"SELECT rating, SUM(count) AS n FROM rating_hist {where} GROUP BY rating ORDER BY rating", args)
+        return {r["rating"]: int(r["n"]) for r in rows}
+
+    def top_terms(self, n: int = 5) -> List[tuple]:
+        rows = self._rows("SELECT term, count FROM feedback_terms ORDER BY count DESC, term LIMIT ?", (int(n),))
+        return [(r["term"], r["count"]) for r in rows]
+
+
+_rollups: Optional[ActivityRollups] = None
+_rollups_lock = threading.Lock()
+# Deltas, die der Writer abgibt, während ein anderer Thread den Store gerade öffnet
+_pending: List[Dict[str, Any]] = []
+_pending_lock = threading.Lock()
+
+
+def get_rollups() -> ActivityRollups:
+    """Singleton; ist der Store neu, wird er einmalig aus dem bestehenden Log aufgebaut."""
+    global _rollups
+    if _rollups is not None:
+        return _rollups
+    try:
+        from agent import activity_log
+    except Exception:  # pragma: no cover
+        import activity_log
+    # Vor dem Lock: flush() wartet auf den Writer-Thread, und der darf nie auf uns warten müssen
+    activity_log.flush()
+    with _rollups_lock:
+        if _rollups is not None:
+            return _rollups
+        rollups = ActivityRollups()
+        if rollups.created:
+            # Schreib-Batches aller Prozesse anhalten (exklusiver Log-Lock): der Neuaufbau sieht jedes
+            # Event genau einmal – entweder im Log oder (danach) als Delta; gepufferte Deltas stehen
+            # bereits im Log. Andere Prozesse schreiben und übernehmen ihre Deltas erst nach dem Commit.
+            with activity_log.writes_paused():
+                rollups.rebuild(activity_log.iter_events(flush_first=False, lock=False))
+                with _pending_lock:
+                    _pending.clear()
+                    _rollups = rollups
+            return rollups
+        with _pending_lock:
+            pending = list(_pending)
+            _pending.clear()
+            _rollups = rollups
+        if pending:
+            rollups.apply(pending)
+        return rollups
+
+
+def apply_events(events: Iterable[Dict[str, Any]]) -> None:
+    """Hook für activity_log nach dem Schreiben (hält dessen Schreib-Lock, wartet daher nie auf den Rollup-Lock).
+
+    Fehlt der Store noch, wird nichts übernommen – der erste get_rollups() baut ihn aus dem Log auf,
+    inklusive dieser Events. Aggregat-Probleme dürfen das Logging nie verhindern.
+    """
+    global _rollups
+    try:
+        events = list(events)
+        rollups = _rollups
+        if rollups is None:
+            if not _rollups_lock.acquire(blocking=False):
+                with _pending_lock:
+                    if _rollups is None:  # Store wird gerade geöffnet/aufgebaut → dort übernehmen
+                        _pending.extend(events)
+                        return
+                    rollups = _rollups
+            else:
+                try:
+                    if _rollups is None:
+                        if not os.path.exists(ROLLUP_PATH):
+                            return
+                        _rollups = ActivityRollups()
+                    rollups = _rollups
+                finally:
+                    _rollups_lock.release()
+        rollups.apply(events)
+    except Exception:
+        pass
@@ -0,0 +1,369 @@
+# agent/activity_segments.py
+"""
+Rotation des Activity-Logs in komprimierte Segmente + Manifest für Zeitraum-Abfragen.
+
+- Das aktive Log (ACTIVITY_LOG_FILE) wird vor einem Schreib-Batch rotiert, wenn es
+  ACTIVITY_LOG_MAX_BYTES erreicht hat oder sein erstes Event von einem früheren Tag (UTC) stammt
+  (ACTIVITY_LOG_ROTATE = both | size | day | off, Default both)
+- Segmente: <log>.segments/seg-<erstes Event>-<Inode>.jsonl.gz (gzip, danach unveränderlich)
+- <log>.segments/manifest.json: je Segment min_ts/max_ts, Events gesamt und je type, Kunden-IDs,
+  Rohgröße sowie Inode + Dateianfang des Quell-Logs (für activity_parquet); atomar ersetzt
+- Prozessübergreifend über <log>.lock (fcntl): jeder Schreib-Batch und die Rotation halten ihn exklusiv,
+  Leser kurz geteilt, um Manifest + aktives Log als konsistenten Stand zu öffnen
+- Reihenfolge der Rotation: Segment schreiben → Manifest → aktives Log entfernen; ein Absturz
+  dazwischen hinterlässt höchstens ein verwaistes Segment, nie verlorene Events
+- select(): nur Segmente, deren Zeitraum, Typen und Kunden zur Abfrage passen
+- Aufbewahrung: ACTIVITY_LOG_RETENTION_DAYS (0 = unbegrenzt); ältere Segmente werden gelöscht oder –
+  mit ACTIVITY_LOG_ARCHIVE_DIR – dorthin verschoben (läuft nach jeder Rotation und per CLI)
+
+CLI:
+  python -m agent.activity_segments [rotate|retention|list]
+"""
+from __future__ import annotations
+
+import os
+import json
+import shutil
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:  # POSIX; unter Windows schützt nur der Thread-Lock in activity_log
+    import fcntl
+except Exception:  # pragma: no cover
+    fcntl = None
+
+LOG_ROTATE = os.getenv("ACTIVITY_LOG_ROTATE", "both").lower()
+LOG_MAX_BYTES = int(os.getenv("ACTIVITY_LOG_MAX_BYTES", str(32 * 1024 * 1024)))
+RETENTION_DAYS = int(os.getenv("ACTIVITY_LOG_RETENTION_DAYS", "0"))
+ARCHIVE_DIR = os.getenv("ACTIVITY_LOG_ARCHIVE_DIR", "")
+
+_MANIFEST = "manifest.json"
+# Tag des ersten Events im aktiven Log, je (Pfad, Inode, Dateianfang) – Inodes werden nach der
+# Rotation oft sofort wiederverwendet, der Anfang unterscheidet alte und neue Datei
+_first_day: Dict[Tuple[str, int, str], str] = {}
+
+
+def segment_dir(log_file: str) -> str:
+    return log_file + ".segments"
+
+
+def _manifest_path(log_file: str) -> str:
+    return os.path.join(segment_dir(log_file), _MANIFEST)
+
+
+@contextmanager
+def log_lock(log_file: str, shared: bool = False) -> Iterator[None]:
+    """Prozessübergreifender Lock des Logs (exklusiv zum Schreiben/Rotieren, geteilt zum Lesen)."""
+    # flock() gilt je geöffneter Datei → sperrt auch Threads desselben Prozesses gegeneinander
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        lf = open(log_file + ".lock", "a")
+    except OSError:
+        if shared:  # z. B. schreibgeschütztes Verzeichnis → ohne Lock lesen
+            yield
+            return
+        raise
+    with lf:
+        if fcntl is not None:
+            fcntl.flock(lf.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+
+# -----------------------
+# Manifest
+# -----------------------
+def load_manifest(log_file: str) -> List[Dict[str, Any]]:
+    """Segmente des Logs (älteste zuerst)."""
+    try:
+        with open(_manifest_path(log_file), "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    return sorted(data.get("segments", []), key=lambda s: (s.get("min_ts") or "", s["file"]))
+
+
+def _save_manifest(log_file: str, segments: List[Dict[str, Any]]) -> None:
+    path = _manifest_path(log_file)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "segments": segments}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def file_head(path: str, n: int = 64) -> str:
+    """Erste Bytes einer Datei (hex) – unterscheidet Logs mit wiederverwendetem Inode."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(n).hex()
+    except FileNotFoundError:
+        return ""
+
+
+def segment_path(log_file: str, segment: Dict[str, Any]) -> str:
+    return os.path.join(segment_dir(log_file), segment["file"])
+
+
+def open_segment(log_file: str, segment: Dict[str, Any]) -> Any:
+    """Segment als Binär-Dateiobjekt (zeilenweise iterierbar); FileNotFoundError nach Aufbewahrungsablauf."""
+    import gzip
+
+    return gzip.open(segment_path(log_file, segment), "rb")
+
+
+# -----------------------
+# Zeiträume
+# -----------------------
+def _iso(value: Any, is_end: bool) -> str:
+    """datetime/date/ISO-String → vergleichbarer UTC-String; reine Datumsangaben schließen den Endtag ein."""
+    if isinstance(value, datetime):
+        dt = value
+    elif hasattr(value, "isoformat") and not isinstance(value, str):  # date
+        day = value
+        return (day + timedelta(days=1)).isoformat() if is_end else day.isoformat()
+    else:
+        text = str(value).strip()
+        if len(text) == 10:
+            day = datetime.strptime(text, "%Y-%m-%d").date()
+            return (day + timedelta(days=1)).isoformat() if is_end else day.isoformat()
+        try:
+            dt = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError as e:
+            raise ValueError(f"Ungültiger Zeitpunkt: {value!r}") from e
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt.isoformat()
+
+
+def bounds(start: Any = None, end: Any = None) -> Tuple[Optional[str], Optional[str]]:
+    """Zeitraum → (inkl. Start, exkl. Ende) als Strings, direkt mit Event-Timestamps vergleichbar."""
+    return (
+        _iso(start, False) if start is not None else None,
+        _iso(end, True) if end is not None else None,
+    )
+
+
+def in_range(ts: Any, lo: Optional[str], hi: Optional[str]) -> bool:
+    ts = str(ts or "")
+    return (lo is None or ts >= lo) and (hi is None or ts < hi)
+
+
+def select(
+    segments: List[Dict[str, Any]],
+    lo: Optional[str] = None,
+    hi: Optional[str] = None,
+    type: Optional[str] = None,
+    customer_id: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Segmente, die Events zur Abfrage enthalten können."""
+    out = []
+    for seg in segments:
+        if lo is not None and str(seg.get("max_ts") or "") < lo:
+            continue
+        if hi is not None and str(seg.get("min_ts") or "") >= hi:
+            continue
+        if type is not None and type not in (seg.get("types") or {}):
+            continue
+        if customer_id is not None and customer_id not in (seg.get("customers") or []):
+            continue
+        out.append(seg)
+    return out
+
+
+# -----------------------
+# Rotation
+# -----------------------
+def _event_day(raw: bytes) -> Optional[str]:
+    try:
+        ts = json.loads(raw).get("timestamp")
+    except (ValueError, AttributeError):
+        return None
+    return str(ts)[:10] if ts else None
+
+
+def _active_first_day(log_file: str, st: os.stat_result) -> Optional[str]:
+    key = (os.path.abspath(log_file), st.st_ino, file_head(log_file))
+    if key not in _first_day:
+        with open(log_file, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    return None  # noch keine vollständige Zeile
+                day = _event_day(raw)
+                if day:
+                    _first_day.clear()
+                    _first_day[key] = day
+                    break
+            else:
+                return None
+    return _first_day[key]
+
+
+def needs_rotation(log_file: str, today: Optional[str] = None) -> bool:
+    if LOG_ROTATE == "off":
+        return False
+    try:
+        st = os.stat(log_file)
+    except FileNotFoundError:
+        return False
+    if st.st_size == 0:
+        return False
+    if LOG_ROTATE in ("both", "size") and st.st_size >= LOG_MAX_BYTES:
+        return True
+    if LOG_ROTATE in ("both", "day"):
+        today = today or datetime.now(timezone.utc).date().isoformat()
+        first = _active_first_day(log_file, st)
+        return first is not None and first < today
+    return False
+
+
+def _segment_name(folder: str, min_ts: str, inode: int) -> str:
+    stamp = "".join(ch for ch in min_ts[:19] if ch.isdigit()) or "0"
+    name = f"seg-{stamp}-{inode}.jsonl.gz"
+    n = 1
+    while os.path.exists(os.path.join(folder, name)):
+        n += 1
+        name = f"seg-{stamp}-{inode}-{n}.jsonl.gz"
+    return name
+
+
+def _rotate_locked(log_file: str) -> Optional[Dict[str, Any]]:
+    import gzip
+
+    try:
+        st = os.stat(log_file)
+    except FileNotFoundError:
+        return None
+    folder = segment_dir(log_file)
+    os.makedirs(folder, exist_ok=True)
+    tmp = os.path.join(folder, f".rotate-{os.getpid()}.tmp")
+    stats: Dict[str, Any] = {"min_ts": None, "max_ts": None, "count": 0}
+    types: Counter = Counter()
+    customers = set()
+    size = 0
+    with open(log_file, "rb") as src, gzip.open(tmp, "wb", compresslevel=6) as dst:
+        for raw in src:
+            if not raw.endswith(b"\n"):
+                break  # abgerissene letzte Zeile (Absturz beim Schreiben) nicht übernehmen
+            dst.write(raw)
+            size += len(raw)
+            try:
+                event = json.loads(raw)
+            except ValueError:
+                continue
+            if not isinstance(event, dict):
+                continue
+            ts = str(event.get("timestamp") or "")
+            if ts:
+                stats["min_ts"] = ts if stats["min_ts"] is None else min(stats["min_ts"], ts)
+                stats["max_ts"] = ts if stats["max_ts"] is None else max(stats["max_ts"], ts)
+            stats["count"] += 1
+            types[str(event.get("type") or "-")] += 1
+            if event.get("customer_id") is not None:
+                customers.add(str(event["customer_id"]))
+    if size == 0:
+        os.remove(tmp)
+        os.remove(log_file)
+        return None
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    name = _segment_name(folder, stats["min_ts"] or "", st.st_ino)
+    os.replace(tmp, os.path.join(folder, name))
+    segment = {
+        "file": name,
+        **stats,
+        "types": dict(types),
+        "customers": sorted(customers),
+        "bytes": size,
+        "source_inode": st.st_ino,
+        "source_head": file_head(log_file),
+        "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+    }
+    _save_manifest(log_file, load_manifest(log_file) + [segment])
+    os.remove(log_file)
+    return segment
+
+
+def maybe_rotate(log_file: str) -> Optional[Dict[str, Any]]:
+    """Hook für activity_log vor dem Schreiben; der Aufrufer hält log_lock(). Fehler verhindern nie das Loggen."""
+    try:
+        if not needs_rotation(log_file):
+            return None
+        segment = _rotate_locked(log_file)
+        _retention_locked(log_file)
+        return segment
+    except Exception:
+        return None
+
+
+def rotate(log_file: str) -> Optional[Dict[str, Any]]:
+    """Rotiert das aktive Log sofort (unabhängig von Größe/Tag); liefert den Manifest-Eintrag."""
+    with log_lock(log_file):
+        segment = _rotate_locked(log_file)
+        _retention_locked(log_file)
+        return segment
+
+
+# -----------------------
+# Aufbewahrung
+# -----------------------
+def _retention_locked(log_file: str, days: Optional[int] = None, now: Optional[datetime] = None) -> List[str]:
+    days = RETENTION_DAYS if days is None else days
+    if days <= 0:
+        return []
+    cutoff = ((now or datetime.now(timezone.utc)) - timedelta(days=days)).astimezone(timezone.utc)
+    cutoff_iso = cutoff.replace(tzinfo=None).isoformat()
+    segments = load_manifest(log_file)
+    expired = [s for s in segments if str(s.get("max_ts") or "") < cutoff_iso]
+    if not expired:
+        return []
+    # Manifest zuerst: Leser greifen danach nicht mehr auf die Dateien zu
+    _save_manifest(log_file, [s for s in segments if s not in expired])
+    for seg in expired:
+        path = segment_path(log_file, seg)
+        try:
+            if ARCHIVE_DIR:
+                os.makedirs(ARCHIVE_DIR, exist_ok=True)
+                shutil.move(path, os.path.join(ARCHIVE_DIR, seg["file"]))
+                with open(os.path.join(ARCHIVE_DIR, "archive.jsonl"), "a", encoding="utf-8") as f:
+                    f.write(json.dumps(seg, ensure_ascii=False) + "\n")
+            else:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+    return [s["file"] for s in expired]
+
+
+def apply_retention(log_file: str, days: Optional[int] = None) -> List[str]:
+    """Entfernt (bzw. archiviert) Segmente, deren jüngstes Event älter als `days` Tage ist."""
+    with log_lock(log_file):
+        return _retention_locked(log_file, days)
+
+
+if __name__ == "__main__":
+    import sys
+
+    try:
+        from agent.activity_log import LOG_FILE, flush
+    except Exception:  # pragma: no cover
+        from activity_log import LOG_FILE, flush
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if cmd == "rotate":
+        flush()
+        seg = rotate(LOG_FILE)
+        print(f"Rotiert: {seg['file']} ({seg['count']} Events)" if seg else "Nichts zu rotieren.")
+    elif cmd == "retention":
+        removed = apply_retention(LOG_FILE)
+        print(f"{len(removed)} Segment(e) {'archiviert' if ARCHIVE_DIR else 'gelöscht'}.")
+    elif cmd == "list":
+        for seg in load_manifest(LOG_FILE):
+            print(f"{seg['file']}  {seg.get('min_ts')} – {seg.get('max_ts')}  {seg['count']} Events")
+    else:
+        raise SystemExit(f"Unbekannter Befehl: {cmd} (rotate|retention|list)")
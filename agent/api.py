@@ -1,24 +1,27 @@
 # agent/api.py
 
 import os
+import json
 import uuid
+import asyncio
 import hashlib
-import datetime
-from typing import Dict, Optional, Literal, List
+import tempfile
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Literal, List
 
 from fastapi import FastAPI, UploadFile, Depends, HTTPException, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel
 
-from agent import loader, embedder, vectorstore, query, scrape_competitors
+from agent import loader, embedder, vectorstore, query, scrape_competitors, base_agent, llm_gateway, pipeline, batch, memory_index, db
+from agent.clients import langsmith_tracing
 from agent.schemas import Customer, MemoryEntry, ActivityItem, FeedbackItem, ReportStatus
 
-# ✅ LangSmith Import
-from langchain.callbacks.tracers import LangChainTracer
-from langchain_core.tracers.context import tracing_v2_enabled
-
-# ✅ Tracer einmal erstellen
-tracer = LangChainTracer()
+# LangSmith-Tracer wird erst beim ersten getracten Request erzeugt (agent.clients)
 
 app = FastAPI()
 
@@ -37,14 +40,34 @@ def get_current_user(credentials: HTTPBasicCredentials = Depends(security)) -> s
         )
     return credentials.username
 
-# In-Memory Datenbank
-CUSTOMERS = {}
-MEMORY = {}
-ACTIVITY_LOG = []
-USAGE_STATS = {}
-FEEDBACKS = []
-LIGHTHOUSE_HISTORY = {}
-REPORTS = {}
+# ===== Blockierende Arbeit aus dem Event-Loop auslagern =====
+# query_agent, Scraping, Embeddings und DB-Zugriffe sind synchron. In async-Handlern laufen sie in einem
+# eigenen, begrenzten Threadpool (API_BLOCKING_WORKERS) – der Event-Loop bleibt für /health/ & Co. frei,
+# und langsame LLM-Calls belegen nicht den Standard-Threadpool der Sync-Handler (CRUD).
+API_BLOCKING_WORKERS = int(os.getenv("API_BLOCKING_WORKERS", "32"))
+
+_blocking_executor: Optional[ThreadPoolExecutor] = None
+_blocking_lock = threading.Lock()
+
+def _get_blocking_executor() -> ThreadPoolExecutor:
+    global _blocking_executor
+    with _blocking_lock:
+        if _blocking_executor is None:
+            _blocking_executor = ThreadPoolExecutor(max_workers=API_BLOCKING_WORKERS, thread_name_prefix="api-blocking")
+        return _blocking_executor
+
+async def run_blocking(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """fn(*args, **kwargs) im begrenzten Threadpool ausführen; contextvars (Tracing-Spans) wandern mit."""
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(_get_blocking_executor(), call)
+
+# Persistenz: agent/db.py (SQLite im WAL-Modus bzw. DATABASE_URL) – von allen Workern geteilt
+
+def _log_activity(user: str, action: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+    # ActivityItem.metadata ist Dict[str, str] → Nicht-Strings als JSON-Text ablegen
+    meta = {k: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for k, v in (metadata or {}).items() if v is not None}
+    db.log_activity(user, action, meta or None)  # Zeitstempel: db._now() (ISO, wie list_activity(since=…))
 
 # -------------------------------
 # 1) PDF-Upload & Vektor speichern
@@ -52,17 +75,24 @@ REPORTS = {}
 @app.post("/upload-pdf/", dependencies=[Depends(get_current_user)])
 async def upload_pdf(file: UploadFile):
     content = await file.read()
-    path = "uploaded.pdf"
-    with open(path, "wb") as f:
+    n = await run_blocking(_store_pdf, content)
+    return {"message": f"✅ {n} Chunks gespeichert!"}
+
+def _store_pdf(content: bytes) -> int:
+    # Eigene Temp-Datei je Request – parallele Uploads überschreiben sich sonst gegenseitig
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
         f.write(content)
-    text = loader.load_pdf(path)
+    try:
+        text = loader.load_pdf(f.name)
+    finally:
+        os.remove(f.name)
     chunks = []
     for para in text.split("\n\n"):
         if para.strip():
             emb = embedder.create_embedding(para)
             chunks.append({"text": para, "embedding": emb})
     vectorstore.upsert_chunks(chunks, collection_name="pdf_chunks")
-    return {"message": f"✅ {len(chunks)} Chunks gespeichert!"}
+    return len(chunks)
 
 # -------------------------------
 # 2) Frage stellen (Qdrant + GPT)
@@ -75,38 +105,148 @@ class AskRequest(BaseModel):
 
 @app.post("/ask/", dependencies=[Depends(get_current_user)])
 async def ask(req: AskRequest, user: str = Depends(get_current_user)):
-    with tracing_v2_enabled() as session:
-        session.add_tracer(tracer)
+    result = await run_blocking(_ask, req, user)
+    return {
+        "response": result["response"],
+        "questions": result["questions"],
+        "conversation_id": result["conversation_id"]
+    }
+
+def _ask(req: AskRequest, user: str) -> Dict[str, Any]:
+    # Läuft im Worker-Thread (run_blocking): Qdrant, LLM und DB blockieren dort nur diesen Request
+    with langsmith_tracing():
         result = query.query_agent(
             question=req.question,
             mode=req.mode,
             clarifications=req.clarifications,
             conversation_id=req.conversation_id
         )
-    ACTIVITY_LOG.append(ActivityItem(
-        timestamp=str(datetime.datetime.utcnow()), user=user, action="ask",
-        metadata={"question": req.question}
-    ))
-    USAGE_STATS[user] = USAGE_STATS.get(user, 0) + 1
-    return {
-        "response": result["response"],
-        "questions": result["questions"],
-        "conversation_id": result["conversation_id"]
-    }
+    _log_activity(user, "ask", {"question": req.question})
+    db.increment_usage(user)
+    return result
+
+# -------------------------------
+# 2b) Task-Run als Server-Sent Events (Token-Streaming)
+# -------------------------------
+class TaskRunRequest(BaseModel):
+    task: str
+    conversation_id: Optional[str] = None
+    clarifications: Optional[Dict[str, str]] = None
+    save_to_memory: bool = False
+    params: Dict[str, Any] = {}
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@app.post("/run-task/stream")
+def run_task_stream(req: TaskRunRequest, user: str = Depends(get_current_user)):
+    # Sync-Handler: Prompt-/Kontextaufbau blockiert so nicht den Event-Loop
+    try:
+        events = base_agent.stream_agent(
+            req.task,
+            conversation_id=req.conversation_id,
+            clarifications=req.clarifications,
+            save_to_memory=req.save_to_memory,
+            **req.params,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def _event_stream():
+        try:
+            for ev in events:
+                yield _sse(ev["type"], ev)
+        except Exception as e:
+            yield _sse("error", {"type": "error", "detail": str(e)})
+
+    _log_activity(user, "run-task-stream", {"task": req.task})
+    return StreamingResponse(
+        _event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -------------------------------
+# 2c) Pipeline: mehrere Tasks als DAG mit gemeinsamem Kontext
+# -------------------------------
+class PipelineRequest(BaseModel):
+    nodes: Optional[List[Dict[str, Any]]] = None
+    preset: Optional[str] = None
+    params: Dict[str, Any] = {}
+    merged_context: Optional[str] = None
+    conversation_id: Optional[str] = None
+    save_to_memory: bool = False
+    max_workers: Optional[int] = None
+
+@app.post("/pipeline/run", dependencies=[Depends(get_current_user)])
+def run_pipeline(req: PipelineRequest, user: str = Depends(get_current_user)):
+    # Sync-Handler: Tasks blockieren, FastAPI führt ihn im Threadpool aus
+    try:
+        result = pipeline.run_pipeline(
+            req.nodes,
+            preset=req.preset,
+            params=req.params,
+            merged_context=req.merged_context,
+            conversation_id=req.conversation_id,
+            save_to_memory=req.save_to_memory,
+            max_workers=req.max_workers,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    _log_activity(user, "pipeline-run", {"preset": req.preset, "nodes": list(result["results"].keys())})
+    return result
+
+# -------------------------------
+# 2d) Batch: ein Task für alle Kunden (Hintergrund, mit Checkpoint/Resume)
+# -------------------------------
+class BatchRequest(BaseModel):
+    task: str
+    customer_ids: Optional[List[str]] = None
+    params: Optional[Dict[str, Any]] = None
+    batch_id: Optional[str] = None  # bestehende ID → Resume
+    concurrency: Optional[int] = None
+    save_to_memory: bool = True
+
+def _run_batch_background(req: BatchRequest, batch_id: str):
+    try:
+        batch.run_batch(
+            req.task,
+            customer_ids=req.customer_ids,
+            params=req.params,
+            batch_id=batch_id,
+            concurrency=req.concurrency,
+            save_to_memory=req.save_to_memory,
+        )
+    except Exception as e:
+        print(f"[Batch] {batch_id} abgebrochen: {e}")
+
+@app.post("/batch/run", dependencies=[Depends(get_current_user)])
+async def run_batch(req: BatchRequest, background_tasks: BackgroundTasks, user: str = Depends(get_current_user)):
+    batch_id = req.batch_id or str(uuid.uuid4())
+    background_tasks.add_task(_run_batch_background, req, batch_id)
+    await run_blocking(_log_activity, user, "batch-run", {"task": req.task, "batch_id": batch_id})
+    return {"batch_id": batch_id}
+
+@app.get("/batch/{batch_id}", dependencies=[Depends(get_current_user)])
+async def batch_status(batch_id: str):
+    state = await run_blocking(batch.load_status, batch_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return state
 
 # -------------------------------
 # 3) Wettbewerber-Scraping starten
 # -------------------------------
 @app.post("/scrape-now/", dependencies=[Depends(get_current_user)])
 async def scrape_now(user: str = Depends(get_current_user)):
-    with tracing_v2_enabled() as session:
-        session.add_tracer(tracer)
-        scrape_competitors.scrape_and_update()
-    ACTIVITY_LOG.append(ActivityItem(
-        timestamp=str(datetime.datetime.utcnow()), user=user, action="scrape-now"
-    ))
+    await run_blocking(_scrape, user)
     return {"status": "✅ Scraper gestartet!"}
 
+def _scrape(user: str) -> None:
+    with langsmith_tracing():
+        scrape_competitors.scrape_and_update()
+    _log_activity(user, "scrape-now")
+
 # -------------------------------
 # 4) Health-Check
 # -------------------------------
@@ -114,104 +254,109 @@ async def scrape_now(user: str = Depends(get_current_user)):
 async def health():
     return {"status": "ok"}
 
+# -------------------------------
+# 4b) LLM-Gateway-Metriken (Queue-Tiefe, Wartezeiten, Retries)
+# -------------------------------
+@app.get("/llm-metrics/", dependencies=[Depends(get_current_user)])
+async def llm_metrics():
+    return llm_gateway.get_metrics()
+
 # -------------------------------
 # 5) Kunden-CRUD
 # -------------------------------
 @app.post("/customers/", dependencies=[Depends(get_current_user)])
-async def create_customer(customer: Customer):
+def create_customer(customer: Customer):
     customer.id = str(uuid.uuid4())
-    CUSTOMERS[customer.id] = customer
+    db.add_customer(customer.id, customer.name, customer.email, customer.notes)
     return customer
 
 @app.get("/customers/", dependencies=[Depends(get_current_user)])
-async def list_customers():
-    return list(CUSTOMERS.values())
+def list_customers():
+    return [Customer(**{k: c[k] for k in ("id", "name", "email", "notes")}) for c in db.list_customers()]
 
 @app.get("/customers/{customer_id}", dependencies=[Depends(get_current_user)])
-async def get_customer(customer_id: str):
-    if customer_id not in CUSTOMERS:
+def get_customer(customer_id: str):
+    c = db.get_customer(customer_id)
+    if c is None:
         raise HTTPException(status_code=404, detail="Customer not found")
-    return CUSTOMERS[customer_id]
+    return Customer(**{k: c[k] for k in ("id", "name", "email", "notes")})
 
 @app.put("/customers/{customer_id}", dependencies=[Depends(get_current_user)])
-async def update_customer(customer_id: str, customer: Customer):
-    if customer_id not in CUSTOMERS:
+def update_customer(customer_id: str, customer: Customer):
+    if not db.update_customer(customer_id, customer.name, customer.email, customer.notes):
         raise HTTPException(status_code=404, detail="Customer not found")
     customer.id = customer_id
-    CUSTOMERS[customer_id] = customer
     return customer
 
 @app.delete("/customers/{customer_id}", dependencies=[Depends(get_current_user)])
-async def delete_customer(customer_id: str):
-    if customer_id not in CUSTOMERS:
+def delete_customer(customer_id: str):
+    if not db.delete_customer(customer_id):
         raise HTTPException(status_code=404, detail="Customer not found")
-    del CUSTOMERS[customer_id]
     return {"status": "deleted"}
 
 # -------------------------------
 # 6) Memory Management
 # -------------------------------
 @app.get("/customers/{customer_id}/memory/", dependencies=[Depends(get_current_user)])
-async def get_memory(customer_id: str):
-    return MEMORY.get(customer_id, [])
+def get_memory(customer_id: str):
+    return [MemoryEntry(id=e["id"], content=e["content"]) for e in db.list_memory(customer_id)]
 
 @app.post("/customers/{customer_id}/memory/", dependencies=[Depends(get_current_user)])
-async def add_memory(customer_id: str, entry: MemoryEntry):
+def add_memory(customer_id: str, entry: MemoryEntry):
     entry.id = str(uuid.uuid4())
-    MEMORY.setdefault(customer_id, []).append(entry)
+    db.add_memory(customer_id, entry.id, entry.content)
     return entry
 
+@app.get("/memory/search", dependencies=[Depends(get_current_user)])
+def search_memory(q: str, customer_id: Optional[str] = None, limit: int = 10, offset: int = 0):
+    # Volltextsuche im Kundengedächtnis (FTS5), optional pro Kunde, seitenweise
+    return memory_index.search(q, customer_id=customer_id, limit=min(limit, 100), offset=max(offset, 0))
+
 @app.put("/customers/{customer_id}/memory/{entry_id}", dependencies=[Depends(get_current_user)])
-async def update_memory(customer_id: str, entry_id: str, entry: MemoryEntry):
-    entries = MEMORY.get(customer_id, [])
-    for i, e in enumerate(entries):
-        if e.id == entry_id:
-            entry.id = entry_id
-            entries[i] = entry
-            return entry
-    raise HTTPException(status_code=404, detail="Entry not found")
+def update_memory(customer_id: str, entry_id: str, entry: MemoryEntry):
+    if not db.update_memory(customer_id, entry_id, entry.content):
+        raise HTTPException(status_code=404, detail="Entry not found")
+    entry.id = entry_id
+    return entry
 
 @app.delete("/customers/{customer_id}/memory/{entry_id}", dependencies=[Depends(get_current_user)])
-async def delete_memory(customer_id: str, entry_id: str):
-    entries = MEMORY.get(customer_id, [])
-    for i, e in enumerate(entries):
-        if e.id == entry_id:
-            del entries[i]
-            return {"status": "deleted"}
-    raise HTTPException(status_code=404, detail="Entry not found")
+def delete_memory(customer_id: str, entry_id: str):
+    if not db.delete_memory(customer_id, entry_id):
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return {"status": "deleted"}
 
 # -------------------------------
 # 7) Activity Log
 # -------------------------------
 @app.get("/activity-log/", dependencies=[Depends(get_current_user)])
-async def get_activity_log():
-    return ACTIVITY_LOG
+def get_activity_log(limit: Optional[int] = None, since: Optional[str] = None):
+    return [ActivityItem(**row) for row in db.list_activity(limit=limit, since=since)]
 
 # -------------------------------
 # 8) Usage Stats
 # -------------------------------
 @app.get("/usage-stats/", dependencies=[Depends(get_current_user)])
-async def usage_stats():
-    return USAGE_STATS
+def usage_stats():
+    return db.get_usage_stats()
 
 # -------------------------------
 # 9) Feedback
 # -------------------------------
 @app.post("/feedback/", dependencies=[Depends(get_current_user)])
-async def add_feedback(item: FeedbackItem):
-    FEEDBACKS.append(item)
+def add_feedback(item: FeedbackItem):
+    db.add_feedback(item.user, item.message, item.created_at)
     return {"status": "ok"}
 
 @app.get("/feedback/", dependencies=[Depends(get_current_user)])
-async def get_feedback():
-    return FEEDBACKS
+def get_feedback():
+    return [FeedbackItem(**row) for row in db.list_feedback()]
 
 # -------------------------------
 # 10) Lighthouse-History
 # -------------------------------
 @app.get("/lighthouse/{scan_id}", dependencies=[Depends(get_current_user)])
-async def get_lighthouse(scan_id: str):
-    return LIGHTHOUSE_HISTORY.get(scan_id, {})
+def get_lighthouse(scan_id: str):
+    return db.get_lighthouse(scan_id)
 
 # -------------------------------
 # 11) Reports Async (mit BackgroundTasks)
@@ -220,22 +365,23 @@ def generate_report(report_id: str):
     # Dummy-Ausgabe nach Wartezeit
     import time
     time.sleep(5)  # Simuliere langen Task
-    REPORTS[report_id] = ReportStatus(status="done", result="Dies ist der fertige Monatsreport für ID: " + report_id)
+    db.set_report(report_id, "done", "Dies ist der fertige Monatsreport für ID: " + report_id)
 
 @app.post("/monthly-report/", dependencies=[Depends(get_current_user)])
-async def create_report(background_tasks: BackgroundTasks):
+def create_report(background_tasks: BackgroundTasks):
     report_id = str(uuid.uuid4())
-    REPORTS[report_id] = ReportStatus(status="pending")
+    db.set_report(report_id, "pending")
     background_tasks.add_task(generate_report, report_id)
     return {"report_id": report_id}
 
 @app.get("/monthly-report/{report_id}/status", dependencies=[Depends(get_current_user)])
-async def report_status(report_id: str):
-    return REPORTS.get(report_id, {"status": "unknown"})
+def report_status(report_id: str):
+    report = db.get_report(report_id)
+    return ReportStatus(**report) if report else {"status": "unknown"}
 
 @app.get("/monthly-report/{report_id}/download", dependencies=[Depends(get_current_user)])
-async def report_download(report_id: str):
-    report = REPORTS.get(report_id)
-    if report and report.result:
-        return {"content": report.result}
+def report_download(report_id: str):
+    report = db.get_report(report_id)
+    if report and report["result"]:
+        return {"content": report["result"]}
     raise HTTPException(status_code=404, detail="Report not ready")
@@ -0,0 +1,137 @@
+# agent/api_bench.py
+"""
+Concurrency-Benchmark der API: N parallele /ask/-Requests gegen gestubbte Backends.
+
+- query.query_agent wird durch einen Stub ersetzt, der --latency Sekunden blockiert (time.sleep wie ein
+  synchroner Qdrant-/LLM-Call); DB-Logging und LangSmith-Tracing sind ebenfalls gestubbt →
+  gemessen wird nur das Request-Handling
+- Requests laufen in-process über httpx.ASGITransport gegen agent.api.app (kein Server, kein Netzwerk)
+- Während der Last wird /health/ laufend abgefragt: dessen Latenz zeigt, ob der Event-Loop frei bleibt
+- --inline: Baseline wie vor dem Threadpool – die blockierende Arbeit läuft direkt im Event-Loop
+- Parallelität ist durch API_BLOCKING_WORKERS begrenzt (50 Requests bei 32 Workern → zwei Wellen)
+
+CLI:
+  python -m agent.api_bench [--requests 50] [--latency 0.2] [--inline] [--json]
+"""
+from __future__ import annotations
+
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import argparse
+import contextlib
+from typing import Any, Dict, List, Optional
+
+from agent.stats import percentile
+
+_USER, _PASSWORD = "bench", "bench"
+
+
+async def _inline(fn: Any, *args: Any, **kwargs: Any) -> Any:
+    return fn(*args, **kwargs)
+
+
+async def _run(requests: int, latency: float, inline: bool) -> Dict[str, Any]:
+    import httpx
+    from agent import api, db, query
+
+    def _fake_query_agent(question: str, mode: str = "fast", clarifications: Any = None,
+                          conversation_id: Any = None, **_: Any) -> Dict[str, Any]:
+        time.sleep(latency)
+        return {"response": f"Antwort auf: {question}", "questions": [], "conversation_id": conversation_id or "bench"}
+
+    patches = [
+        (query, "query_agent", _fake_query_agent),
+        (db, "log_activity", lambda *a, **k: None),
+        (db, "increment_usage", lambda *a, **k: None),
+        (api, "langsmith_tracing", contextlib.nullcontext),
+    ]
+    if inline:
+        patches.append((api, "run_blocking", _inline))
+    originals = [(obj, name, getattr(obj, name)) for obj, name, _ in patches]
+    env = {k: os.environ.get(k) for k in ("APP_USER", "APP_PASS_HASH")}
+    os.environ["APP_USER"] = _USER
+    os.environ["APP_PASS_HASH"] = hashlib.sha256(_PASSWORD.encode()).hexdigest()
+    for obj, name, value in patches:
+        setattr(obj, name, value)
+    try:
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", auth=(_USER, _PASSWORD), timeout=None) as client:
+            (await client.get("/health/")).raise_for_status()  # Warm-up (Threadpools, Auth)
+            health_ms: List[float] = []
+            done = asyncio.Event()
+
+            async def _probe() -> None:
+                while not done.is_set():
+                    t = time.perf_counter()
+                    await client.get("/health/")
+                    health_ms.append((time.perf_counter() - t) * 1000)
+                    await asyncio.sleep(0.01)
+
+            async def _ask(i: int) -> float:
+                t = time.perf_counter()
+                resp = await client.post("/ask/", json={"question": f"Frage {i}"})
+                resp.raise_for_status()
+                return (time.perf_counter() - t) * 1000
+
+            prober = asyncio.create_task(_probe())
+            await asyncio.sleep(0)
+            start = time.perf_counter()
+            ask_ms = await asyncio.gather(*(_ask(i) for i in range(requests)))
+            wall = time.perf_counter() - start
+            done.set()
+            await prober
+    finally:
+        for obj, name, value in originals:
+            setattr(obj, name, value)
+        for key, value in env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    return {
+        "mode": "inline" if inline else "threadpool",
+        "requests": requests,
+        "backend_latency_s": latency,
+        "workers": 1 if inline else api.API_BLOCKING_WORKERS,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(requests / wall, 1) if wall else 0.0,
+        "ask_ms_p50": round(percentile(list(ask_ms), 50)),
+        "ask_ms_p95": round(percentile(list(ask_ms), 95)),
+        "health_probes": len(health_ms),
+        "health_ms_max": round(max(health_ms), 1) if health_ms else None,
+    }
+
+
+def run(requests: int = 50, latency: float = 0.2, inline: bool = False) -> Dict[str, Any]:
+    """Ein Benchmark-Lauf → Kennzahlen (Wall-Zeit, Durchsatz, /ask-Latenzen, max. /health-Latenz)."""
+    return asyncio.run(_run(requests, latency, inline))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parallele /ask/-Requests gegen gestubbte Backends")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="Blockierzeit des query_agent-Stubs in Sekunden")
+    parser.add_argument("--inline", action="store_true", help="Baseline: blockierende Arbeit im Event-Loop")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    result = run(args.requests, args.latency, args.inline)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"{result['mode']}: {result['requests']} × /ask/ à {result['backend_latency_s']}s "
+            f"mit {result['workers']} Worker(n) → {result['wall_s']}s, {result['throughput_rps']} req/s, "
+            f"p50 {result['ask_ms_p50']} ms, p95 {result['ask_ms_p95']} ms; "
+            f"/health/ max {result['health_ms_max']} ms ({result['health_probes']} Proben)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,9 +8,12 @@ Kernausrichtung:
 - Einheitliche Task-Namen (seo_optimization als kanonischer Name; Alias: seo_optimize)
 - Kein Deep/Standard-Modus mehr – Parameter wird toleriert, aber nicht verwendet
 - Optionales Speichern ins Memory nach erfolgreichem Lauf (save_to_memory=True)
+- Gesprächsverlauf pro conversation_id (conversation_store): follow_up="…" schickt nur
+  Verlauf + neue Frage statt den kompletten Kontext neu aufzubauen
 
 Voraussetzungen:
-- prompts.py liefert die *…_prompt_deep*-Vorlagen
+- prompts.py liefert die *…_prompt_deep*-Vorlagen (PrefixPrompt: statischer System-Teil +
+  variable Eingaben → Chat-Messages, damit der Provider den Präfix cachen kann)
 - loader.py liefert load_pdf, load_html (eigener Reader), extract_seo_signals
 - tools.lighthouse_runner liefert run_lighthouse(url)
 - context_utils.get_context_from_text_or_url vereinigt Text, URL, PDF & Kundengedächtnis
@@ -22,13 +25,18 @@ Rückgabeformat:
   "prompt_used": str,            # zur Nachvollziehbarkeit
   "conversation_id": Optional[str]
 }
+
+Streaming: stream_agent(...) liefert dieselben Daten als Event-Folge
+({"type": "token", ...} … {"type": "final", ..., "usage": {...}}).
 """
 from __future__ import annotations
 
 import os
 import uuid
 import json
-from typing import Any, Dict, Optional, List
+import math
+import time
+from typing import Any, Dict, Iterator, Optional, List, Tuple
 
 # --- Fallback-freundliche Imports (Repo-Struktur variiert lokal/Cloud) ---
 try:
@@ -92,8 +100,10 @@ except Exception:  # pragma: no cover
 
 try:
     from agent.customer_memory import save_customer_memory
+    from agent.memory_index import search as memory_search
 except Exception:  # pragma: no cover
     from customer_memory import save_customer_memory
+    from memory_index import search as memory_search
 
 try:
     from agent.activity_log import log_event
@@ -101,6 +111,13 @@ except Exception:  # pragma: no cover
     def log_event(payload: Dict[str, Any]):
         pass
 
+try:
+    from agent.llm_cache import lookup as cache_lookup, store as cache_store
+    from agent.usage import extract_usage, record_usage
+except Exception:  # pragma: no cover
+    from llm_cache import lookup as cache_lookup, store as cache_store
+    from usage import extract_usage, record_usage
+
 # Clarifier ist optional
 try:  # pragma: no cover
     from agent.clarifier import extract_questions_from_response, merge_clarifications
@@ -109,13 +126,20 @@ except Exception:  # pragma: no cover
     merge_clarifications = None
 
 try:
-    from langchain_openai import ChatOpenAI
+    from agent.llm_gateway import get_gateway
+    from agent.model_routing import resolve_route
+    from agent.tracing import span
+    from agent import conversation_store
 except Exception:  # pragma: no cover
-    ChatOpenAI = None
+    from llm_gateway import get_gateway
+    from model_routing import resolve_route
+    from tracing import span
+    import conversation_store
 
 
 # =======================
 # Anforderungen pro Task
+# (Modell/Output-Budget/Temperatur pro Task: model_routing.TASK_ROUTES → get_task_profile)
 # =======================
 TASK_REQUIREMENTS: Dict[str, Dict[str, str]] = {
     "seo_audit": {"url": "required"},
@@ -147,8 +171,16 @@ def _check_requirements(task: str, kwargs: Dict[str, Any]) -> None:
                 raise ValueError(f"Task '{task}' benötigt mindestens einen dieser Werte: {key}")
 
 
-# Single LLM-Client (keine Deep/Standard-Unterscheidung mehr)
-_llm = ChatOpenAI(model="gpt-4o", max_tokens=3000) if ChatOpenAI else None
+def get_task_profile(task: str) -> Dict[str, Any]:
+    """Anforderungen + LLM-Route (Modell, max_tokens, Temperatur) eines Tasks."""
+    if task == "seo_optimize":
+        task = "seo_optimization"
+    return {"requirements": TASK_REQUIREMENTS.get(task, {}), **resolve_route(task)}
+
+
+def _llm_kwargs(route: Dict[str, Any]) -> Dict[str, Any]:
+    # Rate-Limits, Queueing & Retries übernimmt das zentrale LLM-Gateway
+    return {"model": route["model"], "max_tokens": route["max_tokens"], "temperature": route["temperature"]}
 
 
 def _safe_questions(text: str) -> List[str]:
@@ -160,61 +192,55 @@ def _safe_questions(text: str) -> List[str]:
     return []
 
 
-def _maybe_merge_clarifications(prompt: str, clarifications: Optional[Dict[str, Any]]) -> str:
+def _maybe_merge_clarifications(messages: List[Dict[str, str]], clarifications: Optional[Dict[str, Any]]) -> List[Dict[str, str]]:
+    # Klarstellungen gehören zu den variablen Eingaben → nur die letzte User-Message ändern,
+    # der statische System-Präfix bleibt unverändert (Prompt-Caching)
     if merge_clarifications and clarifications:
         try:
-            return merge_clarifications(prompt, clarifications)
+            *head, last = messages
+            return [*head, {**last, "content": merge_clarifications(last["content"], clarifications)}]
         except Exception:
-            return prompt
-    return prompt
+            return messages
+    return messages
+
+
+def _prompt_text(messages: Optional[List[Dict[str, str]]]) -> str:
+    """Messages als ein String (prompt_used, Token-Schätzung)."""
+    return "".join(m.get("content", "") for m in messages or [])
 
 
 # =======================
-# Hauptschnittstelle
+# Prompt-Aufbau (gemeinsam für run_agent & stream_agent)
 # =======================
 
-def run_agent(
-    task: str,
-    *,
-    conversation_id: Optional[str] = None,
-    clarifications: Optional[Dict[str, Any]] = None,
-    save_to_memory: bool = False,
-    **kwargs: Any,
-) -> Dict[str, Any]:
-    """Führt einen Marketing-Subtask anhand der Prompts aus.
-
-    Wichtige Design-Entscheidung: Alle externen Daten (RSS, Trends, DESTATIS, Ads,
-    zusätzliche HTML-Kontexte etc.) sollen vom Context Merger geladen & hier nur als Felder
-    (z. B. rss_snippets, trends_insights, destatis_stats, google_ads …) übergeben werden.
-    """
-    if not conversation_id:
-        conversation_id = str(uuid.uuid4())
+def _format(template: Any, **fields: Any) -> List[Dict[str, str]]:
+    with span("format_prompt"):
+        return template.messages(**fields)
 
-    # Alias-Gleichzug
-    if task == "seo_optimize":
-        task = "seo_optimization"
 
-    # Anforderungen prüfen
-    _check_requirements(task, kwargs)
+def _build_prompt(task: str, kwargs: Dict[str, Any], conversation_id: str) -> Tuple[Optional[List[Dict[str, str]]], Optional[Dict[str, Any]]]:
+    """Baut den Prompt (Chat-Messages: System-Präfix + Eingaben) für einen Task.
 
+    Rückgabe: (messages, None) – oder (None, fertiges Ergebnis) für Memory-Tasks ohne LLM-Call.
+    """
     # Hilfs-Kontext (nur falls nötig) – bevorzugt: bereits gemergter Kontext via kwargs["text"]
     def _ctx_from_inputs() -> str:
-        return get_context_from_text_or_url(
-            kwargs.get("text", ""),
-            kwargs.get("url", ""),
-            kwargs.get("customer_id"),
-            kwargs.get("pdf_path"),
-        )
+        with span("fetch.context", url=kwargs.get("url") or None, customer_id=kwargs.get("customer_id")):
+            return get_context_from_text_or_url(
+                kwargs.get("text", ""),
+                kwargs.get("url", ""),
+                kwargs.get("customer_id"),
+                kwargs.get("pdf_path"),
+            )
 
     prompt = None
-    response_text = None
 
     # ---------------
     # Routing
     # ---------------
     if task == "content_analysis":
         ctx = kwargs.get("text") or _ctx_from_inputs()
-        prompt = content_analysis_prompt_deep.format(
+        prompt = _format(content_analysis_prompt_deep,
             context=ctx,
             rss_snippets=kwargs.get("rss_snippets", ""),
             trends_insights=kwargs.get("trends_insights", ""),
@@ -223,7 +249,7 @@ def run_agent(
 
     elif task == "content_writing":
         ctx = kwargs.get("text") or _ctx_from_inputs()
-        prompt = content_write_prompt_deep.format(
+        prompt = _format(content_write_prompt_deep,
             zielgruppe=kwargs.get("zielgruppe", ""),
             tonalitaet=kwargs.get("tonalitaet", ""),
             thema=kwargs.get("thema", ""),
@@ -236,7 +262,7 @@ def run_agent(
 
     elif task == "campaign_plan":
         ctx = kwargs.get("text") or _ctx_from_inputs()
-        prompt = campaign_plan_prompt_deep.format(
+        prompt = _format(campaign_plan_prompt_deep,
             context=ctx,
             zielgruppe=kwargs.get("zielgruppe", ""),
             thema=kwargs.get("thema", ""),
@@ -254,7 +280,7 @@ def run_agent(
         topic_keywords = kwargs.get("topic_keywords")
         if isinstance(topic_keywords, list):
             topic_keywords = ", ".join([t for t in topic_keywords if t])
-        prompt = tactical_actions_prompt_deep.format(
+        prompt = _format(tactical_actions_prompt_deep,
             context=ctx,
             ziel=kwargs.get("ziel", ""),
             zeitfenster=kwargs.get("zeitfenster", ""),
@@ -271,19 +297,21 @@ def run_agent(
         url = kwargs.get("url", "").strip()
         if url and scrape_html and extract_text_blocks:
             try:
-                html = scrape_html(url)
+                with span("fetch.scrape_html", url=url):
+                    html = scrape_html(url)
                 ctx_website = "\n".join(extract_text_blocks(html))
             except Exception as e:
                 ctx_website = f"[Fehler beim Laden/Parsen: {e}]"
         else:
             # Fallback: Leser aus loader.py
             try:
-                ctx_website = loader_load_html(url)
+                with span("fetch.load_html", url=url):
+                    ctx_website = loader_load_html(url)
             except Exception as e:
                 ctx_website = f"[Fehler beim Laden/Parsen: {e}]"
 
         base_ctx = kwargs.get("text") or _ctx_from_inputs()
-        prompt = landingpage_strategy_contextual_prompt_deep.format(
+        prompt = _format(landingpage_strategy_contextual_prompt_deep,
             context=base_ctx,
             context_website=ctx_website,
             zielgruppe=kwargs.get("zielgruppe", ""),
@@ -305,7 +333,8 @@ def run_agent(
         image_context = "[Kein Bild-Scraper verfügbar]"
         if extract_images_from_url and url:
             try:
-                images = extract_images_from_url(url)
+                with span("fetch.images", url=url):
+                    images = extract_images_from_url(url)
                 if isinstance(images, list) and images:
                     lines = []
                     for i, img in enumerate(images[:40], 1):
@@ -318,7 +347,7 @@ def run_agent(
                     image_context = "\n".join(lines)
             except Exception as e:
                 image_context = f"[Fehler beim Laden der Bilder: {e}]"
-        prompt = alt_tag_writer_prompt_deep.format(
+        prompt = _format(alt_tag_writer_prompt_deep,
             url=url,
             branche=branche,
             zielgruppe=zielgruppe,
@@ -332,7 +361,7 @@ def run_agent(
             text = _ctx_from_inputs().strip()
         if not text:
             raise ValueError("❗ Kein Text übergeben für Topic-Extraktion.")
-        prompt = extract_topics_prompt_deep.format(text=text)
+        prompt = _format(extract_topics_prompt_deep, text=text)
 
     elif task == "seo_audit":
         ctx = kwargs.get("text") or _ctx_from_inputs()
@@ -347,7 +376,8 @@ def run_agent(
         headings = ""
         num_links = cta_links = 0
         try:
-            sig = extract_seo_signals(url)
+            with span("fetch.seo_signals", url=url):
+                sig = extract_seo_signals(url)
             title = sig.get("title", "")
             meta_description = sig.get("meta_description", "")
             headings = "\n".join(sig.get("headings", [])[:10])
@@ -355,7 +385,7 @@ def run_agent(
             cta_links = sig.get("cta_links", 0)
         except Exception:
             pass
-        prompt = seo_audit_prompt_deep.format(
+        prompt = _format(seo_audit_prompt_deep,
             contexts_combined=ctx,
             zielgruppe=zielgruppe,
             thema=thema,
@@ -372,7 +402,7 @@ def run_agent(
 
     elif task == "seo_optimization":  # alias oben abgefangen
         ctx = kwargs.get("text") or _ctx_from_inputs()
-        prompt = seo_optimization_prompt_deep.format(
+        prompt = _format(seo_optimization_prompt_deep,
             contexts_combined=ctx,
             focus_url=kwargs.get("url", ""),
             seo_audit_summary=kwargs.get("seo_audit_summary", ""),
@@ -398,13 +428,14 @@ def run_agent(
             # pro URL: (leichter) Seitentext + Lighthouse-Kern
             ctx_u = base_ctx
             try:
-                lh_raw = run_lighthouse(u)
+                with span("fetch.lighthouse", url=u):
+                    lh_raw = run_lighthouse(u)
                 last_lh_json = json.dumps(lh_raw.get("categories", {}).get("seo", {}), indent=2) if isinstance(lh_raw, dict) else str(lh_raw)
             except Exception as e:
                 last_lh_json = f"[Fehler bei Lighthouse: {e}]"
             analyses.append(f"""=== {u} ===\n\nWebsite-Kontext:\n{ctx_u}\n\nLighthouse-Report:\n{last_lh_json}""")
         combined_input = "\n\n".join(analyses)
-        prompt = seo_lighthouse_prompt_deep.format(
+        prompt = _format(seo_lighthouse_prompt_deep,
             context=base_ctx,
             context_website=combined_input,
             branche=kwargs.get("branche", ""),
@@ -419,7 +450,7 @@ def run_agent(
         ctx_customer = kwargs.get("text") or _ctx_from_inputs()
         # Optional können hier bereits zusammengeführte Wettbewerbs-Kontexte übergeben werden
         competitors_context = kwargs.get("competitors_context", "")
-        prompt = competitive_analysis_prompt_deep.format(
+        prompt = _format(competitive_analysis_prompt_deep,
             kunde_name=kwargs.get("customer_name", "Unsere Firma"),
             branche=kwargs.get("branche", "Allgemein"),
             zielgruppe=kwargs.get("zielgruppe", "Kunden"),
@@ -438,44 +469,103 @@ def run_agent(
         if not customer_id:
             raise ValueError("Kein Kunden-ID vorhanden.")
         save_customer_memory(customer_id, content)
-        return {"response": f"🧠 Kontext gespeichert für Kunde {customer_id}.", "questions": [], "prompt_used": "", "conversation_id": conversation_id}
+        return None, {"response": f"🧠 Kontext gespeichert für Kunde {customer_id}.", "questions": [], "prompt_used": "", "conversation_id": conversation_id}
 
     elif task == "memory_search":
-        # Einfache Volltextsuche (Fallback, wenn vektorbasierte Suche nicht vorhanden)
-        query = (kwargs.get("query") or "").strip().lower()
+        # Volltextsuche über den FTS5-Index (optional auf einen Kunden beschränkt, seitenweise)
+        query = (kwargs.get("query") or "").strip()
         if not query:
             raise ValueError("Kein Suchbegriff übergeben.")
-        folder = os.path.join(os.getcwd(), "customer_memory")
-        matches: List[str] = []
-        if os.path.isdir(folder):
-            for fn in os.listdir(folder):
-                if not fn.endswith(".json"):
-                    continue
-                try:
-                    data = json.load(open(os.path.join(folder, fn), "r"))
-                    for item in data:
-                        content = item.get("content", "")
-                        if query in content.lower():
-                            matches.append(content)
-                except Exception:
-                    continue
-        return {"response": "\n\n".join(matches) if matches else "❌ Keine passenden Inhalte im Memory gefunden.", "questions": [], "prompt_used": "", "conversation_id": conversation_id}
+        limit = int(kwargs.get("limit") or 10)
+        offset = int(kwargs.get("offset") or 0)
+        with span("memory_search"):
+            found = memory_search(query, customer_id=kwargs.get("customer_id"), limit=limit, offset=offset)
+        if found["hits"]:
+            lines = [f"{offset + 1}–{offset + len(found['hits'])} von {found['total']} Treffern"]
+            lines += [f"- [{h['customer_id']} · {h['timestamp'] or '–'}] {h['snippet']}" for h in found["hits"]]
+            response = "\n\n".join(lines)
+        else:
+            response = "❌ Keine passenden Inhalte im Memory gefunden."
+        return None, {"response": response, "questions": [], "prompt_used": "", "conversation_id": conversation_id, "total": found["total"], "hits": found["hits"]}
 
     else:
         raise ValueError(f"Unbekannter Task: {task}")
 
+    return prompt, None
+
+
+def _prepare_run(
+    task: str,
+    conversation_id: Optional[str],
+    clarifications: Optional[Dict[str, Any]],
+    kwargs: Dict[str, Any],
+    follow_up: Optional[str] = None,
+) -> Tuple[str, str, Optional[List[Dict[str, str]]], Optional[Dict[str, Any]], Optional[List[Dict[str, str]]]]:
+    """Alias, Anforderungen, Prompt & Klarstellungen – alles vor dem LLM-Call.
+
+    Letzter Rückgabewert: das Delta eines Folge-Turns (nur die neue Nachricht) oder None
+    bei einem neuen Lauf.
+    """
+    if not conversation_id:
+        conversation_id = str(uuid.uuid4())
+
+    # Alias-Gleichzug
+    if task == "seo_optimize":
+        task = "seo_optimization"
+
+    # Folgefrage mit bekanntem Verlauf: kein Kontext-/Prompt-Neuaufbau, nur das Delta
+    delta = [{"role": "user", "content": follow_up}] if follow_up else None
+    if delta:
+        with span("load_conversation"):
+            prompt = conversation_store.messages_for(conversation_id, delta)
+        if prompt is not None:
+            return task, conversation_id, prompt, None, delta
+
+    # Anforderungen prüfen
+    _check_requirements(task, kwargs)
+
+    with span("build_prompt", task=task):
+        prompt, early_result = _build_prompt(task, kwargs, conversation_id)
+    if early_result is not None:
+        return task, conversation_id, None, early_result, None
+
     # Klarstellungen in Prompt einfügen (optional)
     prompt = _maybe_merge_clarifications(prompt, clarifications)
+    if delta:
+        # Folgefrage ohne gespeicherten Verlauf → neuer Lauf mit der Frage als zusätzliche Nachricht
+        prompt = prompt + delta
+    return task, conversation_id, prompt, None, None
+
 
-    # --- LLM Call ---
-    if _llm is None:
-        raise RuntimeError("LLM-Client nicht initialisiert (langchain_openai fehlt)")
-    resp = _llm.invoke(prompt)
-    response_text = resp.content if hasattr(resp, "content") else str(resp)
+def _finish_run(
+    task: str,
+    conversation_id: str,
+    prompt: List[Dict[str, str]],
+    response_text: str,
+    save_to_memory: bool,
+    kwargs: Dict[str, Any],
+    call_info: Optional[Dict[str, Any]] = None,
+    delta: Optional[List[Dict[str, str]]] = None,
+) -> Dict[str, Any]:
+    """Folgefragen, Verlauf, optionales Memory-Speichern & Logging nach dem LLM-Call.
 
+    call_info: Route/Modell/Latenz/Tokens (inkl. cached_tokens) des Calls – landet im
+    task_run-Event (Routing-Report, Prompt-Cache-Trefferquote je Task).
+    delta: neue Nachricht(en) eines Folge-Turns; None → Verlauf beginnt mit diesem Prompt neu.
+    """
     # Folgefragen extrahieren (optional)
     questions = _safe_questions(response_text)
 
+    # Verlauf fortschreiben (Basis für spätere Follow-ups)
+    try:
+        with span("save_conversation"):
+            if delta is None:
+                conversation_store.start(conversation_id, prompt, response_text, task=task)
+            else:
+                conversation_store.append(conversation_id, delta, response_text, customer_id=kwargs.get("customer_id"))
+    except Exception:
+        pass
+
     # Optional: Ergebnis ins Memory drücken
     if save_to_memory and kwargs.get("customer_id"):
         try:
@@ -485,13 +575,170 @@ def run_agent(
 
     # Logging (leichtgewichtig)
     try:
-        log_event({"type": "task_run", "task": task, "customer_id": kwargs.get("customer_id"), "conversation_id": conversation_id})
+        log_event({"type": "task_run", "task": task, "customer_id": kwargs.get("customer_id"), "conversation_id": conversation_id, **(call_info or {})})
     except Exception:
         pass
 
     return {
         "response": response_text,
         "questions": questions,
-        "prompt_used": prompt,
+        "prompt_used": _prompt_text(prompt),
         "conversation_id": conversation_id,
     }
+
+
+def _chunk_usage(chunk: Any) -> Optional[Dict[str, int]]:
+    """Token-Usage aus einem Stream-Chunk (nur vorhanden, wenn der Provider sie mitsendet)."""
+    usage = getattr(chunk, "usage_metadata", None)
+    if not usage:
+        return None
+    return {
+        "input_tokens": int(usage.get("input_tokens") or 0),
+        "output_tokens": int(usage.get("output_tokens") or 0),
+        "cached_tokens": int((usage.get("input_token_details") or {}).get("cache_read") or 0),
+    }
+
+
+# =======================
+# Hauptschnittstelle
+# =======================
+
+def run_agent(
+    task: str,
+    *,
+    conversation_id: Optional[str] = None,
+    clarifications: Optional[Dict[str, Any]] = None,
+    save_to_memory: bool = False,
+    use_cache: bool = True,
+    follow_up: Optional[str] = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """Führt einen Marketing-Subtask anhand der Prompts aus.
+
+    Wichtige Design-Entscheidung: Alle externen Daten (RSS, Trends, DESTATIS, Ads,
+    zusätzliche HTML-Kontexte etc.) sollen vom Context Merger geladen & hier nur als Felder
+    (z. B. rss_snippets, trends_insights, destatis_stats, google_ads …) übergeben werden.
+
+    use_cache=False umgeht den Exact-Match-Antwort-Cache (z. B. für bewusstes "Neu generieren").
+    follow_up: Folgefrage zu conversation_id – gesendet werden nur Verlauf (ggf. zusammengefasst)
+    und die neue Frage; ohne gespeicherten Verlauf läuft der Task normal mit der Frage als Zusatz.
+    """
+    with span("run_agent", task=task, customer_id=kwargs.get("customer_id")) as root:
+        task, conversation_id, prompt, early_result, delta = _prepare_run(task, conversation_id, clarifications, kwargs, follow_up)
+        root.set("conversation_id", conversation_id)
+        if early_result is not None:
+            return early_result
+
+        # --- LLM Call (Route pro Task, mit Exact-Match-Cache) ---
+        route = resolve_route(task)
+        llm_kwargs = _llm_kwargs(route)
+        call_info: Dict[str, Any] = {"route": route["route"], "model": route["model"]}
+        with span("cache_lookup"):
+            cache_key, cached = cache_lookup(
+                route["model"], llm_kwargs, prompt,
+                use_cache=use_cache, task=task,
+                customer_id=kwargs.get("customer_id"), conversation_id=conversation_id,
+            )
+        if cached is not None:
+            response_text = cached["response"]
+            call_info["cache_hit"] = True
+        else:
+            with span("llm_call", model=route["model"]) as llm_span:
+                started = time.perf_counter()
+                resp = get_gateway().invoke(prompt, **llm_kwargs)
+                response_text = resp.content if hasattr(resp, "content") else str(resp)
+                usage = extract_usage(resp)
+                call_info.update(record_usage(
+                    usage, task=task, model=route["model"],
+                    latency_ms=round((time.perf_counter() - started) * 1000),
+                    customer_id=kwargs.get("customer_id"), conversation_id=conversation_id,
+                ))
+                llm_span.set("input_tokens", usage["input_tokens"])
+                llm_span.set("output_tokens", usage["output_tokens"])
+            cache_store(cache_key, route["model"], response_text, usage)
+        root.set("cache_hit", bool(call_info.get("cache_hit")))
+
+        with span("finish"):
+            return _finish_run(task, conversation_id, prompt, response_text, save_to_memory, kwargs, call_info, delta)
+
+
+def stream_agent(
+    task: str,
+    *,
+    conversation_id: Optional[str] = None,
+    clarifications: Optional[Dict[str, Any]] = None,
+    save_to_memory: bool = False,
+    use_cache: bool = True,
+    follow_up: Optional[str] = None,
+    **kwargs: Any,
+) -> Iterator[Dict[str, Any]]:
+    """Streaming-Variante von run_agent.
+
+    Prompt-Aufbau & Anforderungsprüfung laufen sofort (Fehler werfen beim Aufruf, nicht erst
+    beim Iterieren). Der zurückgegebene Iterator liefert:
+      {"type": "token", "content": str}                       – je Token-Chunk
+      {"type": "final", "response", "questions", "conversation_id", "usage", "prompt_used"}
+    Das "final"-Event kommt immer zuletzt.
+    """
+    with span("stream_agent", task=task, customer_id=kwargs.get("customer_id")) as root:
+        task, conversation_id, prompt, early_result, delta = _prepare_run(task, conversation_id, clarifications, kwargs, follow_up)
+        root.set("conversation_id", conversation_id)
+        route = resolve_route(task)
+        llm_kwargs = _llm_kwargs(route)
+        if early_result is None:
+            get_gateway().client(**llm_kwargs)  # fehlender Client → Fehler sofort, nicht erst im Stream
+
+    def _events() -> Iterator[Dict[str, Any]]:
+        if early_result is not None:
+            # Memory-Tasks: kein LLM, Ergebnis als ein Token + Abschluss
+            yield {"type": "token", "content": early_result["response"]}
+            yield {"type": "final", **early_result, "usage": None}
+            return
+
+        call_info: Dict[str, Any] = {"route": route["route"], "model": route["model"]}
+        with span("cache_lookup", parent=root):
+            cache_key, cached = cache_lookup(
+                route["model"], llm_kwargs, prompt,
+                use_cache=use_cache, task=task,
+                customer_id=kwargs.get("customer_id"), conversation_id=conversation_id,
+            )
+        if cached is not None:
+            # Cache-Hit: komplette Antwort als ein Token, keine verbrauchten Tokens
+            yield {"type": "token", "content": cached["response"]}
+            result = _finish_run(task, conversation_id, prompt, cached["response"], save_to_memory, kwargs, {**call_info, "cache_hit": True}, delta)
+            yield {"type": "final", **result, "usage": {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cached": True}}
+            return
+
+        parts: List[str] = []
+        usage: Optional[Dict[str, int]] = None
+        started = time.perf_counter()
+        # Root-Span ist bereits beendet (Vorbereitung) – der Stream hängt explizit darunter
+        with span("llm_stream", parent=root, model=route["model"]) as llm_span:
+            for chunk in get_gateway().stream(prompt, **llm_kwargs):
+                text = chunk.content if hasattr(chunk, "content") else str(chunk)
+                usage = _chunk_usage(chunk) or usage
+                if text:
+                    if not parts:
+                        llm_span.set("ttft_ms", round((time.perf_counter() - started) * 1000))
+                    parts.append(text)
+                    yield {"type": "token", "content": text}
+
+        response_text = "".join(parts)
+        if usage is None:
+            # Provider liefert im Stream keine Usage → grobe Schätzung (≈ 4 Zeichen/Token)
+            usage = {
+                "input_tokens": math.ceil(len(_prompt_text(prompt)) / 4),
+                "output_tokens": math.ceil(len(response_text) / 4),
+                "cached_tokens": 0,
+                "estimated": True,
+            }
+        call_info.update(record_usage(
+            usage, task=task, model=route["model"],
+            latency_ms=round((time.perf_counter() - started) * 1000),
+            customer_id=kwargs.get("customer_id"), conversation_id=conversation_id,
+        ))
+        cache_store(cache_key, route["model"], response_text, usage)
+        result = _finish_run(task, conversation_id, prompt, response_text, save_to_memory, kwargs, call_info, delta)
+        yield {"type": "final", **result, "usage": usage}
+
+    return _events()
@@ -0,0 +1,199 @@
+# agent/batch.py
+"""
+Batch-Modus: einen Task für alle (oder ausgewählte) Kunden aus kunden_index.json ausführen.
+
+- Begrenzte Parallelität (BATCH_CONCURRENCY Worker); LLM-Rate-Limits (RPM/TPM) hält das
+  zentrale LLM-Gateway ein – zu viele Worker warten dort in der Queue statt 429 zu erzeugen
+- Checkpoint: nach jedem Kunden wird .cache/batches/<batch_id>.json atomar geschrieben;
+  ein erneuter Lauf mit derselben batch_id überspringt erfolgreich erledigte Kunden
+- Ergebnis landet über run_agent(save_to_memory=True) im Kundengedächtnis
+- Fortschritt & Durchsatz: Callback, batch_progress-Events im Activity-Log, CLI-Ausgabe
+
+CLI:
+  python -m agent.batch content_analysis [--concurrency 4] [--batch-id ID] [--customers A,B] [--param k=v ...]
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    from agent.base_agent import run_agent
+    from agent.customer_memory import get_customer_name_id_pairs
+    from agent.tracing import span
+except Exception:  # pragma: no cover
+    from base_agent import run_agent
+    from customer_memory import get_customer_name_id_pairs
+    from tracing import span
+
+try:
+    from agent.activity_log import log_event
+except Exception:  # pragma: no cover
+    def log_event(payload: Dict[str, Any]):
+        pass
+
+BATCH_DIR = os.getenv("BATCH_DIR", os.path.join(".cache", "batches"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+def _checkpoint_path(batch_id: str) -> str:
+    return os.path.join(BATCH_DIR, f"{batch_id}.json")
+
+
+def _save_checkpoint(state: Dict[str, Any]) -> None:
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    path = _checkpoint_path(state["batch_id"])
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)  # atomar: nach einem Crash liegt immer ein vollständiger Stand vor
+
+
+def load_status(batch_id: str) -> Optional[Dict[str, Any]]:
+    """Checkpoint eines Batches (oder None, wenn unbekannt)."""
+    path = _checkpoint_path(batch_id)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def run_batch(
+    task: str,
+    *,
+    customer_ids: Optional[List[str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    batch_id: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    save_to_memory: bool = True,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Führt `task` für jeden Kunden aus und liefert den finalen Checkpoint-Stand.
+
+    batch_id: bestehende ID → Resume (erfolgreiche Kunden werden übersprungen, Fehler erneut versucht).
+    on_progress: wird nach jedem Kunden mit {"done", "total", "customer_id", "status", "throughput_per_min"} aufgerufen.
+    """
+    batch_id = batch_id or str(uuid.uuid4())
+    state = load_status(batch_id) or {
+        "batch_id": batch_id,
+        "task": task,
+        "params": params or {},
+        "created_at": _now_iso(),
+        "customers": {},
+    }
+    if state["task"] != task:
+        raise ValueError(f"Batch {batch_id} gehört zu Task '{state['task']}', nicht '{task}'")
+    params = state["params"] if params is None else params
+
+    index = get_customer_name_id_pairs()  # {name: id}
+    names = {cid: name for name, cid in index.items()}
+    targets = customer_ids or list(names.keys())
+    if not targets:
+        raise ValueError("Keine Kunden für den Batch gefunden")
+    todo = [cid for cid in targets if (state["customers"].get(cid) or {}).get("status") != "ok"]
+
+    state.update(status="running", total=len(targets), started_at=_now_iso())
+    _save_checkpoint(state)
+
+    lock = threading.Lock()
+    started = time.perf_counter()
+    processed = 0
+
+    def _one(cid: str) -> Dict[str, Any]:
+        t = time.perf_counter()
+        try:
+            out = run_agent(
+                task,
+                save_to_memory=save_to_memory,
+                customer_id=cid,
+                customer_name=names.get(cid, cid),
+                **params,
+            )
+            return {"status": "ok", "conversation_id": out.get("conversation_id"),
+                    "duration_ms": round((time.perf_counter() - t) * 1000)}
+        except Exception as e:
+            return {"status": "error", "error": str(e), "duration_ms": round((time.perf_counter() - t) * 1000)}
+
+    with span("batch", batch_id=batch_id, task=task, customers=len(todo)):
+        with ThreadPoolExecutor(max_workers=concurrency or BATCH_CONCURRENCY) as pool:
+            futures = {pool.submit(contextvars.copy_context().run, _one, cid): cid for cid in todo}
+            for fut in as_completed(futures):
+                cid = futures[fut]
+                entry = {**fut.result(), "finished_at": _now_iso()}
+                with lock:
+                    processed += 1
+                    state["customers"][cid] = entry
+                    done = sum(1 for c in targets if (state["customers"].get(c) or {}).get("status") == "ok")
+                    elapsed = time.perf_counter() - started
+                    progress = {
+                        "batch_id": batch_id,
+                        "done": done,
+                        "processed": processed,
+                        "total": len(targets),
+                        "customer_id": cid,
+                        "status": entry["status"],
+                        "throughput_per_min": round(processed / elapsed * 60, 2) if elapsed > 0 else None,
+                    }
+                    state["progress"] = progress
+                    _save_checkpoint(state)
+                try:
+                    log_event({"type": "batch_progress", "task": task, **progress})
+                except Exception:
+                    pass
+                if on_progress:
+                    on_progress(progress)
+
+    elapsed = time.perf_counter() - started
+    failed = [c for c in targets if (state["customers"].get(c) or {}).get("status") != "ok"]
+    state.update(
+        status="done" if not failed else "done_with_errors",
+        finished_at=_now_iso(),
+        ok=len(targets) - len(failed),
+        failed=len(failed),
+        resumed=len(targets) - len(todo),
+        elapsed_s=round(elapsed, 1),
+        throughput_per_min=round(len(todo) / elapsed * 60, 2) if elapsed > 0 and todo else None,
+    )
+    _save_checkpoint(state)
+    return state
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Task für alle Kunden ausführen (Batch)")
+    parser.add_argument("task")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--batch-id", default=None, help="bestehende ID → Resume")
+    parser.add_argument("--customers", default=None, help="kommagetrennte Kunden-IDs (Default: alle)")
+    parser.add_argument("--param", action="append", default=[], help="zusätzliches Feld, z. B. --param zielgruppe=KMU")
+    parser.add_argument("--no-save", action="store_true", help="Ergebnisse nicht ins Memory schreiben")
+    args = parser.parse_args()
+
+    extra = dict(p.split("=", 1) for p in args.param if "=" in p)
+
+    def _print(p: Dict[str, Any]) -> None:
+        print(f"[{p['processed']}/{p['total']}] {p['customer_id']}: {p['status']} – {p['throughput_per_min']} Kunden/min", flush=True)
+
+    result = run_batch(
+        args.task,
+        customer_ids=args.customers.split(",") if args.customers else None,
+        params=extra or None,
+        batch_id=args.batch_id,
+        concurrency=args.concurrency,
+        save_to_memory=not args.no_save,
+        on_progress=_print,
+    )
+    print(f"Batch {result['batch_id']}: {result['ok']} ok, {result['failed']} Fehler, "
+          f"{result['resumed']} übersprungen, {result['elapsed_s']} s")
@@ -0,0 +1,92 @@
+# agent/clients.py
+"""
+Gemeinsamer Provider für schwere Clients – erst beim ersten Zugriff erzeugt.
+
+- get_qdrant():          QdrantClient (QDRANT_URL / QDRANT_API_KEY)
+- get_embeddings():      OpenAIEmbeddings (text-embedding-3-small)
+- get_langsmith_tracer(): LangChainTracer; langsmith_tracing() als Context-Manager für Endpoints
+- get_chat(...):         ChatOpenAI-Client des LLM-Gateways (eigene Instanz pro Modell/Budget/Temperatur)
+
+Ein Import von agent.* baut damit keine Clients mehr und zieht weder LangChain noch
+qdrant_client nach; fehlende ENV-Variablen fallen erst beim ersten echten Aufruf auf.
+initialized() zeigt, was bereits erzeugt wurde (Startup-Benchmark: agent.startup_bench).
+"""
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+_instances: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def _lazy(name: str, factory: Callable[[], Any]) -> Any:
+    with _lock:
+        if name not in _instances:
+            _instances[name] = factory()
+        return _instances[name]
+
+
+def initialized() -> List[str]:
+    """Namen der bereits erzeugten Clients."""
+    with _lock:
+        return sorted(_instances)
+
+
+def reset() -> None:
+    """Alle Clients verwerfen (z. B. nach geänderten ENV-Variablen)."""
+    with _lock:
+        _instances.clear()
+
+
+def get_qdrant() -> Any:
+    def _make() -> Any:
+        from qdrant_client import QdrantClient
+
+        return QdrantClient(url=os.getenv("QDRANT_URL"), api_key=os.getenv("QDRANT_API_KEY"))
+
+    return _lazy("qdrant", _make)
+
+
+def get_embeddings() -> Any:
+    def _make() -> Any:
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(model=EMBEDDING_MODEL)
+
+    return _lazy("embeddings", _make)
+
+
+def get_langsmith_tracer() -> Any:
+    def _make() -> Any:
+        from langchain.callbacks.tracers import LangChainTracer
+
+        return LangChainTracer()
+
+    return _lazy("langsmith_tracer", _make)
+
+
+@contextmanager
+def langsmith_tracing() -> Iterator[Optional[Any]]:
+    """LangSmith-Tracing für den umschlossenen Block (no-op, wenn LangChain fehlt)."""
+    try:
+        from langchain_core.tracers.context import tracing_v2_enabled
+    except Exception:
+        yield None
+        return
+    with tracing_v2_enabled() as session:
+        session.add_tracer(get_langsmith_tracer())
+        yield session
+
+
+def get_chat(model: Optional[str] = None, max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> Any:
+    """ChatOpenAI-Client über das Gateway (Rate-Limits/Retries bleiben dort)."""
+    try:
+        from agent.llm_gateway import get_gateway, DEFAULT_MODEL, DEFAULT_MAX_TOKENS
+    except Exception:  # pragma: no cover
+        from llm_gateway import get_gateway, DEFAULT_MODEL, DEFAULT_MAX_TOKENS
+    return get_gateway().client(model or DEFAULT_MODEL, max_tokens or DEFAULT_MAX_TOKENS, temperature)
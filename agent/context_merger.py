@@ -34,10 +34,10 @@ import traceback
 from dataclasses import dataclass, asdict
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from langchain_openai import ChatOpenAI
-
 # === Local deps (existing project helpers) ===
 from agent.customer_memory import load_customer_memory
+from agent.memory_compaction import MEMORY_CONTEXT_TOKENS
+from agent.memory_vectors import MEMORY_TOP_K, search as search_memory_vectors
 from agent.loader import load_pdf, extract_seo_signals
 from agent.tools.scraper import scrape_html
 from agent.tools.parser import extract_text_blocks
@@ -53,11 +53,17 @@ from agent.prompts import (
     context_merger_planner_prompt,
     context_merger_executor_prompt,
 )
+from agent.model_routing import resolve_route
+from agent.usage import timed_invoke
+from agent.tracing import span
 
 # ---------------------------
-# Model setup
+# Model setup (Calls laufen über das zentrale LLM-Gateway, Route je Phase; Usage wird geloggt)
 # ---------------------------
-llm = ChatOpenAI(model="gpt-4o", max_tokens=3000)
+def _invoke(phase: str, prompt: str, customer_id: Optional[str] = None) -> Any:
+    route = resolve_route(phase)
+    with span("llm_call", phase=phase, model=route["model"]):
+        return timed_invoke(prompt, task=phase, route=route, customer_id=customer_id)
 
 # ---------------------------
 # Data contracts
@@ -176,12 +182,42 @@ class CustomerMemoryCollector(SourceCollector):
     label = "Kunden-Gedächtnis"
     category = "customer"
 
+    def _retrieval_query(self) -> str:
+        parts = [self.params.get("task"), self.params.get("context_query")]
+        parts += [self.params.get(k) for k in ("thema", "keyword_fokus", "zielgruppe", "produktname")]
+        return " ".join(str(p).strip() for p in parts if isinstance(p, str) and p.strip())
+
     def collect(self) -> List[ContextChunk]:
         cid = self.params.get("customer_id")
         if not cid:
             return []
+        budget = int(self.params.get("token_budget") or MEMORY_CONTEXT_TOKENS)
+        query = self._retrieval_query()
         try:
-            mem = load_customer_memory(cid)
+            if query:
+                # Top-k relevante Einträge (FAISS pro Kunde, BM25 solange der Index nachzieht);
+                # ohne Treffer/Embeddings → Ausschnitt wie bisher
+                try:
+                    k = int(self.params.get("top_k") or MEMORY_TOP_K)
+                    with span("fetch.customer_memory.vectors", customer_id=cid, k=k) as sp:
+                        hits = search_memory_vectors(cid, query, k=k)
+                        sp.set("hits", len(hits))
+                except Exception:
+                    hits = None
+                if hits:
+                    per_hit = max(1, budget // max(1, len(hits))) * 4
+                    return [
+                        self._chunk(
+                            f"customer:{cid}#{h['entry_idx']}",
+                            h["content"][:per_hit],
+                            entry_idx=h["entry_idx"],
+                            timestamp=h["timestamp"],
+                            similarity=h["score"],
+                        )
+                        for h in hits
+                    ]
+            with span("fetch.customer_memory", customer_id=cid):
+                mem = load_customer_memory(cid, token_budget=budget)
             if not mem:
                 return []
             return [self._chunk(f"customer:{cid}", mem)]
@@ -199,7 +235,8 @@ class UrlCollector(SourceCollector):
         if not url:
             return []
         try:
-            html = scrape_html(url)
+            with span("fetch.scrape_html", url=url):
+                html = scrape_html(url)
             blocks = extract_text_blocks(html)
             text = "\n".join(blocks)
             return [self._chunk(f"url:{url}", text)]
@@ -217,7 +254,8 @@ class PdfCollector(SourceCollector):
         if not pdf_path:
             return []
         try:
-            pdf_text = load_pdf(pdf_path)
+            with span("fetch.pdf", path=pdf_path):
+                pdf_text = load_pdf(pdf_path)
             return [self._chunk(f"pdf:{pdf_path}", pdf_text)]
         except Exception as e:
             return [self._chunk(f"pdf:{pdf_path}", f"[Fehler beim Laden der PDF: {e}]", type="error")]
@@ -257,7 +295,8 @@ class RssCollector(SourceCollector):
         earliest = now - days * 86400
         for f in feeds:
             try:
-                parsed = feedparser.parse(f)
+                with span("fetch.rss", url=f):
+                    parsed = feedparser.parse(f)
                 for e in parsed.get("entries", [])[:100]:
                     published = e.get("published_parsed")
                     ts = time.mktime(published) if published else now
@@ -291,9 +330,10 @@ class TrendsCollector(SourceCollector):
         try:
             if not kw_list:
                 return []
-            pt = TrendReq(hl="de-DE", tz=60)
-            pt.build_payload(kw_list, timeframe=timeframe, geo=geo)
-            df = pt.interest_over_time()
+            with span("fetch.trends", keywords=", ".join(kw_list), geo=geo):
+                pt = TrendReq(hl="de-DE", tz=60)
+                pt.build_payload(kw_list, timeframe=timeframe, geo=geo)
+                df = pt.interest_over_time()
             if df is None or df.empty:
                 return []
             # kleine, robuste Zusammenfassung
@@ -328,7 +368,9 @@ class DestatisCollector(SourceCollector):
 
         def _try(headers=None, auth=None):
             try:
-                r = requests.post(base, data=body, headers=headers or {}, auth=auth, timeout=30)
+                with span("fetch.destatis", table=table) as fs:
+                    r = requests.post(base, data=body, headers=headers or {}, auth=auth, timeout=30)
+                    fs.set("status_code", r.status_code)
                 return r.status_code, r.text
             except Exception as e:
                 return 599, f"[HTTP Fehler: {e}]"
@@ -385,7 +427,8 @@ class OnpageCollector(SourceCollector):
         if not url:
             return []
         try:
-            sig = extract_seo_signals(url)
+            with span("fetch.seo_signals", url=url):
+                sig = extract_seo_signals(url)
             text = json.dumps(sig, indent=2, ensure_ascii=False)
             return [self._chunk(f"onpage:{url}", text)]
         except Exception as e:
@@ -409,7 +452,8 @@ class SitemapCollector(SourceCollector):
         out: List[ContextChunk] = []
         for sm in sm_candidates:
             try:
-                r = requests.get(sm, timeout=10)
+                with span("fetch.sitemap", url=sm):
+                    r = requests.get(sm, timeout=10)
                 if r.status_code == 200 and len(r.text) > 50:
                     out.append(self._chunk(f"sitemap:{sm}", r.text))
             except Exception as e:
@@ -435,11 +479,12 @@ class SerpCollector(SourceCollector):
             if not api_key:
                 return [self._chunk("serp", "[SerpAPI nicht konfiguriert]", provider=provider, type="error")]
             try:
-                resp = requests.get(
-                    "https://serpapi.com/search.json",
-                    params={"engine": "google", "q": q, "hl": "de", "api_key": api_key, "num": 10},
-                    timeout=25,
-                )
+                with span("fetch.serp", provider="serpapi"):
+                    resp = requests.get(
+                        "https://serpapi.com/search.json",
+                        params={"engine": "google", "q": q, "hl": "de", "api_key": api_key, "num": 10},
+                        timeout=25,
+                    )
                 data = resp.json()
                 org = data.get("organic_results", [])[:6]
                 lines = []
@@ -465,12 +510,13 @@ class SerpCollector(SourceCollector):
                 return [self._chunk("serp", "[Bing API nicht konfiguriert]", provider=provider, type="error")]
             try:
                 headers = {"Ocp-Apim-Subscription-Key": api_key}
-                resp = requests.get(
-                    "https://api.bing.microsoft.com/v7.0/search",
-                    params={"q": q, "mkt": "de-DE", "count": 10, "textDecorations": False},
-                    headers=headers,
-                    timeout=20,
-                )
+                with span("fetch.serp", provider="bing"):
+                    resp = requests.get(
+                        "https://api.bing.microsoft.com/v7.0/search",
+                        params={"q": q, "mkt": "de-DE", "count": 10, "textDecorations": False},
+                        headers=headers,
+                        timeout=20,
+                    )
                 data = resp.json()
                 vals = (data.get("webPages") or {}).get("value", [])[:8]
                 lines = [f"Bing Web Search: {q}"]
@@ -495,7 +541,8 @@ class CompetitorCollector(SourceCollector):
         out: List[ContextChunk] = []
         for d in domains[:10]:
             try:
-                html = scrape_html(d if d.startswith("http") else f"https://{d}")
+                with span("fetch.scrape_html", url=d):
+                    html = scrape_html(d if d.startswith("http") else f"https://{d}")
                 blocks = extract_text_blocks(html)
                 text = "\n".join(blocks)[:20000]
                 out.append(self._chunk(f"competitor:{d}", text, domain=d))
@@ -595,7 +642,8 @@ class ContextMerger:
             formatwunsch=self.fields.get("formatwunsch", ""),
         )
         try:
-            result = llm.invoke(planner_prompt)
+            with span("context_merger.plan", task=self.task, customer_id=self.customer_id):
+                result = _invoke("context_merger_planner", planner_prompt, self.customer_id)
             parsed = _safe_json_parse(getattr(result, "content", str(result)))
         except Exception as e:
             parsed = {"error": str(e), "trace": traceback.format_exc()}
@@ -615,6 +663,8 @@ class ContextMerger:
             "customer_id": self.customer_id,
             "url": self.url,
             "pdf_path": self.pdf_path,
+            "task": self.task,
+            "context_query": self.query,
         }
         collectors: List[SourceCollector] = []
         chosen = self.selected_sources or [s["id"] for s in (self.planned_result.get("proposed_sources") or []) if s.get("default")]
@@ -669,11 +719,16 @@ class ContextMerger:
         if source_params is not None:
             self.source_params = source_params
         try:
-            collectors = self._instantiate_collectors()
-            chunks: List[ContextChunk] = []
-            for c in collectors:
-                chunks.extend(c.collect())
-            merged, selected = self._select_and_merge(chunks)
+            with span("context_merger.collect", task=self.task, customer_id=self.customer_id):
+                collectors = self._instantiate_collectors()
+                chunks: List[ContextChunk] = []
+                for c in collectors:
+                    with span(f"collector.{c.id}") as cs:
+                        collected = c.collect()
+                        cs.set("chunks", len(collected))
+                    chunks.extend(collected)
+                with span("select_and_merge", chunks=len(chunks)):
+                    merged, selected = self._select_and_merge(chunks)
             self.collected_context = merged
             self.provenance = [s.to_dict() for s in selected]
             return {"merged_context": merged or "[Kein Kontext verfügbar]", "provenance": self.provenance}
@@ -691,7 +746,8 @@ class ContextMerger:
             merged_context=_truncate_to_token_budget(self.collected_context, int(self.token_budget * 0.9)),
         )
         try:
-            result = llm.invoke(prompt)
+            with span("context_merger.finalize", task=self.task, customer_id=self.customer_id):
+                result = _invoke("context_merger_executor", prompt, self.customer_id)
             parsed = _safe_json_parse(getattr(result, "content", str(result)))
             bundle = {
                 "merged_context": parsed.get("final_context_summary") or parsed.get("merged_context") or self.collected_context or "",
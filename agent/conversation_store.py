@@ -0,0 +1,259 @@
+# agent/conversation_store.py
+"""
+Gesprächsverlauf pro conversation_id – Follow-ups schicken nur noch das Delta.
+
+- Ein JSON pro Gespräch unter CONVERSATION_DIR (Default .cache/conversations/<id>.json):
+  {"system": [...], "summary": str, "messages": [...], "task", "created_at", "updated_at"}
+- start(): neuer Task-Lauf → Verlauf = gesendeter Prompt + Antwort (ersetzt einen alten Verlauf)
+- messages_for(): Follow-up = System-Präfix + (Zusammenfassung) + Verlauf + neue Nachricht(en);
+  der Verlauf wird nur angehängt → Präfix bleibt stabil und kann aus dem Prompt-Cache kommen
+- append(): Delta + Antwort anhängen; überschreitet der Verlauf das Fenster
+  (CONVERSATION_WINDOW Nachrichten bzw. CONVERSATION_MAX_CHARS Zeichen), werden ältere
+  Nachrichten per "conversation_summary"-Route (light) in die Zusammenfassung verdichtet,
+  die letzten CONVERSATION_KEEP_MESSAGES bleiben wörtlich erhalten
+- Verdichtung läuft im Hintergrund (nach start() und append()); ist schon der Erst-Prompt größer als
+  CONVERSATION_MAX_CHARS (gemergter Kontext), wird er bis auf die letzte Antwort zusammengefasst
+- conversation_id: nur [A-Za-z0-9_-], max. 128 Zeichen (sonst ValueError) – eine ID, eine Datei
+- prune(): Gespräche älter als CONVERSATION_TTL_DAYS löschen
+"""
+from __future__ import annotations
+
+import os
+import re
+import json
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+try:
+    from agent.prompts import conversation_summary_prompt
+    from agent.model_routing import resolve_route
+    from agent.usage import timed_invoke
+except Exception:  # pragma: no cover
+    from prompts import conversation_summary_prompt
+    from model_routing import resolve_route
+    from usage import timed_invoke
+
+CONVERSATION_DIR = os.getenv("CONVERSATION_DIR", os.path.join(".cache", "conversations"))
+CONVERSATION_WINDOW = int(os.getenv("CONVERSATION_WINDOW", "8"))
+CONVERSATION_KEEP_MESSAGES = int(os.getenv("CONVERSATION_KEEP_MESSAGES", "4"))
+CONVERSATION_MAX_CHARS = int(os.getenv("CONVERSATION_MAX_CHARS", "24000"))
+CONVERSATION_TTL_DAYS = int(os.getenv("CONVERSATION_TTL_DAYS", "14"))
+# Pro Nachricht maximal so viele Zeichen in den Summary-Call (z. B. riesiger Erst-Kontext)
+SUMMARY_INPUT_CHARS = 12000
+
+_LOCKS: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_LOCKS_GUARD = threading.Lock()
+_ID = re.compile(r"[A-Za-z0-9_-]{1,128}")
+# Hintergrund-Verdichtung: höchstens ein Auftrag je Gespräch in der Warteschlange
+_compactor: Optional[ThreadPoolExecutor] = None
+_compactor_lock = threading.Lock()
+_compacting: set = set()
+
+
+def _lock(conversation_id: str) -> threading.Lock:
+    with _LOCKS_GUARD:
+        return _LOCKS[conversation_id]
+
+
+def _path(conversation_id: str) -> str:
+    if not _ID.fullmatch(conversation_id or ""):
+        raise ValueError(f"Ungültige conversation_id: {conversation_id!r}")
+    return os.path.join(CONVERSATION_DIR, f"{conversation_id}.json")
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def load(conversation_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Gespeicherter Verlauf (oder None, wenn unbekannt)."""
+    if not conversation_id:
+        return None
+    path = _path(conversation_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _save(state: Dict[str, Any]) -> None:
+    os.makedirs(CONVERSATION_DIR, exist_ok=True)
+    path = _path(state["conversation_id"])
+    # eigene Temp-Datei je Schreiber – parallele Worker würden sich sonst eine .tmp teilen
+    fd, tmp = tempfile.mkstemp(dir=CONVERSATION_DIR, prefix=".conv-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _history(state: Dict[str, Any]) -> List[Dict[str, str]]:
+    msgs = list(state.get("system") or [])
+    if state.get("summary"):
+        msgs.append({"role": "system", "content": f"Bisheriger Gesprächsverlauf (zusammengefasst):\n{state['summary']}"})
+    return msgs + list(state.get("messages") or [])
+
+
+def messages_for(conversation_id: Optional[str], new_messages: List[Dict[str, str]]) -> Optional[List[Dict[str, str]]]:
+    """Prompt für einen Folge-Turn; None, wenn es zum Gespräch keinen Verlauf gibt."""
+    state = load(conversation_id)
+    if state is None:
+        return None
+    return _history(state) + list(new_messages)
+
+
+def start(
+    conversation_id: str,
+    messages: List[Dict[str, str]],
+    response: str,
+    *,
+    task: Optional[str] = None,
+) -> None:
+    """Neuen Verlauf anlegen: gesendeter Prompt (System-Präfix getrennt) + Antwort."""
+    system = [m for m in messages if m.get("role") == "system"]
+    rest = [m for m in messages if m.get("role") != "system"]
+    state = {
+        "conversation_id": conversation_id,
+        "task": task,
+        "system": system,
+        "summary": "",
+        "messages": rest + [{"role": "assistant", "content": response}],
+        "created_at": _now_iso(),
+        "updated_at": _now_iso(),
+    }
+    with _lock(conversation_id):
+        _save(state)
+    _schedule_compaction(state, None)
+
+
+def append(
+    conversation_id: str,
+    new_messages: List[Dict[str, str]],
+    response: str,
+    *,
+    customer_id: Optional[str] = None,
+) -> None:
+    """Delta + Antwort anhängen und bei Bedarf ältere Nachrichten zusammenfassen."""
+    with _lock(conversation_id):
+        state = load(conversation_id)
+        if state is None:
+            return
+        state["messages"] = list(state.get("messages") or []) + list(new_messages) + [{"role": "assistant", "content": response}]
+        state["updated_at"] = _now_iso()
+        _save(state)
+    _schedule_compaction(state, customer_id)
+
+
+def _chars(messages: List[Dict[str, str]]) -> int:
+    return sum(len(m.get("content", "")) for m in messages)
+
+
+def _split(messages: List[Dict[str, str]]) -> Optional[tuple]:
+    """(zu verdichten, wörtlich behalten) oder None, wenn der Verlauf ins Fenster passt."""
+    too_long = _chars(messages) > CONVERSATION_MAX_CHARS
+    if len(messages) <= CONVERSATION_KEEP_MESSAGES:
+        if not too_long or len(messages) < 2:
+            return None
+        # z. B. Erst-Prompt mit komplettem Kontext: alles bis auf die letzte Antwort verdichten
+        return messages[:-1], messages[-1:]
+    if not (len(messages) > CONVERSATION_WINDOW or too_long):
+        return None
+    old, keep = messages[:-CONVERSATION_KEEP_MESSAGES], messages[-CONVERSATION_KEEP_MESSAGES:]
+    # Der wörtlich behaltene Teil soll mit einer Nutzer-Nachricht beginnen
+    while keep and keep[0].get("role") != "user":
+        old.append(keep.pop(0))
+    return old, keep
+
+
+def _schedule_compaction(state: Dict[str, Any], customer_id: Optional[str]) -> None:
+    """Verdichtung im Hintergrund anstoßen – der Request wartet nie auf den Summary-Call."""
+    global _compactor
+    conversation_id = state["conversation_id"]
+    if _split(state.get("messages") or []) is None:
+        return
+    with _compactor_lock:
+        if conversation_id in _compacting:
+            return
+        _compacting.add(conversation_id)
+        if _compactor is None:
+            _compactor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="conversation-summary")
+    _compactor.submit(_compact, conversation_id, customer_id)
+
+
+def _compact(conversation_id: str, customer_id: Optional[str]) -> None:
+    """Ältere Nachrichten zusammenfassen; der LLM-Call läuft ohne Lock, übernommen wird nur,
+    wenn sich Zusammenfassung und verdichteter Teil inzwischen nicht geändert haben."""
+    try:
+        state = load(conversation_id)
+        split = _split(state.get("messages") or []) if state else None
+        if split is None:
+            return
+        old, _ = split
+        summary = _summarize(state, old, customer_id)
+        if summary is None:
+            return
+        with _lock(conversation_id):
+            current = load(conversation_id)
+            messages = (current or {}).get("messages") or []
+            if current is None or current.get("summary") != state.get("summary") or messages[: len(old)] != old:
+                return  # neu gestartet o. Ä. → nächster append() verdichtet erneut
+            current["summary"] = summary
+            current["messages"] = messages[len(old):]
+            current["summarized_messages"] = int(current.get("summarized_messages") or 0) + len(old)
+            _save(current)
+    except Exception:
+        pass
+    finally:
+        with _compactor_lock:
+            _compacting.discard(conversation_id)
+
+
+def _summarize(state: Dict[str, Any], old: List[Dict[str, str]], customer_id: Optional[str]) -> Optional[str]:
+    rendered = "\n\n".join(
+        f"{'Agent' if m.get('role') == 'assistant' else 'Nutzer'}:\n{m.get('content', '')[:SUMMARY_INPUT_CHARS]}"
+        for m in old
+    )
+    try:
+        resp = timed_invoke(
+            conversation_summary_prompt.messages(summary=state.get("summary") or "-", messages=rendered),
+            task="conversation_summary",
+            route=resolve_route("conversation_summary"),
+            customer_id=customer_id,
+            conversation_id=state["conversation_id"],
+        )
+        summary = resp.content if hasattr(resp, "content") else str(resp)
+    except Exception:
+        # Ohne Zusammenfassung lieber vollständigen Verlauf behalten als Inhalte verlieren
+        return None
+    return summary.strip()
+
+
+def prune(max_age_days: Optional[int] = None) -> int:
+    """Löscht Gespräche, die länger als max_age_days nicht fortgesetzt wurden; liefert die Anzahl."""
+    if not os.path.isdir(CONVERSATION_DIR):
+        return 0
+    cutoff = time.time() - (max_age_days if max_age_days is not None else CONVERSATION_TTL_DAYS) * 86400
+    removed = 0
+    for fn in os.listdir(CONVERSATION_DIR):
+        path = os.path.join(CONVERSATION_DIR, fn)
+        try:
+            if fn.endswith((".json", ".tmp")) and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            continue
+    return removed
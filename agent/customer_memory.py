@@ -2,72 +2,136 @@ import os
 import json
 import random
 import string
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
-MEMORY_FOLDER = "customer_memory"
+try:  # POSIX; unter Windows nur Thread-Lock
+    import fcntl
+except Exception:  # pragma: no cover
+    fcntl = None
+
+try:
+    from agent.memory_index import index_append
+    from agent.memory_segments import MEMORY_FOLDER, append_entry, read_entries
+    from agent.memory_compaction import load_slice, schedule as schedule_compaction
+    from agent.memory_vectors import vector_append
+except Exception:  # pragma: no cover
+    from memory_index import index_append
+    from memory_segments import MEMORY_FOLDER, append_entry, read_entries
+    from memory_compaction import load_slice, schedule as schedule_compaction
+    from memory_vectors import vector_append
+
 INDEX_FILE = os.path.join(MEMORY_FOLDER, "kunden_index.json")
 
 os.makedirs(MEMORY_FOLDER, exist_ok=True)
 
+# Kundenverzeichnis (kunden_index.json) prozesslokal gecacht: neu gelesen nur, wenn sich
+# Inode/mtime/Größe der Datei ändern (Schreiben per tmp + os.replace → neuer Inode)
+_index_lock = threading.Lock()
+_index_write_guard = threading.Lock()
+_index_cache = {"key": None, "by_name": {}, "by_id": {}, "ids": []}
+
+def _index_key():
+    try:
+        st = os.stat(INDEX_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _set_cache(key, index):
+    _index_cache["key"] = key
+    _index_cache["by_name"] = dict(index)
+    _index_cache["by_id"] = {cid: name for name, cid in index.items()}
+    _index_cache["ids"] = list(index.values())
+
+def _cached_index():
+    key = _index_key()
+    with _index_lock:
+        if key != _index_cache["key"]:
+            index = {}
+            if key is not None:
+                with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            _set_cache(key, index)
+        return _index_cache
+
+@contextmanager
+def _index_write_lock():
+    # prozessübergreifend, damit parallele register_customer()-Aufrufe keine Einträge verlieren
+    with _index_write_guard:
+        with open(INDEX_FILE + ".lock", "a") as lf:
+            if fcntl is not None:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
 def generate_customer_id():
     return ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
 
 def load_index():
-    if not os.path.exists(INDEX_FILE):
-        return {}
-    with open(INDEX_FILE, "r") as f:
-        return json.load(f)
+    return dict(_cached_index()["by_name"])
 
 def save_index(index):
-    with open(INDEX_FILE, "w") as f:
-        json.dump(index, f, indent=2)
+    tmp = f"{INDEX_FILE}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, INDEX_FILE)
+    with _index_lock:
+        _set_cache(_index_key(), index)
 
 def register_customer(name):
-    index = load_index()
-    if name in index:
-        return index[name]
-    new_id = generate_customer_id()
-    index[name] = new_id
-    save_index(index)
-    return new_id
+    known = _cached_index()["by_name"].get(name)
+    if known:
+        return known
+    with _index_write_lock():
+        cache = _cached_index()  # unter dem Lock neu validieren (anderer Prozess)
+        if name in cache["by_name"]:
+            return cache["by_name"][name]
+        new_id = generate_customer_id()
+        while new_id in cache["by_id"]:
+            new_id = generate_customer_id()
+        index = dict(cache["by_name"])
+        index[name] = new_id
+        save_index(index)
+        return new_id
+
+def get_customer_id(name):
+    return _cached_index()["by_name"].get(name)
+
+def get_customer_name(customer_id):
+    return _cached_index()["by_id"].get(customer_id)
 
 def get_customer_name_id_pairs():
     return load_index()
 
 def list_customer_ids():
-    index = load_index()
-    return list(index.values())
+    return list(_cached_index()["ids"])
+
+def _append(customer_id, content):
+    # Append-only (memory_segments): O(1), prozessübergreifend gelockt
+    entry = {"timestamp": datetime.now().isoformat(), "content": content}
+    entry_idx, before, after = append_entry(customer_id, entry)
+    if after == before:
+        return  # Inhalt schon vorhanden – nur der Zeitstempel wurde ergänzt
+    index_append(customer_id, entry_idx, entry, before, after)
+    vector_append(customer_id, entry_idx)
+    # Ältere Einträge im Hintergrund zusammenfassen, sobald ein Block fällig ist
+    schedule_compaction(customer_id, total=entry_idx + 1)
 
 def save_customer_data(customer_id, data):
-    path = os.path.join(MEMORY_FOLDER, f"{customer_id}.json")
-    memory = []
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            memory = json.load(f)
-    memory.append({
-        "timestamp": datetime.now().isoformat(),
-        "content": json.dumps(data, indent=2)
-    })
-    with open(path, "w") as f:
-        json.dump(memory, f, indent=2)
+    _append(customer_id, json.dumps(data, indent=2, ensure_ascii=False))
 
 def save_customer_memory(customer_id, result):
-    path = os.path.join(MEMORY_FOLDER, f"{customer_id}.json")
-    data = []
-    if os.path.exists(path):
-        with open(path, "r") as f:
-            data = json.load(f)
-    data.append({
-        "timestamp": datetime.now().isoformat(),
-        "content": result
-    })
-    with open(path, "w") as f:
-        json.dump(data, f, indent=2)
-
-def load_customer_memory(customer_id):
-    path = os.path.join(MEMORY_FOLDER, f"{customer_id}.json")
-    if not os.path.exists(path):
-        return ""
-    with open(path, "r") as f:
-        data = json.load(f)
-        return "\n\n".join([item["content"] for item in data])
+    _append(customer_id, result)
+
+def load_customer_memory(customer_id, token_budget=None):
+    # Ohne Budget: vollständiger Rohverlauf (Anzeige/Export); mit Budget: Ausschnitt für den Prompt
+    if token_budget is not None:
+        return load_slice(customer_id, token_budget)
+    return "\n\n".join([item["content"] for item in read_entries(customer_id)])
@@ -0,0 +1,286 @@
+# agent/db.py
+"""
+Persistenz für die API (Kunden, Memory-Einträge, Activity-Log, Usage-Stats, Feedback,
+Lighthouse-Historie, Reports) – ersetzt die prozesslokalen Dicts in agent/api.py.
+
+- SQLAlchemy Core; DATABASE_URL (Default sqlite:///.cache/app.sqlite)
+- SQLite: WAL-Modus + synchronous=NORMAL + busy_timeout → mehrere uvicorn-Worker lesen parallel
+  und schreiben ohne "database is locked"
+- Indizes auf customer_id und Zeitstempeln (Memory, Activity, Feedback)
+- Alle Funktionen liefern einfache Dicts; Tabellen werden beim ersten Zugriff angelegt
+"""
+from __future__ import annotations
+
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import (
+    Column, Index, Integer, MetaData, String, Table, Text,
+    create_engine, delete, event, insert, select, update,
+)
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///" + os.path.join(".cache", "app.sqlite"))
+
+metadata = MetaData()
+
+customers = Table(
+    "customers", metadata,
+    Column("id", String(64), primary_key=True),
+    Column("name", Text, nullable=False),
+    Column("email", Text),
+    Column("notes", Text),
+    Column("created_at", String(32), nullable=False),
+)
+
+memory_entries = Table(
+    "memory_entries", metadata,
+    Column("id", String(64), primary_key=True),
+    Column("customer_id", String(64), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("created_at", String(32), nullable=False),
+    Index("ix_memory_customer_created", "customer_id", "created_at"),
+)
+
+activity_log = Table(
+    "activity_log", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("timestamp", String(32), nullable=False, index=True),
+    Column("user", String(128), nullable=False),
+    Column("action", String(64), nullable=False),
+    Column("metadata", Text),
+)
+
+usage_stats = Table(
+    "usage_stats", metadata,
+    Column("user", String(128), primary_key=True),
+    Column("count", Integer, nullable=False, default=0),
+)
+
+feedback = Table(
+    "feedback", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user", String(128), nullable=False),
+    Column("message", Text, nullable=False),
+    Column("created_at", String(32), nullable=False, index=True),
+)
+
+lighthouse_history = Table(
+    "lighthouse_history", metadata,
+    Column("scan_id", String(64), primary_key=True),
+    Column("data", Text, nullable=False),
+    Column("created_at", String(32), nullable=False, index=True),
+)
+
+reports = Table(
+    "reports", metadata,
+    Column("id", String(64), primary_key=True),
+    Column("status", String(32), nullable=False),
+    Column("result", Text),
+    Column("updated_at", String(32), nullable=False),
+)
+
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def get_engine() -> Engine:
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            kwargs: Dict[str, Any] = {"future": True, "pool_pre_ping": True}
+            if DATABASE_URL.startswith("sqlite"):
+                path = DATABASE_URL.split("///", 1)[-1]
+                parent = os.path.dirname(os.path.abspath(path))
+                if path and parent:
+                    os.makedirs(parent, exist_ok=True)
+                kwargs["connect_args"] = {"check_same_thread": False, "timeout": 30}
+            engine = create_engine(DATABASE_URL, **kwargs)
+            if engine.dialect.name == "sqlite":
+                @event.listens_for(engine, "connect")
+                def _sqlite_pragmas(dbapi_conn: Any, _record: Any) -> None:
+                    cur = dbapi_conn.cursor()
+                    cur.execute("PRAGMA journal_mode=WAL")
+                    cur.execute("PRAGMA synchronous=NORMAL")
+                    cur.execute("PRAGMA busy_timeout=30000")
+                    cur.close()
+            metadata.create_all(engine)
+            _engine = engine
+        return _engine
+
+
+# ---------------------------
+# Kunden
+# ---------------------------
+def add_customer(customer_id: str, name: str, email: Optional[str] = None, notes: Optional[str] = None) -> Dict[str, Any]:
+    row = {"id": customer_id, "name": name, "email": email, "notes": notes, "created_at": _now()}
+    with get_engine().begin() as conn:
+        conn.execute(insert(customers).values(**row))
+    return row
+
+
+def list_customers() -> List[Dict[str, Any]]:
+    with get_engine().connect() as conn:
+        return [dict(r) for r in conn.execute(select(customers).order_by(customers.c.created_at)).mappings()]
+
+
+def get_customer(customer_id: str) -> Optional[Dict[str, Any]]:
+    with get_engine().connect() as conn:
+        row = conn.execute(select(customers).where(customers.c.id == customer_id)).mappings().first()
+    return dict(row) if row else None
+
+
+def update_customer(customer_id: str, name: str, email: Optional[str] = None, notes: Optional[str] = None) -> bool:
+    with get_engine().begin() as conn:
+        res = conn.execute(
+            update(customers).where(customers.c.id == customer_id).values(name=name, email=email, notes=notes)
+        )
+    return res.rowcount > 0
+
+
+def delete_customer(customer_id: str) -> bool:
+    with get_engine().begin() as conn:
+        res = conn.execute(delete(customers).where(customers.c.id == customer_id))
+    return res.rowcount > 0
+
+
+# ---------------------------
+# Memory-Einträge (API)
+# ---------------------------
+def list_memory(customer_id: str) -> List[Dict[str, Any]]:
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            select(memory_entries)
+            .where(memory_entries.c.customer_id == customer_id)
+            .order_by(memory_entries.c.created_at)
+        ).mappings()
+        return [dict(r) for r in rows]
+
+
+def add_memory(customer_id: str, entry_id: str, content: str) -> Dict[str, Any]:
+    row = {"id": entry_id, "customer_id": customer_id, "content": content, "created_at": _now()}
+    with get_engine().begin() as conn:
+        conn.execute(insert(memory_entries).values(**row))
+    return row
+
+
+def update_memory(customer_id: str, entry_id: str, content: str) -> bool:
+    with get_engine().begin() as conn:
+        res = conn.execute(
+            update(memory_entries)
+            .where(memory_entries.c.customer_id == customer_id, memory_entries.c.id == entry_id)
+            .values(content=content)
+        )
+    return res.rowcount > 0
+
+
+def delete_memory(customer_id: str, entry_id: str) -> bool:
+    with get_engine().begin() as conn:
+        res = conn.execute(
+            delete(memory_entries).where(memory_entries.c.customer_id == customer_id, memory_entries.c.id == entry_id)
+        )
+    return res.rowcount > 0
+
+
+# ---------------------------
+# Activity-Log & Usage
+# ---------------------------
+def log_activity(user: str, action: str, meta: Optional[Dict[str, Any]] = None, timestamp: Optional[str] = None) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(insert(activity_log).values(
+            timestamp=timestamp or _now(), user=user, action=action,
+            metadata=json.dumps(meta, ensure_ascii=False) if meta else None,
+        ))
+
+
+def list_activity(limit: Optional[int] = None, since: Optional[str] = None) -> List[Dict[str, Any]]:
+    q = select(activity_log).order_by(activity_log.c.timestamp.desc())
+    if since:
+        q = q.where(activity_log.c.timestamp >= since)
+    if limit:
+        q = q.limit(limit)
+    with get_engine().connect() as conn:
+        rows = [dict(r) for r in conn.execute(q).mappings()]
+    for r in rows:
+        r["metadata"] = json.loads(r["metadata"]) if r["metadata"] else None
+        r.pop("id", None)
+    return rows[::-1]  # chronologisch wie bisher
+
+
+def increment_usage(user: str) -> None:
+    with get_engine().begin() as conn:
+        res = conn.execute(update(usage_stats).where(usage_stats.c.user == user).values(count=usage_stats.c.count + 1))
+        if res.rowcount:
+            return
+        try:
+            with conn.begin_nested():
+                conn.execute(insert(usage_stats).values(user=user, count=1))
+        except IntegrityError:
+            # anderer Worker war schneller
+            conn.execute(update(usage_stats).where(usage_stats.c.user == user).values(count=usage_stats.c.count + 1))
+
+
+def get_usage_stats() -> Dict[str, int]:
+    with get_engine().connect() as conn:
+        return {user: count for user, count in conn.execute(select(usage_stats.c.user, usage_stats.c.count))}
+
+
+# ---------------------------
+# Feedback
+# ---------------------------
+def add_feedback(user: str, message: str, created_at: Optional[str] = None) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(insert(feedback).values(user=user, message=message, created_at=created_at or _now()))
+
+
+def list_feedback() -> List[Dict[str, Any]]:
+    with get_engine().connect() as conn:
+        return [
+            dict(r) for r in conn.execute(
+                select(feedback.c.user, feedback.c.message, feedback.c.created_at).order_by(feedback.c.created_at)
+            ).mappings()
+        ]
+
+
+# ---------------------------
+# Lighthouse-Historie
+# ---------------------------
+def save_lighthouse(scan_id: str, data: Dict[str, Any]) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(delete(lighthouse_history).where(lighthouse_history.c.scan_id == scan_id))
+        conn.execute(insert(lighthouse_history).values(
+            scan_id=scan_id, data=json.dumps(data, ensure_ascii=False, default=str), created_at=_now()
+        ))
+
+
+def get_lighthouse(scan_id: str) -> Dict[str, Any]:
+    with get_engine().connect() as conn:
+        raw = conn.execute(select(lighthouse_history.c.data).where(lighthouse_history.c.scan_id == scan_id)).scalar()
+    return json.loads(raw) if raw else {}
+
+
+# ---------------------------
+# Reports
+# ---------------------------
+def set_report(report_id: str, status: str, result: Optional[str] = None) -> None:
+    with get_engine().begin() as conn:
+        res = conn.execute(
+            update(reports).where(reports.c.id == report_id).values(status=status, result=result, updated_at=_now())
+        )
+        if not res.rowcount:
+            conn.execute(insert(reports).values(id=report_id, status=status, result=result, updated_at=_now()))
+
+
+def get_report(report_id: str) -> Optional[Dict[str, Any]]:
+    with get_engine().connect() as conn:
+        row = conn.execute(select(reports.c.status, reports.c.result).where(reports.c.id == report_id)).mappings().first()
+    return dict(row) if row else None
+
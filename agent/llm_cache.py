@@ -0,0 +1,179 @@
+# agent/llm_cache.py
+"""
+Exact-Match-Cache für LLM-Antworten (run_agent, query_agent).
+
+- Schlüssel: SHA-256 über (Modell, Parameter, Prompt) – Prompt darf String oder Message-Liste sein
+- Backend: SQLite-Datei auf Disk (prozessübergreifend nutzbar: Streamlit + API)
+- TTL: Einträge älter als LLM_CACHE_TTL Sekunden gelten als verfallen
+- Größenlimit: max. LLM_CACHE_MAX_ENTRIES Einträge, Verdrängung nach LRU (last_access)
+- Bypass: global via LLM_CACHE_ENABLED=0, pro Aufruf via use_cache=False
+- Hit/Miss + eingesparte Tokens werden über activity_log.log_event protokolliert
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    from agent.activity_log import log_event
+except Exception:  # pragma: no cover
+    def log_event(payload: Dict[str, Any]):
+        pass
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(".cache", "llm_cache.sqlite"))
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def make_key(model: str, params: Dict[str, Any], prompt: Any) -> str:
+    """Deterministischer Cache-Key für (Modell, Parameter, Prompt)."""
+    payload = json.dumps(
+        {"model": model, "params": params, "prompt": prompt},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-Cache mit TTL und LRU-Verdrängung."""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = CACHE_TTL, max_entries: int = CACHE_MAX_ENTRIES) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    usage TEXT,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:  # commit/rollback
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT response, usage, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+            response, usage, created_at = row
+            if self.ttl > 0 and now - created_at > self.ttl:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        return {"response": response, "usage": json.loads(usage) if usage else {}}
+
+    def set(self, key: str, model: str, response: str, usage: Optional[Dict[str, Any]] = None) -> None:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, usage, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, response, json.dumps(usage or {}), now, now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl > 0:
+            conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM llm_cache WHERE key IN "
+                "(SELECT key FROM llm_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+
+_cache: Optional[LLMResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMResponseCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMResponseCache()
+        return _cache
+
+
+def lookup(
+    model: str,
+    params: Dict[str, Any],
+    prompt: Any,
+    *,
+    use_cache: bool = True,
+    task: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """Sucht eine gecachte Antwort.
+
+    Rückgabe: (key, entry). key ist None, wenn der Cache umgangen wird (dann auch nicht speichern);
+    entry ist None bei Miss.
+    """
+    if not (CACHE_ENABLED and use_cache):
+        return None, None
+    key = make_key(model, params, prompt)
+    try:
+        entry = get_cache().get(key)
+    except Exception:
+        # Cache-Probleme dürfen den eigentlichen Call nie verhindern
+        return None, None
+
+    usage = (entry or {}).get("usage") or {}
+    try:
+        log_event({
+            "type": "llm_cache",
+            "cache_hit": entry is not None,
+            "task": task,
+            "customer_id": customer_id,
+            "conversation_id": conversation_id,
+            "model": model,
+            "saved_input_tokens": usage.get("input_tokens", 0) if entry else 0,
+            "saved_output_tokens": usage.get("output_tokens", 0) if entry else 0,
+        })
+    except Exception:
+        pass
+    return key, entry
+
+
+def store(key: Optional[str], model: str, response: str, usage: Optional[Dict[str, Any]] = None) -> None:
+    """Legt eine Antwort ab (no-op, wenn lookup() den Cache umgangen hat)."""
+    if not key:
+        return
+    try:
+        get_cache().set(key, model, response, usage)
+    except Exception:
+        pass
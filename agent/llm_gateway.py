@@ -0,0 +1,330 @@
+# agent/llm_gateway.py
+"""
+Zentrales LLM-Gateway – alle Chat-Calls (Base-Agent, Context Merger, Query) laufen hierüber.
+
+- Token-Buckets für Requests/Minute (LLM_RPM) und Tokens/Minute (LLM_TPM)
+- Token-Schätzung vor dem Call (Prompt + reserviertes Output-Budget, wie OpenAI selbst zählt);
+  nach dem Call wird mit der tatsächlichen Usage verrechnet
+- Ist das Budget erschöpft, wird gewartet (Queue) statt mit 429 zu scheitern
+- Retry mit exponentiellem Backoff + Jitter für 429/5xx/Timeouts (LLM_MAX_RETRIES)
+- Metriken: Queue-Tiefe, Wartezeiten (p50/p95/max), Retries, Fehler → get_metrics()
+- langchain_openai wird erst beim ersten Client importiert (schneller Import, siehe agent.clients)
+"""
+from __future__ import annotations
+
+import os
+import math
+import time
+import random
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+try:
+    from agent.stats import percentile
+except Exception:  # pragma: no cover
+    from stats import percentile
+
+try:  # genaue Token-Zählung, falls verfügbar
+    import tiktoken  # type: ignore
+except Exception:  # pragma: no cover
+    tiktoken = None
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_MAX_TOKENS = 3000
+
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "30000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = ("RateLimit", "Timeout", "APIConnection", "InternalServer", "ServiceUnavailable")
+
+
+# ---------------------------
+# Token-Schätzung
+# ---------------------------
+def _prompt_text(prompt: Any) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    if isinstance(prompt, (list, tuple)):
+        parts = []
+        for m in prompt:
+            if isinstance(m, dict):
+                parts.append(str(m.get("content", "")))
+            else:
+                parts.append(str(getattr(m, "content", m)))
+        return "\n".join(parts)
+    return str(prompt)
+
+
+def estimate_tokens(prompt: Any, model: str = DEFAULT_MODEL) -> int:
+    """Geschätzte Prompt-Tokens (tiktoken, sonst ≈ 4 Zeichen/Token)."""
+    text = _prompt_text(prompt)
+    if tiktoken is not None:
+        try:
+            try:
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("o200k_base")
+            return len(enc.encode(text))
+        except Exception:
+            pass
+    return math.ceil(len(text) / 4)
+
+
+def _is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in _RETRYABLE_STATUS:
+        return True
+    name = type(exc).__name__
+    return any(n in name for n in _RETRYABLE_NAMES)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        value = headers.get("retry-after")
+        return float(value) if value is not None else None
+    except Exception:
+        return None
+
+
+def _actual_tokens(resp: Any) -> Optional[int]:
+    usage = getattr(resp, "usage_metadata", None) or {}
+    if usage:
+        return int(usage.get("input_tokens") or 0) + int(usage.get("output_tokens") or 0)
+    token_usage = (getattr(resp, "response_metadata", None) or {}).get("token_usage") or {}
+    if token_usage:
+        return int(token_usage.get("prompt_tokens") or 0) + int(token_usage.get("completion_tokens") or 0)
+    return None
+
+
+# ---------------------------
+# Token-Bucket
+# ---------------------------
+class TokenBucket:
+    """Klassischer Token-Bucket, Kapazität = Limit pro Minute, gleichmäßige Auffüllung."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # Riesen-Requests nicht für immer blockieren
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self.level = min(self.capacity, self.level + amount)
+
+
+# ---------------------------
+# Gateway
+# ---------------------------
+class LLMGateway:
+    def __init__(
+        self,
+        rpm: int = LLM_RPM,
+        tpm: int = LLM_TPM,
+        max_retries: int = LLM_MAX_RETRIES,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY,
+    ) -> None:
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self._clients: Dict[Tuple[str, int, Optional[float]], Any] = {}
+        self._clients_lock = threading.Lock()
+        # Metriken (unter self._cond gepflegt)
+        self._queue_depth = 0
+        self._in_flight = 0
+        self._waits_ms: deque = deque(maxlen=1000)
+        self._counters = {"requests": 0, "retries": 0, "failures": 0, "rate_limited": 0}
+
+    # --- Clients (ein Client pro Modell/Budget/Temperatur) ---
+    def client(self, model: str = DEFAULT_MODEL, max_tokens: int = DEFAULT_MAX_TOKENS, temperature: Optional[float] = None) -> Any:
+        try:
+            from langchain_openai import ChatOpenAI
+        except Exception:
+            raise RuntimeError("LLM-Client nicht initialisiert (langchain_openai fehlt)")
+        key = (model, max_tokens, temperature)
+        with self._clients_lock:
+            if key not in self._clients:
+                kwargs: Dict[str, Any] = {"model": model, "max_tokens": max_tokens}
+                if temperature is not None:
+                    kwargs["temperature"] = temperature
+                # Echte Token-Usage auch beim Streaming (letzter Chunk) statt der Schätzung in stream_agent;
+                # wirkt nur auf stream(), ältere langchain_openai-Versionen kennen das Feld noch nicht
+                fields = getattr(ChatOpenAI, "model_fields", None) or getattr(ChatOpenAI, "__fields__", {})
+                if "stream_usage" in fields:
+                    kwargs["stream_usage"] = True
+                # Retries macht das Gateway selbst (abgestimmt mit den Buckets)
+                self._clients[key] = ChatOpenAI(max_retries=0, **kwargs)
+            return self._clients[key]
+
+    # --- Rate-Limiting ---
+    def _acquire(self, tokens: int) -> None:
+        start = time.monotonic()
+        with self._cond:
+            self._queue_depth += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = max(self._requests.wait_time(1, now), self._tokens.wait_time(tokens, now))
+                    if wait <= 0:
+                        self._requests.consume(1)
+                        self._tokens.consume(tokens)
+                        break
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._queue_depth -= 1
+            self._in_flight += 1
+            self._counters["requests"] += 1
+            self._waits_ms.append((time.monotonic() - start) * 1000)
+
+    def _release(self, reserved: int, actual: Optional[int]) -> None:
+        """Slot freigeben; zu viel reservierte Tokens gehen zurück in den Bucket."""
+        with self._cond:
+            self._in_flight -= 1
+            if actual is not None and actual < reserved:
+                self._tokens.refund(reserved - actual)
+            self._cond.notify_all()
+
+    def _count(self, name: str) -> None:
+        with self._cond:
+            self._counters[name] += 1
+
+    def _backoff(self, attempt: int, exc: Exception) -> None:
+        self._count("retries")
+        if getattr(exc, "status_code", None) == 429 or "RateLimit" in type(exc).__name__:
+            self._count("rate_limited")
+        delay = _retry_after(exc)
+        if delay is None:
+            # Exponentiell mit "Full Jitter"
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        time.sleep(delay)
+
+    # --- Calls ---
+    def invoke(
+        self,
+        prompt: Any,
+        *,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        temperature: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Wie ChatOpenAI.invoke – wartet auf freie Kapazität und wiederholt transiente Fehler."""
+        llm = self.client(model, max_tokens, temperature)
+        reserved = estimate_tokens(prompt, model) + max_tokens
+        attempt = 0
+        while True:
+            self._acquire(reserved)
+            try:
+                resp = llm.invoke(prompt, **kwargs)
+            except Exception as e:
+                self._release(reserved, None)
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                self._backoff(attempt, e)
+                attempt += 1
+                continue
+            self._release(reserved, _actual_tokens(resp))
+            return resp
+
+    def stream(
+        self,
+        prompt: Any,
+        *,
+        model: str = DEFAULT_MODEL,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        temperature: Optional[float] = None,
+        **kwargs: Any,
+    ) -> Iterator[Any]:
+        """Wie ChatOpenAI.stream. Retries nur, solange noch kein Chunk ausgeliefert wurde."""
+        llm = self.client(model, max_tokens, temperature)
+        reserved = estimate_tokens(prompt, model) + max_tokens
+        attempt = 0
+        while True:
+            self._acquire(reserved)
+            started = False
+            released = False
+            actual: Optional[int] = None
+            try:
+                for chunk in llm.stream(prompt, **kwargs):
+                    started = True
+                    actual = _actual_tokens(chunk) or actual
+                    yield chunk
+                return
+            except Exception as e:
+                self._release(reserved, None)
+                released = True
+                if started or not _is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                self._backoff(attempt, e)
+                attempt += 1
+            finally:
+                if not released:
+                    self._release(reserved, actual)
+
+    # --- Metriken ---
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            self._requests.wait_time(0, now)  # Buckets auffüllen
+            self._tokens.wait_time(0, now)
+            waits = list(self._waits_ms)
+            return {
+                "queue_depth": self._queue_depth,
+                "in_flight": self._in_flight,
+                **self._counters,
+                "wait_ms_p50": round(percentile(waits, 50), 1),
+                "wait_ms_p95": round(percentile(waits, 95), 1),
+                "wait_ms_max": round(max(waits), 1) if waits else 0.0,
+                "rpm_available": int(self._requests.level),
+                "tpm_available": int(self._tokens.level),
+            }
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """Prozessweites Gateway (Limits gelten pro Prozess – LLM_RPM/LLM_TPM entsprechend aufteilen)."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def invoke(prompt: Any, **kwargs: Any) -> Any:
+    return get_gateway().invoke(prompt, **kwargs)
+
+
+def stream(prompt: Any, **kwargs: Any) -> Iterator[Any]:
+    return get_gateway().stream(prompt, **kwargs)
+
+
+def get_metrics() -> Dict[str, Any]:
+    return get_gateway().metrics()
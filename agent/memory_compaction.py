@@ -0,0 +1,240 @@
+# agent/memory_compaction.py
+"""
+Verdichtung des Kundengedächtnisses – begrenzter Prompt-Kontext statt "alles, was je gespeichert wurde".
+
+- Die letzten MEMORY_KEEP_RAW Einträge bleiben immer wörtlich verfügbar
+- Ältere Einträge werden blockweise (MEMORY_SUMMARY_CHUNK Einträge) per "memory_summary"-Route (light)
+  zusammengefasst und neben den Segmenten abgelegt: customer_memory/<id>/summaries.jsonl,
+  eine Zeile pro Block {"from_idx", "to_idx", "from_ts", "to_ts", "content", "created_at"}
+- Die Rohdaten bleiben unverändert erhalten (Suche, Export, spätere Neu-Verdichtung)
+- schedule(): nach dem Speichern im Hintergrund-Thread, sobald ein voller Block fällig ist;
+  LLM-Fehler verhindern nie das Speichern – der Block wird beim nächsten Mal nachgeholt
+- load_slice(customer_id, token_budget): neueste Rohdaten zuerst, danach die jüngsten Zusammenfassungen,
+  bis das Budget (≈ 4 Zeichen/Token) erreicht ist; Ausgabe chronologisch
+- MEMORY_CONTEXT_TOKENS: Default-Budget für den Prompt-Kontext (Collector, context_utils)
+
+CLI:
+  python -m agent.memory_compaction [customer_id ...]   (ohne Argumente: alle Kunden)
+"""
+from __future__ import annotations
+
+import os
+import json
+import threading
+import contextvars
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+try:
+    from agent.memory_segments import count, customer_dir, generation, list_customers, locked, read_entries
+    from agent.prompts import memory_summary_prompt
+    from agent.model_routing import resolve_route
+    from agent.usage import timed_invoke
+except Exception:  # pragma: no cover
+    from memory_segments import count, customer_dir, generation, list_customers, locked, read_entries
+    from prompts import memory_summary_prompt
+    from model_routing import resolve_route
+    from usage import timed_invoke
+
+MEMORY_KEEP_RAW = int(os.getenv("MEMORY_KEEP_RAW", "10"))
+MEMORY_SUMMARY_CHUNK = int(os.getenv("MEMORY_SUMMARY_CHUNK", "10"))
+MEMORY_COMPACTION = os.getenv("MEMORY_COMPACTION", "1") != "0"
+MEMORY_CONTEXT_TOKENS = int(os.getenv("MEMORY_CONTEXT_TOKENS", "2000"))
+# Anteil des Budgets, der für Zusammenfassungen reserviert bleibt (falls vorhanden)
+SUMMARY_BUDGET_SHARE = 0.3
+# Pro Eintrag maximal so viele Zeichen in den Summary-Call (z. B. lange Blogartikel)
+SUMMARY_INPUT_CHARS = 4000
+
+_SUMMARIES = "summaries.jsonl"
+_running: Set[str] = set()
+_running_lock = threading.Lock()
+
+
+def _chars(tokens: int) -> int:
+    return max(0, int(tokens)) * 4
+
+
+def load_summaries(customer_id: str) -> List[Dict[str, Any]]:
+    """Alle Zusammenfassungen eines Kunden (älteste zuerst); abgerissene Zeilen werden übersprungen."""
+    path = os.path.join(customer_dir(customer_id), _SUMMARIES)
+    if not os.path.exists(path):
+        return []
+    out: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(item, dict) and "to_idx" in item:
+                out.append(item)
+    return out
+
+
+def _covered(summaries: List[Dict[str, Any]]) -> int:
+    """Anzahl der Einträge (von vorn), die bereits in Zusammenfassungen stecken."""
+    return max((int(s["to_idx"]) for s in summaries), default=0)
+
+
+def pending(customer_id: str, total: Optional[int] = None) -> int:
+    """Anzahl Einträge, die bereits verdichtet werden dürften (außerhalb der Rohdaten-Reserve)."""
+    total = count(customer_id) if total is None else total
+    return max(0, total - MEMORY_KEEP_RAW - _covered(load_summaries(customer_id)))
+
+
+def _summarize(customer_id: str, entries: List[Dict[str, Any]]) -> str:
+    first, last = entries[0].get("timestamp") or "", entries[-1].get("timestamp") or ""
+    rendered = "\n\n".join(
+        f"[{(e.get('timestamp') or '')[:16]}]\n{str(e.get('content', ''))[:SUMMARY_INPUT_CHARS]}" for e in entries
+    )
+    resp = timed_invoke(
+        memory_summary_prompt.messages(period=f"{first[:10]} – {last[:10]}", entries=rendered),
+        task="memory_summary",
+        route=resolve_route("memory_summary"),
+        customer_id=customer_id,
+    )
+    return (resp.content if hasattr(resp, "content") else str(resp)).strip()
+
+
+def _append_summary(folder: str, summary: Dict[str, Any]) -> None:
+    path = os.path.join(folder, _SUMMARIES)
+    line = (json.dumps(summary, ensure_ascii=False) + "\n").encode("utf-8")
+    with open(path, "ab+") as f:
+        # abgerissene letzte Zeile (Absturz beim Schreiben) abschneiden
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(max(0, size - 1))
+            if f.read(1) != b"\n":
+                f.seek(0)
+                data = f.read()
+                f.truncate(data.rfind(b"\n") + 1)
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def compact(customer_id: str) -> int:
+    """Verdichtet alle fälligen Blöcke eines Kunden; liefert die Anzahl neuer Zusammenfassungen."""
+    created = 0
+    while True:
+        gen = generation(customer_id)
+        covered = _covered(load_summaries(customer_id))
+        if count(customer_id) - MEMORY_KEEP_RAW - covered < MEMORY_SUMMARY_CHUNK:
+            return created
+        stop = covered + MEMORY_SUMMARY_CHUNK
+        entries = read_entries(customer_id, covered, stop)
+        if not entries:
+            return created
+        content = _summarize(customer_id, entries)  # außerhalb des Locks – dauert Sekunden
+        with locked(customer_id) as folder:
+            if generation(customer_id) != gen:
+                continue  # Einträge wurden neu nummeriert (memory_segments.dedup)
+            if _covered(load_summaries(customer_id)) != covered:
+                continue  # anderer Prozess war schneller
+            _append_summary(folder, {
+                "from_idx": covered,
+                "to_idx": stop,
+                "from_ts": entries[0].get("timestamp"),
+                "to_ts": entries[-1].get("timestamp"),
+                "content": content,
+                "created_at": datetime.now().isoformat(),
+            })
+        created += 1
+
+
+def schedule(customer_id: str, total: Optional[int] = None) -> bool:
+    """Startet compact() im Hintergrund, wenn ein voller Block fällig ist; liefert True bei Start."""
+    if not MEMORY_COMPACTION:
+        return False
+    try:
+        if pending(customer_id, total) < MEMORY_SUMMARY_CHUNK:
+            return False
+    except (OSError, ValueError):
+        return False
+    with _running_lock:
+        if customer_id in _running:
+            return False
+        _running.add(customer_id)
+
+    def _run() -> None:
+        try:
+            compact(customer_id)
+        except Exception:
+            pass  # nächster Speichervorgang versucht es erneut
+        finally:
+            with _running_lock:
+                _running.discard(customer_id)
+
+    ctx = contextvars.copy_context()
+    threading.Thread(target=ctx.run, args=(_run,), name=f"memory-compaction-{customer_id}", daemon=True).start()
+    return True
+
+
+def _format_summary(summary: Dict[str, Any]) -> str:
+    period = f"{(summary.get('from_ts') or '')[:10]} – {(summary.get('to_ts') or '')[:10]}"
+    n = int(summary["to_idx"]) - int(summary.get("from_idx", 0))
+    return f"[Zusammenfassung {period}, {n} Einträge]\n{summary.get('content', '')}"
+
+
+def load_slice(customer_id: str, token_budget: int = MEMORY_CONTEXT_TOKENS) -> str:
+    """Bestpassender Ausschnitt des Gedächtnisses für token_budget Tokens.
+
+    Reihenfolge der Auswahl: neueste noch nicht verdichtete Rohdaten, dann die jüngsten
+    Zusammenfassungen. Sind Zusammenfassungen vorhanden, bleibt SUMMARY_BUDGET_SHARE des
+    Budgets für sie reserviert. Der neueste Eintrag wird notfalls gekürzt statt weggelassen.
+    """
+    budget = _chars(token_budget)
+    if budget <= 0:
+        return ""
+    summaries = load_summaries(customer_id)
+    total = count(customer_id)
+    raw_budget = int(budget * (1 - SUMMARY_BUDGET_SHARE)) if summaries else budget
+
+    raw: List[str] = []
+    used = 0
+    first_raw = total
+    floor = _covered(summaries)  # verdichtete Einträge kommen über ihre Zusammenfassung
+    page = max(MEMORY_KEEP_RAW, 1)
+    done = False
+    while first_raw > floor and not done:
+        # first_raw folgt den angefragten Seitengrenzen, nicht der Zahl gelieferter Einträge:
+        # schrumpft der Index zwischendurch oder fehlen unlesbare Zeilen, bleibt die Schleife endlich
+        lo = max(floor, first_raw - page)
+        entries = read_entries(customer_id, lo, first_raw)
+        if not entries:
+            break
+        taken = 0
+        for entry in reversed(entries):
+            content = str(entry.get("content", ""))
+            sep = 2 if raw else 0
+            if used + sep + len(content) > raw_budget:
+                if not raw:
+                    raw.append(content[: max(0, raw_budget - 2)] + " …")
+                    used += len(raw[0])
+                    taken += 1
+                done = True
+                break
+            raw.append(content)
+            used += sep + len(content)
+            taken += 1
+        first_raw = first_raw - taken if done else lo
+
+    picked: List[str] = []
+    for summary in reversed(summaries):
+        if int(summary["to_idx"]) > first_raw:
+            continue  # Zeitraum ist bereits wörtlich enthalten
+        text = _format_summary(summary)
+        if used + 2 + len(text) > budget:
+            break
+        picked.append(text)
+        used += 2 + len(text)
+
+    return "\n\n".join(list(reversed(picked)) + list(reversed(raw)))
+
+
+if __name__ == "__main__":
+    import sys
+
+    for cid in sys.argv[1:] or list_customers():
+        n = compact(cid)
+        print(f"{cid}: {n} neue Zusammenfassung(en), {pending(cid)} Einträge noch offen")
@@ -0,0 +1,208 @@
+# agent/memory_index.py
+"""
+Volltext-Index über das Kundengedächtnis (SQLite FTS5) für den memory_search-Task.
+
+- Eine Zeile pro Memory-Eintrag: (customer_id, entry_idx, timestamp, content)
+- Inkrementell: save_customer_memory/save_customer_data rufen index_append() direkt nach dem Schreiben
+- Nachziehen: sync() vergleicht die Änderungsmarke (memory_segments.version) jedes Kunden mit dem
+  Index und indiziert nur geänderte Kunden neu (Altbestand, andere Prozesse) – im Normalfall ein stat() pro Kunde
+- search(): BM25-Ranking, hervorgehobene Snippets, optional pro Kunde, mit limit/offset
+- Backend: MEMORY_INDEX_PATH (Default .cache/memory_index.sqlite)
+"""
+from __future__ import annotations
+
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from agent.memory_segments import list_customers, migrate, read_entries, version as segment_version
+except Exception:  # pragma: no cover
+    from memory_segments import list_customers, migrate, read_entries, version as segment_version
+
+INDEX_PATH = os.getenv("MEMORY_INDEX_PATH", os.path.join(".cache", "memory_index.sqlite"))
+
+
+def _fts_query(query: str, any_term: bool = False) -> str:
+    """Freitext → FTS5-Ausdruck: alle Begriffe (any_term: mindestens einer) müssen vorkommen, jeweils als Präfix."""
+    terms = re.findall(r"\w+", query, flags=re.UNICODE)
+    return (" OR " if any_term else " ").join('"' + t.replace('"', '""') + '"*' for t in terms)
+
+
+class MemoryIndex:
+    """FTS5-Index der Kundengedächtnis-Einträge."""
+
+    def __init__(self, path: str = INDEX_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        parent = os.path.dirname(os.path.abspath(path))
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
+                    content,
+                    customer_id UNINDEXED,
+                    entry_idx UNINDEXED,
+                    timestamp UNINDEXED,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS memory_files (
+                    customer_id TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )"""
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:  # commit/rollback
+                yield conn
+        finally:
+            conn.close()
+
+    def _mark(self, conn: sqlite3.Connection, customer_id: str, version: Optional[tuple]) -> None:
+        if version is None:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO memory_files (customer_id, mtime, size) VALUES (?, ?, ?)",
+            (customer_id, version[0], version[1]),
+        )
+
+    def add_entry(
+        self,
+        customer_id: str,
+        entry_idx: int,
+        entry: Dict[str, Any],
+        prev_version: Optional[tuple],
+        version: Optional[tuple],
+    ) -> None:
+        """Einen neu angehängten Eintrag indizieren.
+
+        prev_version/version: Änderungsmarke des Segment-Index vor/nach dem Anhängen. Passt
+        prev_version nicht zum Indexstand, fehlen dem Index Einträge → Kunde komplett neu indizieren.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT mtime, size FROM memory_files WHERE customer_id = ?", (customer_id,)).fetchone()
+        if (tuple(row) if row else None) != prev_version:
+            self.reindex_customer(customer_id, read_entries(customer_id), version)
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO memory_fts (content, customer_id, entry_idx, timestamp) VALUES (?, ?, ?, ?)",
+                (str(entry.get("content", "")), customer_id, entry_idx, entry.get("timestamp")),
+            )
+            self._mark(conn, customer_id, version)
+
+    def reindex_customer(self, customer_id: str, entries: List[Dict[str, Any]], version: Optional[tuple] = None) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM memory_fts WHERE customer_id = ?", (customer_id,))
+            conn.executemany(
+                "INSERT INTO memory_fts (content, customer_id, entry_idx, timestamp) VALUES (?, ?, ?, ?)",
+                [
+                    (str(item.get("content", "")), customer_id, i, item.get("timestamp"))
+                    for i, item in enumerate(entries)
+                ],
+            )
+            self._mark(conn, customer_id, version)
+
+    def sync(self, customer_id: Optional[str] = None) -> int:
+        """Indiziert geänderte/neue Kunden nach; liefert die Anzahl neu indizierter Kunden."""
+        with self._connect() as conn:
+            known = {cid: (mtime, size) for cid, mtime, size in conn.execute("SELECT customer_id, mtime, size FROM memory_files")}
+        updated = 0
+        for cid in [customer_id] if customer_id else list_customers():
+            try:
+                migrate(cid)
+                current = segment_version(cid)
+            except (OSError, ValueError):
+                continue
+            if current is None or known.get(cid) == current:
+                continue
+            self.reindex_customer(cid, read_entries(cid), current)
+            updated += 1
+        return updated
+
+    def search(
+        self,
+        query: str,
+        *,
+        customer_id: Optional[str] = None,
+        limit: int = 10,
+        offset: int = 0,
+        any_term: bool = False,
+    ) -> Dict[str, Any]:
+        """Trefferliste nach BM25: {"total", "hits": [{customer_id, entry_idx, timestamp, snippet, score}]}."""
+        match = _fts_query(query, any_term)
+        if not match:
+            return {"total": 0, "hits": []}
+        where = "memory_fts MATCH ?"
+        args: List[Any] = [match]
+        if customer_id:
+            where += " AND customer_id = ?"
+            args.append(customer_id)
+        with self._connect() as conn:
+            (total,) = conn.execute(f"SELECT COUNT(*) FROM memory_fts WHERE {where}", args).fetchone()
+            rows = conn.execute(
+                "SELECT customer_id, entry_idx, timestamp, "
+                "snippet(memory_fts, 0, '**', '**', ' … ', 24), bm25(memory_fts) "
+                f"FROM memory_fts WHERE {where} ORDER BY bm25(memory_fts) LIMIT ? OFFSET ?",
+                [*args, int(limit), int(offset)],
+            ).fetchall()
+        return {
+            "total": total,
+            "hits": [
+                {"customer_id": cid, "entry_idx": idx, "timestamp": ts, "snippet": snip, "score": round(-score, 3)}
+                for cid, idx, ts, snip, score in rows
+            ],
+        }
+
+
+_index: Optional[MemoryIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> MemoryIndex:
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = MemoryIndex()
+        return _index
+
+
+def index_append(
+    customer_id: str,
+    entry_idx: int,
+    entry: Dict[str, Any],
+    prev_version: Optional[tuple],
+    version: Optional[tuple],
+) -> None:
+    """Hook für customer_memory nach dem Anhängen; Index-Probleme dürfen das Speichern nie verhindern."""
+    try:
+        get_index().add_entry(customer_id, entry_idx, entry, prev_version, version)
+    except Exception:
+        pass
+
+
+def search(
+    query: str,
+    *,
+    customer_id: Optional[str] = None,
+    limit: int = 10,
+    offset: int = 0,
+    any_term: bool = False,
+) -> Dict[str, Any]:
+    """Volltextsuche im Kundengedächtnis (zieht vorher geänderte Kunden nach).
+
+    any_term: ODER- statt UND-Verknüpfung der Begriffe (z. B. für lange Retrieval-Anfragen).
+    """
+    index = get_index()
+    index.sync(customer_id)
+    return index.search(query, customer_id=customer_id, limit=limit, offset=offset, any_term=any_term)
@@ -0,0 +1,577 @@
+# agent/memory_segments.py
+"""
+Append-only Speicher für das Kundengedächtnis (ersetzt Read-Modify-Write auf <id>.json).
+
+Layout pro Kunde:  customer_memory/<id>/
+  seg-00001.jsonl …  ein Eintrag ({"timestamp", "content"}) pro Zeile; neues Segment ab SEGMENT_MAX_BYTES
+  index.jsonl        pro Eintrag [segment, offset, länge, timestamp, sha256] – maßgeblich für Lesen & Zählen
+  timestamps.jsonl   weitere Speicherzeitpunkte bereits vorhandener Inhalte: [entry_idx, timestamp]
+  .lock              fcntl-Lock (prozessübergreifend) für Schreiben/Migration
+  summaries.jsonl    Verdichtungen älterer Einträge (agent.memory_compaction)
+  vectors.faiss      Embedding-Index der Einträge (agent.memory_vectors)
+
+- append_entry(): O(1) – Eintrag ans aktuelle Segment, danach Indexzeile; fsync je nach MEMORY_FSYNC
+  ("always" = Default, "interval" = höchstens alle MEMORY_FSYNC_INTERVAL Sekunden, "never").
+  Indexzeilen und Hashes sind pro Kunde im Prozess gecacht (geprüft über Inode/Größe/mtime des
+  Index); Schreiben anderer Prozesse wird ab dem bekannten Stand inkrementell nachgelesen
+- Crash-Sicherheit: nur indizierte Einträge gelten; ein nicht indizierter/abgerissener Rest am
+  Segmentende bzw. eine halbe Indexzeile wird beim nächsten Schreiben abgeschnitten
+- Deduplizierung: Inhalte werden per SHA-256 (des getrimmten Texts) adressiert – identischer Inhalt
+  wird nur einmal gespeichert, ein erneutes Speichern ergänzt nur den Zeitstempel (timestamps.jsonl)
+- read_entries(start, stop): liest gezielt über die Offsets (z. B. nur die letzten N Einträge);
+  jeder Eintrag trägt "timestamps" (alle Speicherzeitpunkte, ältester zuerst)
+- dedup(): bestehende Dateien mit Duplikaten neu schreiben und die eingesparten Bytes melden –
+  explizit (python -m agent.memory_segments dedup) oder beim nächsten append_entry() eines
+  betroffenen Kunden, nie auf dem Lesepfad; abgeleitete Dateien (summaries.jsonl, vectors.faiss)
+  werden dabei verworfen und neu aufgebaut, der Volltext-Index zieht über version() nach
+- Migration: liegt noch eine alte customer_memory/<id>.json vor, wird sie beim ersten Zugriff
+  übernommen und in <id>.json.migrated umbenannt (migrate_all() für alle Kunden auf einmal)
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:  # POSIX; unter Windows nur Thread-Lock
+    import fcntl
+except Exception:  # pragma: no cover
+    fcntl = None
+
+MEMORY_FOLDER = "customer_memory"
+SEGMENT_MAX_BYTES = int(os.getenv("MEMORY_SEGMENT_MAX_BYTES", str(4 * 1024 * 1024)))
+MEMORY_FSYNC = os.getenv("MEMORY_FSYNC", "always").lower()
+MEMORY_FSYNC_INTERVAL = float(os.getenv("MEMORY_FSYNC_INTERVAL", "1.0"))
+
+_INDEX = "index.jsonl"
+_TIMESTAMPS = "timestamps.jsonl"
+# Beziehen sich auf Eintragsnummern → nach dedup() ungültig
+_DERIVED = ("summaries.jsonl", "vectors.faiss")
+_LOCKS: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_LOCKS_GUARD = threading.Lock()
+_last_fsync: Dict[str, float] = {}
+# Prozesslokaler Index-Cache je Kundenverzeichnis: {"key": (inode, size, mtime), "valid", "rows", "hashes"};
+# bei gleichem Inode wird nur nachgelesen, was seit dem letzten Mal angehängt wurde
+_index_cache: Dict[str, Dict[str, Any]] = {}
+_index_cache_lock = threading.Lock()
+# Zusatz-Zeitstempel je Kundenverzeichnis: (stat-Key, gelesene Bytes, {entry_idx: [timestamp, …]})
+_timestamps_cache: Dict[str, Tuple[Tuple[int, int, int], int, Dict[int, List[Any]]]] = {}
+
+
+def _dir(customer_id: str) -> str:
+    if not customer_id or os.sep in customer_id or customer_id.startswith("."):
+        raise ValueError(f"Ungültige Kunden-ID: {customer_id!r}")
+    return os.path.join(MEMORY_FOLDER, customer_id)
+
+
+def customer_dir(customer_id: str) -> str:
+    """Kundenverzeichnis (auch für Begleitdateien wie summaries.jsonl)."""
+    return _dir(customer_id)
+
+
+def _legacy_path(customer_id: str) -> str:
+    return os.path.join(MEMORY_FOLDER, f"{customer_id}.json")
+
+
+def _segment_name(n: int) -> str:
+    return f"seg-{n:05d}.jsonl"
+
+
+def content_hash(content: Any) -> str:
+    """Inhaltsadresse eines Eintrags (SHA-256 des getrimmten Texts)."""
+    return hashlib.sha256(str(content).strip().encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def locked(customer_id: str) -> Iterator[str]:
+    """Thread- und prozessübergreifender Schreib-Lock eines Kunden; liefert das Kundenverzeichnis."""
+    folder = _dir(customer_id)
+    with _LOCKS_GUARD:
+        tlock = _LOCKS[customer_id]
+    with tlock:
+        os.makedirs(folder, exist_ok=True)
+        with open(os.path.join(folder, ".lock"), "a") as lf:
+            if fcntl is not None:
+                fcntl.flock(lf.fileno(), fcntl.LOCK_EX)
+            try:
+                yield folder
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lf.fileno(), fcntl.LOCK_UN)
+
+
+def _fsync(f: Any, key: str) -> None:
+    if MEMORY_FSYNC == "never":
+        return
+    now = time.monotonic()
+    if MEMORY_FSYNC == "interval" and now - _last_fsync.get(key, 0.0) < MEMORY_FSYNC_INTERVAL:
+        return
+    f.flush()
+    os.fsync(f.fileno())
+    _last_fsync[key] = now
+
+
+def _read_index_raw(folder: str) -> Tuple[List[List[Any]], int]:
+    """Indexzeilen + Länge des gültigen (vollständigen) Teils in Bytes."""
+    path = os.path.join(folder, _INDEX)
+    if not os.path.exists(path):
+        return [], 0
+    rows: List[List[Any]] = []
+    valid = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # abgerissene letzte Zeile
+            try:
+                rows.append(json.loads(line))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break
+            valid += len(line)
+    return rows, valid
+
+
+def _empty_state() -> Dict[str, Any]:
+    # dups: Zeilen mit bereits bekanntem Hash → das nächste append_entry() räumt per dedup auf
+    return {"key": None, "valid": 0, "rows": [], "hashes": {}, "dups": 0, "dedup_tried": False}
+
+
+def _index_state(folder: str) -> Dict[str, Any]:
+    """Indexzeilen + Hash → entry_idx eines Kunden (gecacht, geprüft über Inode, Größe, mtime des Index).
+
+    Angehängte Zeilen werden inkrementell nachgelesen; ein neuer Inode (dedup) oder ein kürzerer
+    Index führt zum vollständigen Neuladen. "valid" < Dateigröße heißt: abgerissene letzte Zeile.
+    """
+    path = os.path.join(folder, _INDEX)
+    with _index_cache_lock:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            _index_cache.pop(folder, None)
+            return _empty_state()
+        state = _index_cache.get(folder)
+        if state is not None and state["key"] == _stat_key(st):
+            return state
+        if state is None or state["key"][0] != st.st_ino or st.st_size < state["valid"]:
+            state = _empty_state()
+        start = state["valid"]
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # abgerissene letzte Zeile
+            try:
+                row = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break
+            if row[4] not in state["hashes"]:
+                state["hashes"][row[4]] = len(state["rows"])
+            else:
+                state["dups"] += 1
+            state["rows"].append(row)
+            state["valid"] += len(line)
+        state["key"] = (st.st_ino, start + len(data), st.st_mtime_ns)
+        _index_cache[folder] = state
+        return state
+
+
+def _stat_key(st: os.stat_result) -> Tuple[int, int, int]:
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _read_index(folder: str) -> List[List[Any]]:
+    return _index_state(folder)["rows"]
+
+
+def _repair(folder: str) -> List[List[Any]]:
+    """Index auf die letzte vollständige Zeile kürzen, aktuelles Segment auf den indizierten Stand."""
+    rows, valid = _read_index_raw(folder)
+    path = os.path.join(folder, _INDEX)
+    if os.path.exists(path) and os.path.getsize(path) != valid:
+        with open(path, "r+b") as f:
+            f.truncate(valid)
+    if rows:
+        seg, off, length = rows[-1][:3]
+        seg_path = os.path.join(folder, _segment_name(seg))
+        if os.path.exists(seg_path) and os.path.getsize(seg_path) > off + length:
+            with open(seg_path, "r+b") as f:
+                f.truncate(off + length)
+    else:
+        seg_path = os.path.join(folder, _segment_name(1))
+        if os.path.exists(seg_path) and os.path.getsize(seg_path):
+            with open(seg_path, "r+b") as f:
+                f.truncate(0)
+    return rows
+
+
+def _repair_tail(folder: str, state: Dict[str, Any]) -> None:
+    """Wie _repair(), aber über den gecachten Index-Stand – nur stat/truncate, kein Neulesen."""
+    path = os.path.join(folder, _INDEX)
+    if state["key"] is not None and state["key"][1] != state["valid"]:
+        with open(path, "r+b") as f:
+            f.truncate(state["valid"])
+        with _index_cache_lock:
+            state["key"] = _stat_key(os.stat(path))
+    if state["rows"]:
+        seg, off, length = state["rows"][-1][:3]
+        seg_path = os.path.join(folder, _segment_name(seg))
+        if os.path.exists(seg_path) and os.path.getsize(seg_path) > off + length:
+            with open(seg_path, "r+b") as f:
+                f.truncate(off + length)
+    else:
+        seg_path = os.path.join(folder, _segment_name(1))
+        if os.path.exists(seg_path) and os.path.getsize(seg_path):
+            with open(seg_path, "r+b") as f:
+                f.truncate(0)
+
+
+def _append_timestamps(folder: str, items: List[Tuple[int, Any]]) -> None:
+    if not items:
+        return
+    with open(os.path.join(folder, _TIMESTAMPS), "a", encoding="utf-8") as f:
+        for idx, ts in items:
+            f.write(json.dumps([idx, ts], ensure_ascii=False, separators=(",", ":")) + "\n")
+        _fsync(f, folder + _TIMESTAMPS)
+
+
+def _write_entries(folder: str, entries: List[Dict[str, Any]]) -> List[int]:
+    """Schreibt neue Inhalte an; Duplikate (gleicher Hash) nur als Zeitstempel.
+
+    Nur unter locked(): repariert den Tail, schreibt und führt den Index-Cache mit, ohne den
+    Index neu zu lesen. Liefert entry_idx je übergebenem Eintrag.
+    """
+    state = _index_state(folder)
+    _repair_tail(folder, state)
+    rows = state["rows"]
+    seg = rows[-1][0] if rows else 1
+    seg_path = os.path.join(folder, _segment_name(seg))
+    known = state["hashes"]
+    added: Dict[str, int] = {}  # erst nach dem Indexschreiben in den Cache übernehmen
+    new_rows: List[List[Any]] = []
+    positions: List[int] = []
+    repeats: List[Tuple[int, Any]] = []
+    for entry in entries:
+        digest = content_hash(entry.get("content", ""))
+        idx = known.get(digest, added.get(digest))
+        if idx is not None:
+            positions.append(idx)
+            repeats.append((idx, entry.get("timestamp")))
+            continue
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        size = os.path.getsize(seg_path) if os.path.exists(seg_path) else 0
+        if size and size + len(line) > SEGMENT_MAX_BYTES:
+            seg += 1
+            seg_path = os.path.join(folder, _segment_name(seg))
+            size = 0
+        with open(seg_path, "ab") as f:
+            f.write(line)
+            _fsync(f, seg_path)
+        added[digest] = len(rows) + len(new_rows)
+        positions.append(added[digest])
+        new_rows.append([seg, size, len(line), entry.get("timestamp"), digest])
+    if new_rows:
+        with open(os.path.join(folder, _INDEX), "ab") as f:
+            data = b"".join(
+                (json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+                for row in new_rows
+            )
+            f.write(data)
+            f.flush()
+            _fsync(f, folder)
+            st = os.fstat(f.fileno())
+        with _index_cache_lock:
+            rows.extend(new_rows)
+            known.update(added)
+            state["valid"] += len(data)
+            state["key"] = _stat_key(st)
+            _index_cache[folder] = state
+    _append_timestamps(folder, repeats)
+    return positions
+
+
+def _migrate_locked(customer_id: str, folder: str) -> None:
+    legacy = _legacy_path(customer_id)
+    if not os.path.exists(legacy):
+        return
+    with open(legacy, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError:
+            data = []
+    entries = [item for item in data if isinstance(item, dict)] if isinstance(data, list) else []
+    # Die Legacy-Datei existiert nur bis zum ersten segmentierten Schreiben → sie ist immer der ältere Stand
+    _write_entries(folder, entries)
+    os.replace(legacy, legacy + ".migrated")
+
+
+def migrate(customer_id: str) -> None:
+    """Alte <id>.json (falls vorhanden) ins Segment-Format übernehmen."""
+    if os.path.exists(_legacy_path(customer_id)):
+        with locked(customer_id) as folder:
+            _migrate_locked(customer_id, folder)
+
+
+def append_entry(customer_id: str, entry: Dict[str, Any]) -> Tuple[int, Optional[tuple], Optional[tuple]]:
+    """Hängt einen Eintrag an; liefert (entry_idx, version_vorher, version_nachher).
+
+    Ist der Inhalt schon vorhanden, wird nur der Zeitstempel ergänzt: entry_idx ist dann der
+    bestehende Eintrag und version_vorher == version_nachher.
+    """
+    with locked(customer_id) as folder:
+        _migrate_locked(customer_id, folder)
+        state = _index_state(folder)
+        if state["dups"] and not state["dedup_tried"]:
+            # Duplikate aus einem früheren Stand: einmal unter dem ohnehin gehaltenen Lock bereinigen
+            # (nicht lesbare Zeilen → nicht bei jedem Schreiben erneut versuchen)
+            state["dedup_tried"] = True
+            _dedup_locked(customer_id, folder)
+        before = version(customer_id)
+        positions = _write_entries(folder, [entry])
+        return positions[0], before, version(customer_id)
+
+
+def version(customer_id: str) -> Optional[tuple]:
+    """Änderungsmarke (mtime, size) des Index – gleich bleibend, solange nichts angehängt wurde."""
+    path = os.path.join(_dir(customer_id), _INDEX)
+    if not os.path.exists(path):
+        return None
+    st = os.stat(path)
+    return (st.st_mtime, st.st_size)
+
+
+def generation(customer_id: str) -> Optional[int]:
+    """Bleibt beim Anhängen gleich und ändert sich, wenn dedup() die Einträge neu nummeriert."""
+    try:
+        return os.stat(os.path.join(_dir(customer_id), _INDEX)).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def count(customer_id: str) -> int:
+    migrate(customer_id)
+    return len(_read_index(_dir(customer_id)))
+
+
+def _extra_timestamps(folder: str) -> Dict[int, List[Any]]:
+    """Zusatz-Zeitstempel (gecacht über stat; Angehängtes wird ab dem bekannten Stand nachgelesen)."""
+    path = os.path.join(folder, _TIMESTAMPS)
+    with _index_cache_lock:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            _timestamps_cache.pop(folder, None)
+            return {}
+        key, done, extra = _timestamps_cache.get(folder, (None, 0, {}))
+        if key == _stat_key(st):
+            return extra
+        if key is None or key[0] != st.st_ino or st.st_size < done:
+            done, extra = 0, defaultdict(list)
+        with open(path, "rb") as f:
+            f.seek(done)
+            data = f.read()
+        for line in data.splitlines(keepends=True):
+            if not line.endswith(b"\n"):
+                break  # wird gerade geschrieben → beim nächsten Lesen
+            done += len(line)
+            try:
+                idx, ts = json.loads(line)
+            except (json.JSONDecodeError, UnicodeDecodeError, ValueError, TypeError):
+                continue  # abgerissene Zeile
+            extra[idx].append(ts)
+        _timestamps_cache[folder] = (_stat_key(st), done, extra)
+        return extra
+
+
+def _read_rows(folder: str, rows: List[List[Any]], offset: int) -> List[Dict[str, Any]]:
+    extra = _extra_timestamps(folder)
+    entries: List[Dict[str, Any]] = []
+    handles: Dict[int, Any] = {}
+    try:
+        for i, row in enumerate(rows, start=offset):
+            seg, off, length = row[:3]
+            if seg not in handles:
+                handles[seg] = open(os.path.join(folder, _segment_name(seg)), "rb")
+            f = handles[seg]
+            f.seek(off)
+            try:
+                entry = json.loads(f.read(length).decode("utf-8"))
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                continue
+            stamps = entry.get("timestamps") or [entry.get("timestamp")]
+            entry["timestamps"] = stamps + extra.get(i, [])
+            entries.append(entry)
+    finally:
+        for f in handles.values():
+            f.close()
+    return entries
+
+
+def read_entries(customer_id: str, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Einträge [start:stop] über die Offsets (negative Werte wie bei Listen)."""
+    migrate(customer_id)
+    folder = _dir(customer_id)
+    for attempt in range(2):
+        all_rows = _read_index(folder)
+        offset = range(len(all_rows))[start:stop].start if all_rows else 0
+        try:
+            return _read_rows(folder, all_rows[start:stop], offset)
+        except FileNotFoundError:
+            if attempt:
+                raise  # Segment fehlt dauerhaft
+            # dedup() hat die Segmente zwischen Index- und Segment-Lesen getauscht → neu lesen
+    return []
+
+
+def iter_entries(customer_id: str) -> Iterator[Dict[str, Any]]:
+    """Alle Einträge eines Kunden in Schreibreihenfolge."""
+    yield from read_entries(customer_id)
+
+
+def list_customers() -> List[str]:
+    """Kunden mit Gedächtnis (segmentiert oder noch im alten Format)."""
+    if not os.path.isdir(MEMORY_FOLDER):
+        return []
+    ids = set()
+    for fn in os.listdir(MEMORY_FOLDER):
+        path = os.path.join(MEMORY_FOLDER, fn)
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, _INDEX)):
+            ids.add(fn)
+        elif fn.endswith(".json") and fn != "kunden_index.json":
+            ids.add(fn[: -len(".json")])
+    return sorted(ids)
+
+
+def migrate_all() -> int:
+    """Alle alten <id>.json-Dateien übernehmen; liefert die Anzahl migrierter Kunden."""
+    migrated = 0
+    for customer_id in list_customers():
+        if os.path.exists(_legacy_path(customer_id)):
+            migrate(customer_id)
+            migrated += 1
+    return migrated
+
+
+def _segment_bytes(folder: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(folder, fn))
+        for fn in os.listdir(folder)
+        if fn.startswith("seg-") or fn in (_INDEX, _TIMESTAMPS)
+    )
+
+
+def _replace_index(folder: str, rows: List[List[Any]]) -> None:
+    """Index atomar ersetzen (neuer Inode → generation() ändert sich)."""
+    tmp = os.path.join(folder, _INDEX + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(folder, _INDEX))
+
+
+def dedup(customer_id: str, dry_run: bool = False) -> Dict[str, Any]:
+    """Fasst doppelte Inhalte eines Kunden zusammen (Zeitstempel werden vereinigt).
+
+    Liefert {"customer_id", "entries_before", "entries_after", "bytes_before", "bytes_after",
+    "reclaimed_bytes"}; mit dry_run=True wird nur gezählt (bytes_after geschätzt).
+    """
+    with locked(customer_id) as folder:
+        _migrate_locked(customer_id, folder)
+        return _dedup_locked(customer_id, folder, dry_run)
+
+
+def _dedup_locked(customer_id: str, folder: str, dry_run: bool = False) -> Dict[str, Any]:
+    rows = _repair(folder)
+    entries = _read_rows(folder, rows, 0)
+    merged: Dict[str, Dict[str, Any]] = {}
+    for entry in entries:
+        digest = content_hash(entry.get("content", ""))
+        if digest in merged:
+            merged[digest]["timestamps"].extend(entry["timestamps"])
+        else:
+            merged[digest] = entry
+    bytes_before = _segment_bytes(folder)
+    report = {
+        "customer_id": customer_id,
+        "entries_before": len(entries),
+        "entries_after": len(merged),
+        "bytes_before": bytes_before,
+    }
+    saved = 0
+    if dry_run:
+        def size_of(e: Dict[str, Any]) -> int:
+            return len(json.dumps(e, ensure_ascii=False).encode("utf-8")) + 1
+
+        saved = sum(size_of(e) for e in entries) - sum(size_of(e) for e in merged.values())
+    if dry_run or len(merged) == len(entries):
+        report["bytes_after"] = bytes_before - saved
+        report["reclaimed_bytes"] = saved
+        return report
+
+    # Neue Segmente hinter den alten schreiben (Nummern laufen weiter), Index atomar tauschen,
+    # danach die alten Segmente löschen
+    old_segments = sorted(fn for fn in os.listdir(folder) if fn.startswith("seg-"))
+    first_new = (rows[-1][0] if rows else 0) + 1
+    seg, size = first_new, 0
+    new_rows: List[List[Any]] = []
+    seg_file = open(os.path.join(folder, _segment_name(seg)), "wb")
+    try:
+        for digest, entry in merged.items():
+            stamps = sorted(t for t in entry["timestamps"] if t)
+            entry = {**entry, "timestamp": stamps[0] if stamps else entry.get("timestamp")}
+            if len(stamps) > 1:
+                entry["timestamps"] = stamps
+            else:
+                entry.pop("timestamps", None)
+            line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+            if size and size + len(line) > SEGMENT_MAX_BYTES:
+                seg_file.flush()
+                os.fsync(seg_file.fileno())
+                seg_file.close()
+                seg, size = seg + 1, 0
+                seg_file = open(os.path.join(folder, _segment_name(seg)), "wb")
+            seg_file.write(line)
+            new_rows.append([seg, size, len(line), entry.get("timestamp"), digest])
+            size += len(line)
+        seg_file.flush()
+        os.fsync(seg_file.fileno())
+    finally:
+        seg_file.close()
+    # Zusatz-Zeitstempel und abgeleitete Dateien beziehen sich auf die alten Eintragsnummern
+    for fn in [_TIMESTAMPS, *_DERIVED]:
+        try:
+            os.remove(os.path.join(folder, fn))
+        except FileNotFoundError:
+            pass
+    _replace_index(folder, new_rows)
+    for fn in old_segments:
+        os.remove(os.path.join(folder, fn))
+    report["bytes_after"] = _segment_bytes(folder)
+    report["reclaimed_bytes"] = bytes_before - report["bytes_after"]
+    return report
+
+
+def dedup_all(dry_run: bool = False) -> List[Dict[str, Any]]:
+    """dedup() für alle Kunden; liefert die Einzelberichte."""
+    return [dedup(customer_id, dry_run=dry_run) for customer_id in list_customers()]
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["dedup"]:
+        reports = dedup_all(dry_run="--dry-run" in sys.argv)
+        for r in reports:
+            print(
+                f"{r['customer_id']}: {r['entries_before']} → {r['entries_after']} Einträge, "
+                f"{r['reclaimed_bytes']} Bytes eingespart"
+            )
+        print(f"Gesamt: {sum(r['reclaimed_bytes'] for r in reports)} Bytes eingespart")
+    else:
+        print(f"{migrate_all()} Kunden migriert.")
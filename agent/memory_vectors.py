@@ -0,0 +1,234 @@
+# agent/memory_vectors.py
+"""
+Vektor-Index pro Kunde (FAISS) für die Retrieval-Auswahl im Kundengedächtnis.
+
+- Eine Datei pro Kunde neben den Segmenten: customer_memory/<id>/vectors.faiss
+  (IndexIDMap über IndexFlatIP, normalisierte Embeddings → Kosinus-Ähnlichkeit; ID = entry_idx)
+- Write-through: save_customer_memory/save_customer_data rufen vector_append() direkt nach dem Schreiben;
+  nur der neue Eintrag wird eingebettet und angehängt – kein Neuaufbau
+- Persistenz per atomarem Tausch (tmp-Datei + os.replace) unter dem Kunden-Lock (memory_segments.locked);
+  Leser sehen immer einen vollständigen Index
+- Nachziehen: sync() bettet fehlende Einträge ein (Altbestand, fehlgeschlagene Embeddings, andere Prozesse).
+  Inline nur bis MEMORY_VECTOR_INLINE_SYNC fehlende Einträge; größere Rückstände (Altbestand) laufen im
+  Hintergrund-Thread bzw. vorab per CLI (python -m agent.memory_vectors [kunde …])
+- search(customer_id, query, k): Top-k Einträge {entry_idx, score, timestamp, content}; solange der Index
+  noch nachzieht, kommen die Treffer aus dem Volltext-Index (agent.memory_index, BM25)
+- faiss/numpy werden erst beim ersten Zugriff importiert (Startup-Budget, agent.startup_bench)
+"""
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from agent.clients import get_embeddings
+    from agent.memory_segments import count, customer_dir, generation, list_customers, locked, read_entries
+    from agent.memory_index import search as search_fulltext
+except Exception:  # pragma: no cover
+    from clients import get_embeddings
+    from memory_segments import count, customer_dir, generation, list_customers, locked, read_entries
+    from memory_index import search as search_fulltext
+
+MEMORY_TOP_K = int(os.getenv("MEMORY_TOP_K", "5"))
+# Pro Eintrag maximal so viele Zeichen einbetten (Embedding-Limit, lange Blogartikel)
+EMBED_INPUT_CHARS = 8000
+EMBED_BATCH = 64
+# Bis zu so vielen fehlenden Einträgen wird im Request nachgezogen, darüber im Hintergrund
+MEMORY_VECTOR_INLINE_SYNC = int(os.getenv("MEMORY_VECTOR_INLINE_SYNC", "32"))
+
+_VECTORS = "vectors.faiss"
+_cache: Dict[str, Tuple[tuple, Any]] = {}
+_cache_lock = threading.Lock()
+_backfilling: set = set()
+_backfill_lock = threading.Lock()
+
+
+def _path(customer_id: str) -> str:
+    return os.path.join(customer_dir(customer_id), _VECTORS)
+
+
+def _file_key(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _load(customer_id: str) -> Optional[Any]:
+    """Index eines Kunden (prozesslokal gecacht, neu gelesen, sobald die Datei getauscht wurde)."""
+    path = _path(customer_id)
+    key = _file_key(path)
+    if key is None:
+        return None
+    with _cache_lock:
+        hit = _cache.get(customer_id)
+        if hit and hit[0] == key:
+            return hit[1]
+    import faiss
+
+    index = faiss.read_index(path)
+    with _cache_lock:
+        _cache[customer_id] = (key, index)
+    return index
+
+
+def _embed(texts: List[str]) -> Any:
+    import faiss
+    import numpy as np
+
+    vectors: List[List[float]] = []
+    for i in range(0, len(texts), EMBED_BATCH):
+        batch = [t[:EMBED_INPUT_CHARS] or " " for t in texts[i:i + EMBED_BATCH]]
+        vectors.extend(get_embeddings().embed_documents(batch))
+    arr = np.asarray(vectors, dtype="float32")
+    faiss.normalize_L2(arr)
+    return arr
+
+
+def _save(path: str, index: Any) -> None:
+    import faiss
+
+    tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    faiss.write_index(index, tmp)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def sync(customer_id: str, upto: Optional[int] = None) -> int:
+    """Bettet alle noch fehlenden Einträge bis upto (exklusiv) ein; liefert die Anzahl neuer Vektoren."""
+    gen = generation(customer_id)
+    index = _load(customer_id)
+    start = index.ntotal if index is not None else 0
+    total = count(customer_id) if upto is None else upto
+    if start >= total:
+        return 0
+    entries = read_entries(customer_id, start, total)
+    if not entries:
+        return 0
+    vectors = _embed([str(e.get("content", "")) for e in entries])  # außerhalb des Locks
+
+    import faiss
+    import numpy as np
+
+    with locked(customer_id):
+        if generation(customer_id) != gen:
+            return 0  # Einträge wurden neu nummeriert (memory_segments.dedup) → Vektoren veraltet
+        path = _path(customer_id)
+        current = faiss.read_index(path) if os.path.exists(path) else None
+        have = current.ntotal if current is not None else 0
+        if have < start:
+            return 0  # Index wurde zwischenzeitlich ersetzt/gelöscht → nächster sync() baut neu auf
+        vectors = vectors[have - start:]  # andere Prozesse haben evtl. schon einen Teil ergänzt
+        if not len(vectors):
+            return 0
+        if current is not None and current.d != vectors.shape[1]:
+            # anderes Embedding-Modell → Index verwerfen, nächster sync() bettet alles neu ein
+            os.remove(path)
+            return 0
+        if current is None:
+            current = faiss.IndexIDMap(faiss.IndexFlatIP(int(vectors.shape[1])))
+        current.add_with_ids(vectors, np.arange(have, have + len(vectors), dtype="int64"))
+        _save(path, current)
+        with _cache_lock:
+            _cache[customer_id] = (_file_key(path), current)
+    return len(vectors)
+
+
+def _backfill_worker(customer_id: str) -> None:
+    try:
+        sync(customer_id)
+    except Exception:
+        pass
+    finally:
+        with _backfill_lock:
+            _backfilling.discard(customer_id)
+
+
+def backfill_async(customer_id: str) -> bool:
+    """Startet sync() im Hintergrund (höchstens ein Thread pro Kunde); False, wenn schon einer läuft."""
+    with _backfill_lock:
+        if customer_id in _backfilling:
+            return False
+        _backfilling.add(customer_id)
+    threading.Thread(target=_backfill_worker, args=(customer_id,), name=f"memory-vectors-{customer_id}", daemon=True).start()
+    return True
+
+
+def _catch_up(customer_id: str, upto: Optional[int] = None) -> bool:
+    """Index bis upto (Default: alle Einträge) aktuell halten; False, solange ein Rückstand im Hintergrund läuft."""
+    index = _load(customer_id)
+    missing = (count(customer_id) if upto is None else upto) - (index.ntotal if index is not None else 0)
+    if missing <= 0:
+        return True
+    if missing > MEMORY_VECTOR_INLINE_SYNC:
+        backfill_async(customer_id)
+        return False
+    sync(customer_id, upto=upto)
+    return True
+
+
+def backfill(customer_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """Bettet den Altbestand ein (alle Kunden oder die angegebenen); liefert neue Vektoren je Kunde."""
+    return {cid: sync(cid) for cid in customer_ids or list_customers()}
+
+
+def vector_append(customer_id: str, entry_idx: int) -> None:
+    """Hook für customer_memory nach dem Anhängen; Embedding-Probleme dürfen das Speichern nie verhindern."""
+    try:
+        _catch_up(customer_id, upto=entry_idx + 1)
+    except Exception:
+        pass
+
+
+def _fulltext_hits(customer_id: str, query: str, k: int) -> List[Dict[str, Any]]:
+    """Ersatz für search(), solange der Vektor-Index nachzieht: BM25-Treffer im gleichen Format."""
+    hits: List[Dict[str, Any]] = []
+    for hit in search_fulltext(query, customer_id=customer_id, limit=k, any_term=True)["hits"]:
+        idx = int(hit["entry_idx"])
+        entry = (read_entries(customer_id, idx, idx + 1) or [{}])[0]
+        hits.append({
+            "entry_idx": idx,
+            "score": hit["score"],
+            "timestamp": entry.get("timestamp"),
+            "content": str(entry.get("content", "")),
+        })
+    return hits
+
+
+def search(customer_id: str, query: str, k: int = MEMORY_TOP_K) -> List[Dict[str, Any]]:
+    """Top-k Einträge eines Kunden zur Anfrage, absteigend nach Ähnlichkeit."""
+    if not query or not query.strip() or k <= 0:
+        return []
+    if not _catch_up(customer_id):
+        return _fulltext_hits(customer_id, query, k)
+    index = _load(customer_id)
+    if index is None or index.ntotal == 0:
+        return []
+    import faiss
+    import numpy as np
+
+    q = np.asarray([get_embeddings().embed_query(query[:EMBED_INPUT_CHARS])], dtype="float32")
+    faiss.normalize_L2(q)
+    scores, ids = index.search(q, min(int(k), index.ntotal))
+    hits: List[Dict[str, Any]] = []
+    for score, idx in zip(scores[0], ids[0]):
+        if idx < 0:
+            continue
+        entry = (read_entries(customer_id, int(idx), int(idx) + 1) or [{}])[0]
+        hits.append({
+            "entry_idx": int(idx),
+            "score": round(float(score), 4),
+            "timestamp": entry.get("timestamp"),
+            "content": str(entry.get("content", "")),
+        })
+    return hits
+
+
+if __name__ == "__main__":
+    import sys
+
+    for cid, n in backfill(sys.argv[1:] or None).items():
+        print(f"{cid}: {n} neue Vektoren")
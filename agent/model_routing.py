@@ -0,0 +1,155 @@
+# agent/model_routing.py
+"""
+Per-Task-Routing: welches Modell, welches Output-Budget, welche Temperatur.
+
+- ROUTES: benannte Profile ("light", "standard", "heavy")
+- TASK_ROUTES: Task-Name → Profil (+ optionale Overrides, z. B. engeres max_tokens)
+  Task-Namen = base_agent.TASK_REQUIREMENTS + Meta-Calls (Context-Merger, /ask)
+- Overrides per ENV: LLM_ROUTE_OVERRIDES='{"extract_topics": {"route": "standard"}}'
+- MODEL_PRICES + estimate_cost(): USD pro 1M Tokens (Input / gecachter Input / Output)
+- route_report(): Latenz, Kosten & Prompt-Cache-Trefferquote je Route/Task aus dem Activity-Log
+  CLI: python -m agent.model_routing
+"""
+from __future__ import annotations
+
+import os
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    from agent.stats import percentile, print_table
+except Exception:  # pragma: no cover
+    from stats import percentile, print_table
+
+ROUTES: Dict[str, Dict[str, Any]] = {
+    "light":    {"model": "gpt-4o-mini", "max_tokens": 800,  "temperature": 0.2},
+    "standard": {"model": "gpt-4o",      "max_tokens": 2000, "temperature": 0.4},
+    "heavy":    {"model": "gpt-4o",      "max_tokens": 3000, "temperature": 0.7},
+}
+
+# Fallback für unbekannte Tasks = bisheriges Verhalten (gpt-4o, 3000 Tokens)
+DEFAULT_ROUTE = "heavy"
+
+TASK_ROUTES: Dict[str, Dict[str, Any]] = {
+    # Leichte, strukturierte Arbeit
+    "extract_topics":          {"route": "light", "max_tokens": 300},
+    "alt_tag_writer":          {"route": "light", "max_tokens": 1500},
+    "context_merger_planner":  {"route": "light", "max_tokens": 1000},
+    "conversation_summary":    {"route": "light", "max_tokens": 600},
+    "memory_summary":          {"route": "light", "max_tokens": 500},
+    # Mittlere Tiefe
+    "context_merger_executor": {"route": "standard"},
+    "seo_audit":               {"route": "standard"},
+    "seo_lighthouse":          {"route": "standard"},
+    "ask_fast":                {"route": "standard"},
+    # Lange, kreative bzw. strategische Ausgaben
+    "content_analysis":        {"route": "heavy"},
+    "content_writing":         {"route": "heavy"},
+    "campaign_plan":           {"route": "heavy"},
+    "landingpage_strategy":    {"route": "heavy"},
+    "tactical_actions":        {"route": "heavy"},
+    "seo_optimization":        {"route": "heavy"},
+    "competitive_analysis":    {"route": "heavy"},
+    "ask_deep":                {"route": "heavy"},
+}
+
+# USD pro 1M Tokens
+MODEL_PRICES: Dict[str, Dict[str, float]] = {
+    "gpt-4o":      {"input": 2.50, "cached_input": 1.25,  "output": 10.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+}
+
+
+def _env_overrides() -> Dict[str, Dict[str, Any]]:
+    raw = os.getenv("LLM_ROUTE_OVERRIDES", "").strip()
+    if not raw:
+        return {}
+    try:
+        data = json.loads(raw)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def resolve_route(task: Optional[str]) -> Dict[str, Any]:
+    """Liefert {"route", "model", "max_tokens", "temperature"} für einen Task."""
+    entry = {**TASK_ROUTES.get(task or "", {}), **_env_overrides().get(task or "", {})}
+    name = entry.get("route", DEFAULT_ROUTE)
+    profile = dict(ROUTES.get(name, ROUTES[DEFAULT_ROUTE]))
+    for key in ("model", "max_tokens", "temperature"):
+        if key in entry:
+            profile[key] = entry[key]
+    return {"route": name, **profile}
+
+
+def estimate_cost(model: Optional[str], input_tokens: int = 0, output_tokens: int = 0, cached_tokens: int = 0) -> Optional[float]:
+    """Kosten in USD; None für unbekannte Modelle. cached_tokens ist Teilmenge von input_tokens."""
+    prices = MODEL_PRICES.get(model or "")
+    if not prices:
+        # Versions-Suffixe wie "gpt-4o-2024-08-06" auf das Basismodell abbilden
+        prices = next((p for m, p in sorted(MODEL_PRICES.items(), key=lambda x: -len(x[0])) if (model or "").startswith(m)), None)
+    if not prices:
+        return None
+    uncached = max(0, (input_tokens or 0) - (cached_tokens or 0))
+    cost = (
+        uncached * prices["input"]
+        + (cached_tokens or 0) * prices["cached_input"]
+        + (output_tokens or 0) * prices["output"]
+    ) / 1_000_000
+    return round(cost, 6)
+
+
+def route_report(events: Optional[Iterable[Dict[str, Any]]] = None, group_by: str = "route") -> List[Dict[str, Any]]:
+    """Latenz-, Kosten- & Prompt-Cache-Vergleich je Route (group_by="route") oder je Task (group_by="task").
+
+    Basis: task_run-Events mit model/latency_ms/Token-Feldern inkl. cached_tokens
+    (Treffer im eigenen Antwort-Cache ausgenommen).
+    """
+    if events is None:
+        from agent.activity_log import iter_events
+        events = iter_events(type="task_run")
+
+    groups: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"latencies": [], "costs": [], "in": 0, "out": 0, "cached": 0, "cached_runs": 0, "models": set()})
+    for e in events:
+        if e.get("type") != "task_run" or e.get("latency_ms") is None or e.get("cache_hit"):
+            continue
+        key = e.get(group_by) or "-"
+        g = groups[key]
+        g["latencies"].append(float(e["latency_ms"]))
+        g["in"] += int(e.get("input_tokens") or 0)
+        g["out"] += int(e.get("output_tokens") or 0)
+        g["cached"] += int(e.get("cached_tokens") or 0)
+        g["cached_runs"] += 1 if e.get("cached_tokens") else 0
+        g["models"].add(e.get("model") or "-")
+        cost = estimate_cost(e.get("model"), int(e.get("input_tokens") or 0), int(e.get("output_tokens") or 0), int(e.get("cached_tokens") or 0))
+        if cost is not None:
+            g["costs"].append(cost)
+
+    report = []
+    for key, g in sorted(groups.items()):
+        n = len(g["latencies"])
+        report.append({
+            group_by: key,
+            "models": ", ".join(sorted(g["models"])),
+            "runs": n,
+            "latency_ms_p50": round(percentile(g["latencies"], 50)),
+            "latency_ms_p95": round(percentile(g["latencies"], 95)),
+            "avg_input_tokens": round(g["in"] / n) if n else 0,
+            "avg_output_tokens": round(g["out"] / n) if n else 0,
+            # Prompt-Cache des Providers: Anteil Runs mit Treffer / Anteil gecachter Input-Tokens
+            "prompt_cache_hit_rate": round(g["cached_runs"] / n, 3) if n else 0.0,
+            "cached_input_share": round(g["cached"] / g["in"], 3) if g["in"] else 0.0,
+            "avg_cost_usd": round(sum(g["costs"]) / len(g["costs"]), 5) if g["costs"] else None,
+            "total_cost_usd": round(sum(g["costs"]), 4) if g["costs"] else None,
+        })
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Latenz-/Kostenreport je LLM-Route")
+    parser.add_argument("--by", choices=["route", "task"], default="route")
+    args = parser.parse_args()
+    print_table(route_report(group_by=args.by), "Keine task_run-Events mit Latenzdaten gefunden.", float_digits=5)
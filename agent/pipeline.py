@@ -0,0 +1,251 @@
+# agent/pipeline.py
+"""
+Pipeline-Runner: mehrere Tasks als DAG auf Basis von base_agent.run_agent.
+
+- Kontext wird EINMAL gebaut (get_context_from_text_or_url bzw. übergebener merged_context)
+  und allen Knoten als "text" mitgegeben – statt pro Task neu zu laden
+- Unabhängige Knoten laufen parallel (ThreadPoolExecutor, PIPELINE_MAX_WORKERS);
+  Rate-Limits regelt weiterhin das LLM-Gateway
+- Upstream-Ergebnisse werden automatisch in Downstream-Felder gemappt (OUTPUT_FIELDS),
+  explizite Zuordnung über node["inputs"] = {"feld": "knoten_id"}
+- Schlägt ein Knoten fehl, werden abhängige Knoten übersprungen (status="skipped")
+- Jeder Knoten läuft in einem eigenen Gespräch (results[id]["conversation_id"]); unter der
+  Pipeline-conversation_id wird nach Abschluss EINMAL ein Verlauf mit allen Ergebnissen angelegt
+- Rückgabe: alle Ergebnisse + Timings pro Knoten (queued_ms, start_ms, duration_ms)
+
+Knoten-Format:
+  {"id": "audit", "task": "seo_audit", "params": {...}, "depends_on": ["..."], "inputs": {...}}
+"""
+from __future__ import annotations
+
+import os
+import time
+import uuid
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, List, Optional
+
+try:
+    from agent.base_agent import run_agent
+    from agent.tracing import span
+    from agent import conversation_store
+except Exception:  # pragma: no cover
+    from base_agent import run_agent
+    from tracing import span
+    import conversation_store
+
+try:
+    from agent.context_utils import get_context_from_text_or_url
+except Exception:  # pragma: no cover
+    try:
+        from agent.tools.context_utils import get_context_from_text_or_url
+    except Exception:
+        from context_utils import get_context_from_text_or_url
+
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+
+# Welche Felder ein Task-Ergebnis downstream befüllt
+OUTPUT_FIELDS: Dict[str, List[str]] = {
+    "seo_audit": ["seo_audit_summary", "seo_summary"],
+    "seo_lighthouse": ["lighthouse_json"],
+    "extract_topics": ["topic_keywords"],
+    "competitive_analysis": ["competitors_context"],
+}
+
+# Vordefinierte Abläufe (params kommen aus den gemeinsamen Pipeline-Parametern)
+PRESETS: Dict[str, List[Dict[str, Any]]] = {
+    "seo": [
+        {"id": "seo_audit", "task": "seo_audit"},
+        {"id": "seo_lighthouse", "task": "seo_lighthouse"},
+        {"id": "seo_optimization", "task": "seo_optimization", "depends_on": ["seo_audit", "seo_lighthouse"]},
+        {"id": "tactical_actions", "task": "tactical_actions", "depends_on": ["seo_audit"]},
+    ],
+}
+
+
+def _normalize_nodes(nodes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Prüft IDs, Abhängigkeiten und Zyklen; liefert {id: node}."""
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for raw in nodes:
+        if not raw.get("task"):
+            raise ValueError(f"Pipeline-Knoten ohne Task: {raw}")
+        node = {
+            "id": raw.get("id") or raw["task"],
+            "task": raw["task"],
+            "params": dict(raw.get("params") or {}),
+            "depends_on": list(raw.get("depends_on") or []),
+            "inputs": dict(raw.get("inputs") or {}),
+        }
+        if node["id"] in by_id:
+            raise ValueError(f"Doppelte Knoten-ID in Pipeline: {node['id']}")
+        by_id[node["id"]] = node
+
+    for node in by_id.values():
+        # explizite inputs implizieren eine Abhängigkeit
+        for src in node["inputs"].values():
+            if src not in node["depends_on"]:
+                node["depends_on"].append(src)
+        for dep in node["depends_on"]:
+            if dep not in by_id:
+                raise ValueError(f"Knoten '{node['id']}' hängt von unbekanntem Knoten '{dep}' ab")
+
+    # Zyklen erkennen (Kahn)
+    indegree = {nid: len(n["depends_on"]) for nid, n in by_id.items()}
+    ready = [nid for nid, d in indegree.items() if d == 0]
+    seen = 0
+    while ready:
+        nid = ready.pop()
+        seen += 1
+        for other in by_id.values():
+            if nid in other["depends_on"]:
+                indegree[other["id"]] -= 1
+                if indegree[other["id"]] == 0:
+                    ready.append(other["id"])
+    if seen != len(by_id):
+        raise ValueError("Pipeline enthält einen Zyklus")
+    return by_id
+
+
+def _upstream_fields(node: Dict[str, Any], nodes: Dict[str, Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    fields: Dict[str, Any] = {}
+    for dep in node["depends_on"]:
+        for field in OUTPUT_FIELDS.get(nodes[dep]["task"], []):
+            fields[field] = results[dep]["response"]
+    for field, src in node["inputs"].items():
+        fields[field] = results[src]["response"]
+    return fields
+
+
+def _node_kwargs(
+    node: Dict[str, Any],
+    shared: Dict[str, Any],
+    nodes: Dict[str, Dict[str, Any]],
+    results: Dict[str, Dict[str, Any]],
+) -> Dict[str, Any]:
+    """Parameter eines Knotens: gemeinsame params < Upstream-Ergebnisse < Knoten-params."""
+    return {**shared, **_upstream_fields(node, nodes, results), **node["params"]}
+
+
+def _start_conversation(conversation_id: str, nodes: Dict[str, Dict[str, Any]], results: Dict[str, Dict[str, Any]]) -> None:
+    """Pipeline-Gespräch einmal mit allen erfolgreichen Ergebnissen anlegen (Basis für Follow-ups)."""
+    done = [nid for nid in nodes if results.get(nid, {}).get("status") == "ok"]
+    if not done:
+        return
+    request = "Pipeline-Ergebnisse für: " + ", ".join(nodes[nid]["task"] for nid in done)
+    merged = "\n\n".join(f"## {nid} ({nodes[nid]['task']})\n{results[nid]['response']}" for nid in done)
+    try:
+        conversation_store.start(conversation_id, [{"role": "user", "content": request}], merged, task="pipeline")
+    except Exception:
+        pass
+
+
+def run_pipeline(
+    nodes: Optional[List[Dict[str, Any]]] = None,
+    *,
+    preset: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    merged_context: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    save_to_memory: bool = False,
+    max_workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Führt eine Task-DAG aus.
+
+    params: gemeinsame Felder für alle Knoten (url, customer_id, zielgruppe, …);
+            Upstream-Ergebnisse überschreiben sie, Knoten-params haben immer Vorrang.
+    merged_context: bereits gemergter Kontext (z. B. Context-Merger-Bundle) – sonst wird er
+            einmalig aus text/url/customer_id/pdf_path gebaut.
+    """
+    if preset:
+        if preset not in PRESETS:
+            raise ValueError(f"Unbekanntes Pipeline-Preset: {preset}")
+        nodes = PRESETS[preset]
+    if not nodes:
+        raise ValueError("Pipeline ohne Knoten")
+    graph = _normalize_nodes(nodes)
+    shared = dict(params or {})
+    if shared.get("url") and not shared.get("urls"):
+        shared["urls"] = [shared["url"]]
+    conversation_id = conversation_id or str(uuid.uuid4())
+    pipeline_id = str(uuid.uuid4())
+
+    t0 = time.perf_counter()
+    with span("pipeline", pipeline_id=pipeline_id, nodes=len(graph), customer_id=shared.get("customer_id")) as root:
+        # 1) Kontext einmal bauen
+        with span("pipeline.context"):
+            if merged_context is None:
+                merged_context = get_context_from_text_or_url(
+                    shared.get("text", ""),
+                    shared.get("url", ""),
+                    shared.get("customer_id"),
+                    shared.get("pdf_path"),
+                )
+        context_ms = round((time.perf_counter() - t0) * 1000, 1)
+        shared["text"] = merged_context
+
+        # 2) DAG abarbeiten
+        results: Dict[str, Dict[str, Any]] = {}
+        pending = dict(graph)
+        running: Dict[Any, str] = {}
+        ready_at: Dict[str, float] = {}
+
+        def _run_node(node: Dict[str, Any], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
+            with span("pipeline.node", node=node["id"], task=node["task"]):
+                # eigenes Gespräch je Knoten – parallele Knoten überschreiben sich sonst den Verlauf
+                out = run_agent(node["task"], conversation_id=str(uuid.uuid4()), save_to_memory=save_to_memory, **kwargs)
+            return {**out, "_started": started, "_finished": time.perf_counter()}
+
+        with ThreadPoolExecutor(max_workers=max_workers or PIPELINE_MAX_WORKERS) as pool:
+            while pending or running:
+                for nid, node in list(pending.items()):
+                    deps = node["depends_on"]
+                    if any(d in results and results[d]["status"] != "ok" for d in deps):
+                        results[nid] = {"task": node["task"], "status": "skipped", "error": "Upstream-Knoten fehlgeschlagen"}
+                        del pending[nid]
+                        continue
+                    if not all(d in results for d in deps):
+                        continue
+                    ready_at[nid] = time.perf_counter()
+                    kwargs = _node_kwargs(node, shared, graph, results)
+                    # eigener Kontext pro Thread → Tracing-Spans hängen unter "pipeline"
+                    ctx = contextvars.copy_context()
+                    running[pool.submit(ctx.run, _run_node, node, kwargs)] = nid
+                    del pending[nid]
+
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    nid = running.pop(fut)
+                    node = graph[nid]
+                    try:
+                        out = fut.result()
+                        results[nid] = {
+                            "task": node["task"],
+                            "status": "ok",
+                            "response": out["response"],
+                            "questions": out.get("questions", []),
+                            "conversation_id": out.get("conversation_id"),
+                            "queued_ms": round((out["_started"] - ready_at[nid]) * 1000, 1),
+                            "start_ms": round((out["_started"] - t0) * 1000, 1),
+                            "duration_ms": round((out["_finished"] - out["_started"]) * 1000, 1),
+                        }
+                    except Exception as e:
+                        results[nid] = {
+                            "task": node["task"],
+                            "status": "error",
+                            "error": str(e),
+                            "duration_ms": round((time.perf_counter() - ready_at[nid]) * 1000, 1),
+                        }
+
+        _start_conversation(conversation_id, graph, results)
+        total_ms = round((time.perf_counter() - t0) * 1000, 1)
+        root.set("failed", sum(1 for r in results.values() if r["status"] != "ok"))
+
+    return {
+        "pipeline_id": pipeline_id,
+        "conversation_id": conversation_id,
+        "results": {nid: results[nid] for nid in graph},
+        "timings": {"context_ms": context_ms, "total_ms": total_ms},
+    }
@@ -1,24 +1,17 @@
 # agent/query.py
 
-import os
 import re
+import time
 import uuid
 from typing import Dict, List, Optional
 
-from qdrant_client import QdrantClient
-from langchain_openai import ChatOpenAI
-
 from agent.embedder import create_embedding
-from agent.activity_log import log_event  # neu
-
-# ===== Qdrant Client =====
-qdrant = QdrantClient(
-    url=os.getenv("QDRANT_URL"),
-    api_key=os.getenv("QDRANT_API_KEY")
-)
-
-# ===== LangChain LLM mit erhöhtem Token-Limit =====
-llm = ChatOpenAI(model="gpt-4o", max_tokens=3000)
+from agent.llm_cache import lookup as cache_lookup, store as cache_store
+from agent.usage import extract_usage, record_usage
+from agent.llm_gateway import get_gateway
+from agent.model_routing import resolve_route
+from agent import semantic_cache, conversation_store
+from agent.clients import get_qdrant
 
 # ===== System-Prompts für Fast vs. Deep =====
 FAST_SYSTEM_MESSAGE = (
@@ -44,10 +37,14 @@ def query_agent(
     mode: str = "fast",
     clarifications: Optional[Dict[str, str]] = None,
     conversation_id: Optional[str] = None,
-    collection_name: str = "agent_chunks"
+    collection_name: str = "agent_chunks",
+    use_cache: bool = True
 ) -> Dict:
     """
     Fragt den Marketing-Analyse-Agenten an und unterstützt optional Deep Reasoning mit Rückfragen.
+    Identische Message-Listen werden aus dem Exact-Match-Cache bedient (use_cache=False umgeht ihn).
+    Mit bekannter conversation_id wird der bisherige Verlauf (conversation_store) vorangestellt;
+    gesendet wird nur der neue Turn (Kontext + Frage) zusätzlich.
 
     Returns:
         {
@@ -60,9 +57,35 @@ def query_agent(
     if conversation_id is None:
         conversation_id = str(uuid.uuid4())
 
+    # 1a) Bisheriger Verlauf (None = neues Gespräch)
+    history = conversation_store.messages_for(conversation_id, [])
+
     # 2) Kontext aus Qdrant (limit=8 für mehr Chunks)
     embedding = create_embedding(question)
-    results = qdrant.query_points(
+
+    # 2a) Semantischer Cache: Paraphrase einer bereits beantworteten Frage?
+    #     (nicht bei Klarstellungen oder laufendem Gespräch – die Antwort hängt dann von mehr als der Frage ab)
+    use_semantic = use_cache and not clarifications and history is None
+    if use_semantic:
+        hit = semantic_cache.lookup(embedding, collection_name, mode, conversation_id=conversation_id)
+        if hit is not None:
+            try:
+                conversation_store.start(
+                    conversation_id,
+                    [{"role": "system", "content": FAST_SYSTEM_MESSAGE if mode == "fast" else DEEP_SYSTEM_MESSAGE},
+                     {"role": "user", "content": f"Frage: {question}"}],
+                    hit["response"], task=f"ask_{mode}",
+                )
+            except Exception:
+                pass
+            return {
+                "response": hit["response"],
+                "questions": hit["questions"],
+                "conversation_id": conversation_id
+            }
+    collection_version = semantic_cache.collection_version(collection_name)
+
+    results = get_qdrant().query_points(
         collection_name=collection_name,
         query_vector=embedding,
         limit=8
@@ -72,31 +95,57 @@ def query_agent(
     # 3) System-Message
     system_content = FAST_SYSTEM_MESSAGE if mode == "fast" else DEEP_SYSTEM_MESSAGE
 
-    # 4) Chat-Messages bauen
-    messages = [
-        {"role": "system", "content": system_content},
-        {"role": "user", "content": f"Kontext:\n{context}\n\nFrage: {question}"}
-    ]
+    # 4) Chat-Messages bauen (neuer Turn; Verlauf davor, sonst System-Message)
+    turn = [{"role": "user", "content": f"Kontext:\n{context}\n\nFrage: {question}"}]
     if mode == "deep" and clarifications:
         clar_text = "\n".join(f"Frage: {q}\nAntwort: {a}" for q, a in clarifications.items())
-        messages.append({"role": "user", "content": f"Klarstellungen:\n{clar_text}"})
-
-    # 5) LLM-Aufruf
-    resp = llm.invoke(messages)
-    resp_content = resp.content
-
-    # 6) Usage-Logging
-    log_event({
-        "type": "usage",
-        "conversation_id": conversation_id,
-        "mode": mode,
-        "input_tokens": resp.usage.prompt_tokens,
-        "output_tokens": resp.usage.completion_tokens
-    })
+        turn.append({"role": "user", "content": f"Klarstellungen:\n{clar_text}"})
+    if history is None:
+        messages = [{"role": "system", "content": system_content}] + turn
+    else:
+        messages = history + turn
+
+    # 5) LLM-Aufruf (Exact-Match-Cache davor)
+    route = resolve_route(f"ask_{mode}")
+    llm_kwargs = {"max_tokens": route["max_tokens"], "temperature": route["temperature"]}
+    cache_key, cached = cache_lookup(
+        route["model"], llm_kwargs, messages,
+        use_cache=use_cache, task=f"ask_{mode}", conversation_id=conversation_id
+    )
+    if cached is not None:
+        resp_content = cached["response"]
+    else:
+        started = time.perf_counter()
+        resp = get_gateway().invoke(messages, model=route["model"], **llm_kwargs)
+        resp_content = resp.content
+        usage = extract_usage(resp)
+        cache_store(cache_key, route["model"], resp_content, usage)
+
+        # 6) Usage-Logging (Tokens, Latenz, Kosten)
+        record_usage(
+            usage, task=f"ask_{mode}", model=route["model"],
+            latency_ms=round((time.perf_counter() - started) * 1000),
+            conversation_id=conversation_id, mode=mode,
+        )
+
+    # 6a) Verlauf fortschreiben
+    try:
+        if history is None:
+            conversation_store.start(conversation_id, messages, resp_content, task=f"ask_{mode}")
+        else:
+            conversation_store.append(conversation_id, turn, resp_content)
+    except Exception:
+        pass
 
     # 7) Rückfragen extrahieren (nur deep)
     questions = extract_questions_from_response(resp_content) if mode == "deep" else []
 
+    if use_semantic:
+        semantic_cache.store(
+            embedding, collection_name, mode, question, resp_content, questions,
+            version=collection_version
+        )
+
     return {
         "response": resp_content,
         "questions": questions,
@@ -0,0 +1,224 @@
+# agent/semantic_cache.py
+"""
+Semantischer Frage-Cache für query.query_agent.
+
+- Nutzt das ohnehin berechnete Frage-Embedding: liegt eine gecachte Frage derselben
+  Collection + desselben Modus innerhalb SEMANTIC_CACHE_MAX_DISTANCE (Cosinus-Distanz),
+  wird deren Antwort zurückgegeben – ohne Qdrant-Suche und ohne LLM-Call.
+- Invalidierung: jede Collection hat eine Versionsnummer; vectorstore.upsert_chunks ruft
+  invalidate_collection() auf, danach zählen nur noch Einträge der neuen Version.
+- Backend: SQLite-Datei (prozessübergreifend: API, Scheduler/Scraper), pro Collection+Modus
+  höchstens SEMANTIC_CACHE_MAX_ENTRIES Einträge (älteste fliegen raus), TTL wie beim LLM-Cache.
+- Embeddings liegen L2-normiert als float32-BLOB vor; lookup() bewertet alle Kandidaten mit einem
+  Matrix-Vektor-Produkt (numpy, erst beim ersten Zugriff importiert). Fehler im Cache (kaputter
+  BLOB, anderes Embedding-Modell) gelten als Miss – der Cache bricht nie den Aufruf.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+try:
+    from agent.activity_log import log_event
+except Exception:  # pragma: no cover
+    def log_event(payload: Dict[str, Any]):
+        pass
+
+CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", os.path.join(".cache", "semantic_cache.sqlite"))
+# text-embedding-3-small: Paraphrasen liegen typischerweise < 0.08 Cosinus-Distanz
+MAX_DISTANCE = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.08"))
+MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500"))
+CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "86400"))
+CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+_LOCK = threading.Lock()
+_initialized_paths: set = set()
+
+
+def _unit(vector: Any) -> Any:
+    """float32-Vektor auf Länge 1 normiert (Nullvektor bleibt Null → Distanz 1.0)."""
+    import numpy as np
+
+    arr = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(arr))
+    return arr / norm if norm else arr
+
+
+def _nearest(rows: List[tuple], embedding: Sequence[float], threshold: float) -> Optional[Dict[str, Any]]:
+    """Nächster Treffer innerhalb threshold (eine Matrix-Vektor-Multiplikation über alle Kandidaten)."""
+    import numpy as np
+
+    query_vec = _unit(embedding)
+    candidates = []
+    for row in rows:
+        try:
+            vec = np.frombuffer(row[1], dtype=np.float32)
+        except (TypeError, ValueError):
+            continue  # kein/kaputter BLOB
+        # andere Dimension = Eintrag eines früheren Embedding-Modells → ignorieren
+        if vec.shape == query_vec.shape:
+            candidates.append((row, vec))
+    if not candidates:
+        return None
+    distances = 1.0 - np.stack([vec for _, vec in candidates]) @ query_vec
+    i = int(np.argmin(distances))
+    dist = float(distances[i])
+    if dist > threshold:
+        return None
+    question, _, response, questions = candidates[i][0]
+    return {
+        "question": question,
+        "response": response,
+        "questions": json.loads(questions) if questions else [],
+        "distance": dist,
+    }
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    parent = os.path.dirname(os.path.abspath(CACHE_PATH))
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    conn = sqlite3.connect(CACHE_PATH, timeout=10)
+    try:
+        with conn:
+            if CACHE_PATH not in _initialized_paths:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS collection_versions ("
+                    "collection TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+                )
+                conn.execute(
+                    """CREATE TABLE IF NOT EXISTS semantic_cache (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        collection TEXT NOT NULL,
+                        mode TEXT NOT NULL,
+                        version INTEGER NOT NULL,
+                        question TEXT,
+                        embedding BLOB NOT NULL,
+                        response TEXT NOT NULL,
+                        questions TEXT,
+                        created_at REAL NOT NULL
+                    )"""
+                )
+                conn.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_semantic_scope "
+                    "ON semantic_cache(collection, mode, version)"
+                )
+                _initialized_paths.add(CACHE_PATH)
+            yield conn
+    finally:
+        conn.close()
+
+
+def _version(conn: sqlite3.Connection, collection: str) -> int:
+    row = conn.execute(
+        "SELECT version FROM collection_versions WHERE collection = ?", (collection,)
+    ).fetchone()
+    return int(row[0]) if row else 0
+
+
+def collection_version(collection: str) -> int:
+    """Aktuelle Version einer Collection (vor der Qdrant-Suche merken, an store() übergeben)."""
+    try:
+        with _LOCK, _connect() as conn:
+            return _version(conn, collection)
+    except Exception:
+        return 0
+
+
+def lookup(
+    embedding: Sequence[float],
+    collection: str,
+    mode: str,
+    *,
+    max_distance: Optional[float] = None,
+    conversation_id: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
+    """Liefert {"response", "questions", "question", "distance"} des nächsten Treffers oder None."""
+    if not CACHE_ENABLED:
+        return None
+    threshold = MAX_DISTANCE if max_distance is None else max_distance
+    try:
+        with _LOCK, _connect() as conn:
+            version = _version(conn, collection)
+            rows = conn.execute(
+                "SELECT question, embedding, response, questions FROM semantic_cache "
+                "WHERE collection = ? AND mode = ? AND version = ? AND created_at >= ?",
+                (collection, mode, version, time.time() - CACHE_TTL if CACHE_TTL > 0 else 0),
+            ).fetchall()
+    except Exception:
+        return None
+
+    try:
+        best = _nearest(rows, embedding, threshold)
+    except Exception:
+        best = None  # kaputter Eintrag o. Ä. → wie ein Miss behandeln
+
+    try:
+        log_event({
+            "type": "semantic_cache",
+            "cache_hit": best is not None,
+            "conversation_id": conversation_id,
+            "mode": mode,
+            "collection": collection,
+            "distance": round(best["distance"], 4) if best else None,
+        })
+    except Exception:
+        pass
+    return best
+
+
+def store(
+    embedding: Sequence[float],
+    collection: str,
+    mode: str,
+    question: str,
+    response: str,
+    questions: Optional[List[str]] = None,
+    version: Optional[int] = None,
+) -> None:
+    """Legt eine beantwortete Frage ab.
+
+    version: Collection-Version, gegen die die Antwort erzeugt wurde. Wurde die Collection
+    zwischenzeitlich neu befüllt, wird die (veraltete) Antwort verworfen.
+    """
+    if not CACHE_ENABLED:
+        return
+    try:
+        with _LOCK, _connect() as conn:
+            current = _version(conn, collection)
+            if version is not None and version != current:
+                return
+            conn.execute(
+                "INSERT INTO semantic_cache (collection, mode, version, question, embedding, response, questions, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection, mode, current, question, _unit(embedding).tobytes(), response,
+                 json.dumps(questions or [], ensure_ascii=False), time.time()),
+            )
+            # Größenlimit pro Collection+Modus: älteste Einträge verdrängen
+            conn.execute(
+                "DELETE FROM semantic_cache WHERE collection = ? AND mode = ? AND id NOT IN "
+                "(SELECT id FROM semantic_cache WHERE collection = ? AND mode = ? ORDER BY id DESC LIMIT ?)",
+                (collection, mode, collection, mode, MAX_ENTRIES),
+            )
+    except Exception:
+        pass
+
+
+def invalidate_collection(collection: str) -> None:
+    """Nach einem Re-Upsert: Version hochzählen und alte Einträge entfernen."""
+    try:
+        with _LOCK, _connect() as conn:
+            conn.execute(
+                "INSERT INTO collection_versions (collection, version) VALUES (?, 1) "
+                "ON CONFLICT(collection) DO UPDATE SET version = version + 1",
+                (collection,),
+            )
+            conn.execute("DELETE FROM semantic_cache WHERE collection = ?", (collection,))
+    except Exception:
+        pass
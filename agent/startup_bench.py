@@ -0,0 +1,111 @@
+# agent/startup_bench.py
+"""
+Startup-Benchmark: Importzeit der Einstiegsmodule mit `python -X importtime`.
+
+- Jedes Modul wird in einem frischen Interpreter importiert (kein Modul-Cache zwischen den Läufen),
+  gemessen wird die kumulierte Importzeit des Moduls selbst (Median über --runs Läufe)
+- Budget pro Modul (IMPORT_BUDGETS_MS, ENV IMPORT_BUDGET_MS überschreibt alle); Überschreitung → Exit-Code 1
+- Zusätzlich: nach dem Import dürfen keine Clients erzeugt sein (agent.clients.initialized() leer)
+
+CLI:
+  python -m agent.startup_bench [--runs 3] [--module agent.query ...] [--budget-ms 800]
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import json
+import statistics
+import subprocess
+from typing import Dict, List, Optional
+
+# Einstiegspunkte: API, Streamlit-Backend (base_agent/context_merger/query), Batch/Pipeline
+IMPORT_BUDGETS_MS: Dict[str, float] = {
+    "agent.api": 2500,
+    "agent.base_agent": 1200,
+    "agent.context_merger": 1200,
+    "agent.query": 600,
+    "agent.vectorstore": 300,
+    "agent.embedder": 300,
+    "agent.pipeline": 1200,
+    "agent.batch": 1200,
+}
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.*)$")
+
+# __import__ statt importlib.import_module – nur der C-Importpfad wird von -X importtime gemessen
+_PROBE = (
+    "import json, sys; __import__(sys.argv[1]); "
+    "from agent import clients; print(json.dumps(clients.initialized()))"
+)
+
+
+def measure(module: str, cwd: Optional[str] = None) -> Dict[str, object]:
+    """Ein Import in frischem Interpreter → {"module", "cumulative_ms", "clients", "top"}."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, module],
+        capture_output=True, text=True, cwd=cwd,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import von {module} fehlgeschlagen:\n{proc.stderr[-2000:]}")
+    cumulative_us = 0
+    own: List[tuple] = []
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if not m:
+            continue
+        self_us, cum_us, name = int(m.group(1)), int(m.group(2)), m.group(3)
+        own.append((self_us, name.strip()))
+        if name.strip() == module:
+            cumulative_us = cum_us
+    clients = json.loads(proc.stdout.strip().splitlines()[-1] or "[]")
+    top = sorted(own, reverse=True)[:5]
+    return {
+        "module": module,
+        "cumulative_ms": round(cumulative_us / 1000, 1),
+        "clients": clients,
+        "top": [f"{name} ({us / 1000:.1f} ms)" for us, name in top],
+    }
+
+
+def run(modules: List[str], runs: int = 3, budget_ms: Optional[float] = None) -> List[Dict[str, object]]:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    rows = []
+    for module in modules:
+        samples = [measure(module, cwd=root) for _ in range(max(1, runs))]
+        budget = budget_ms if budget_ms is not None else IMPORT_BUDGETS_MS.get(module, 1000)
+        median = statistics.median(s["cumulative_ms"] for s in samples)
+        clients = samples[-1]["clients"]
+        rows.append({
+            "module": module,
+            "median_ms": median,
+            "budget_ms": budget,
+            "clients_at_import": clients,
+            "ok": median <= budget and not clients,
+            "top": samples[-1]["top"],
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Importzeit-Budget der Einstiegsmodule prüfen")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--module", action="append", default=None, help="nur diese Module (mehrfach möglich)")
+    env_budget = os.getenv("IMPORT_BUDGET_MS")
+    parser.add_argument("--budget-ms", type=float, default=float(env_budget) if env_budget else None)
+    args = parser.parse_args()
+
+    results = run(args.module or list(IMPORT_BUDGETS_MS), runs=args.runs, budget_ms=args.budget_ms)
+    failed = False
+    for r in results:
+        flag = "OK  " if r["ok"] else "FAIL"
+        print(f"{flag} {r['module']:<22} {r['median_ms']:>8.1f} ms (Budget {r['budget_ms']:.0f} ms)")
+        if r["clients_at_import"]:
+            print(f"     Clients beim Import erzeugt: {', '.join(r['clients_at_import'])}")
+        if not r["ok"]:
+            failed = True
+            print("     langsamste Importe: " + "; ".join(r["top"]))
+    sys.exit(1 if failed else 0)
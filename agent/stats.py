@@ -0,0 +1,40 @@
+# agent/stats.py
+"""
+Gemeinsame Helfer für Kennzahlen und CLI-Auswertungen.
+
+- percentile(values, pct): Nearest-Rank-Perzentil (0.0 bei leerer Liste) – Gateway-Metriken,
+  Routing-Report, Tracing-Phasen, API-Benchmark
+- print_table(rows, empty): Liste gleichförmiger Dicts als ausgerichtete Textspalten
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[idx]
+
+
+def print_table(rows: List[Dict[str, Any]], empty: str = "Keine Daten.", float_digits: Optional[int] = None) -> None:
+    """Spalten = Keys der ersten Zeile; None → "-", Floats optional mit fester Nachkommazahl."""
+    if not rows:
+        print(empty)
+        return
+
+    def _fmt(v: Any) -> str:
+        if v is None:
+            return "-"
+        if float_digits is not None and isinstance(v, float):
+            return f"{v:.{float_digits}f}"
+        return str(v)
+
+    cols = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(_fmt(r[c])) for r in rows)) for c in cols}
+    print("  ".join(c.ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(_fmt(r[c]).ljust(widths[c]) for c in cols))
@@ -0,0 +1,96 @@
+# test_activity_parquet.py
+
+import glob
+import json
+import os
+import shutil
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from agent import activity_log, activity_parquet, activity_segments
+
+
+@pytest.fixture
+def log_file(monkeypatch, tmp_path):
+    path = str(tmp_path / "activity_log.jsonl")
+    monkeypatch.setattr(activity_log, "LOG_FILE", path)
+    monkeypatch.setattr(activity_parquet, "PARQUET_DIR", str(tmp_path / "parquet"))
+    monkeypatch.setattr(activity_segments, "RETENTION_DAYS", 0)
+    return path
+
+
+def _write(log_file, day, n, start=0):
+    with open(log_file, "a", encoding="utf-8") as f:
+        for i in range(start, start + n):
+            f.write(json.dumps({
+                "timestamp": f"2024-03-{day}T{i // 60:02d}:{i % 60:02d}:00",
+                "type": "task_run", "customer_id": "kunde", "task": "seo_audit", "i": i,
+            }) + "\n")
+
+
+def _compacted():
+    """(Tag, i) aller Zeilen in den Parquet-Partitionen."""
+    rows = []
+    for path in glob.glob(os.path.join(activity_parquet.PARQUET_DIR, "day=*", "*.parquet")):
+        df = pd.read_parquet(path)
+        rows += [(ts.date().isoformat(), int(i)) for ts, i in zip(df["timestamp"], df["i"])]
+    return sorted(rows)
+
+
+def test_compact_closed_days_only_and_idempotent(log_file):
+    _write(log_file, "01", 5)
+    _write(log_file, "02", 3)
+    _write(log_file, "03", 2)  # offener Tag
+
+    result = activity_parquet.compact(before="2024-03-03")
+    assert result["days"] == ["2024-03-01", "2024-03-02"]
+    assert result["events"] == 8
+    assert activity_parquet.compacted_days() == ["2024-03-01", "2024-03-02"]
+    first = _compacted()
+    assert len(first) == 8
+
+    again = activity_parquet.compact(before="2024-03-03")
+    assert again["events"] == 0 and again["offset"] == result["offset"]
+    assert _compacted() == first
+
+
+def test_crash_before_state_save_rewrites_same_files(log_file):
+    _write(log_file, "01", 4)
+    state_path = os.path.join(activity_parquet.PARQUET_DIR, "_state.json")
+    activity_parquet.compact(before="2024-03-02")
+    os.remove(state_path)  # Abbruch nach den Partitionen, vor dem Stand
+
+    assert activity_parquet.compact(before="2024-03-02")["events"] == 4
+    assert len(_compacted()) == 4
+
+
+def test_incremental_then_rotated_segment_is_not_duplicated(log_file):
+    _write(log_file, "01", 4)
+    activity_parquet.compact(before="2024-03-02")
+    # weitere Events desselben Tages, dann Rotation: der schon kompaktierte Anfang wird übersprungen
+    _write(log_file, "01", 3, start=4)
+    activity_segments.rotate(log_file)
+    _write(log_file, "02", 2)
+
+    result = activity_parquet.compact(before="2024-03-03")
+    assert result["events"] == 5
+    assert _compacted() == [("2024-03-01", i) for i in range(7)] + [("2024-03-02", 0), ("2024-03-02", 1)]
+
+    assert activity_parquet.compact(before="2024-03-03")["events"] == 0
+    assert len(_compacted()) == 9
+
+
+def test_load_events_merges_parquet_and_tail(log_file):
+    _write(log_file, "01", 3)
+    activity_parquet.compact(before="2024-03-02")
+    _write(log_file, "02", 2)
+
+    df = activity_parquet.load_events("2024-03-01", "2024-03-02", columns=["i", "customer_id"])
+    assert list(df.columns) == ["i", "customer_id"]
+    assert list(df["i"]) == [0, 1, 2, 0, 1]
+    assert list(activity_parquet.load_events("2024-03-02")["i"]) == [0, 1]
+    shutil.rmtree(activity_parquet.PARQUET_DIR)
+    assert len(activity_parquet.load_events()) == 5
@@ -0,0 +1,108 @@
+# test_activity_segments.py
+
+import gzip
+import json
+import os
+from datetime import date, datetime, timezone
+
+import pytest
+
+from agent import activity_segments as segments
+
+
+@pytest.fixture
+def log_file(monkeypatch, tmp_path):
+    monkeypatch.setattr(segments, "LOG_ROTATE", "both")
+    monkeypatch.setattr(segments, "LOG_MAX_BYTES", 10 ** 9)
+    monkeypatch.setattr(segments, "RETENTION_DAYS", 0)
+    return str(tmp_path / "activity_log.jsonl")
+
+
+def _write(log_file, *events, tail=b""):
+    with open(log_file, "ab") as f:
+        for event in events:
+            f.write((json.dumps(event) + "\n").encode("utf-8"))
+        f.write(tail)
+
+
+def _event(ts, type="task_run", customer_id="kunde-a"):
+    return {"timestamp": ts, "type": type, "customer_id": customer_id}
+
+
+def test_rotate_writes_segment_and_manifest(log_file):
+    _write(
+        log_file,
+        _event("2024-03-01T10:00:00"),
+        _event("2024-03-01T12:00:00", type="usage", customer_id="kunde-b"),
+        tail=b'{"timestamp": "2024-03-01T13:',  # abgerissene Zeile
+    )
+    seg = segments.rotate(log_file)
+
+    assert not os.path.exists(log_file)
+    assert segments.load_manifest(log_file) == [seg]
+    assert (seg["min_ts"], seg["max_ts"], seg["count"]) == ("2024-03-01T10:00:00", "2024-03-01T12:00:00", 2)
+    assert seg["types"] == {"task_run": 1, "usage": 1}
+    assert seg["customers"] == ["kunde-a", "kunde-b"]
+    with gzip.open(segments.segment_path(log_file, seg), "rb") as f:
+        assert [json.loads(line)["timestamp"] for line in f] == ["2024-03-01T10:00:00", "2024-03-01T12:00:00"]
+
+    assert segments.rotate(log_file) is None  # kein aktives Log
+
+
+def test_needs_rotation_by_day_and_size(log_file, monkeypatch):
+    assert not segments.needs_rotation(log_file)
+    _write(log_file, _event("2024-03-01T23:59:00"))
+    assert not segments.needs_rotation(log_file, today="2024-03-01")
+    assert segments.needs_rotation(log_file, today="2024-03-02")
+
+    monkeypatch.setattr(segments, "LOG_ROTATE", "size")
+    assert not segments.needs_rotation(log_file, today="2024-03-02")
+    monkeypatch.setattr(segments, "LOG_MAX_BYTES", 10)
+    assert segments.needs_rotation(log_file)
+    monkeypatch.setattr(segments, "LOG_ROTATE", "off")
+    assert not segments.needs_rotation(log_file)
+
+
+def test_bounds():
+    assert segments.bounds() == (None, None)
+    # reine Datumsangaben schließen den Endtag ein
+    assert segments.bounds("2024-03-01", "2024-03-02") == ("2024-03-01", "2024-03-03")
+    assert segments.bounds(date(2024, 3, 1), date(2024, 3, 1)) == ("2024-03-01", "2024-03-02")
+    assert segments.bounds(datetime(2024, 3, 1, 12, tzinfo=timezone.utc), "2024-03-01T14:00:00Z") == (
+        "2024-03-01T12:00:00", "2024-03-01T14:00:00")
+    with pytest.raises(ValueError):
+        segments.bounds("gestern")
+
+
+def test_select_by_period_type_and_customer(log_file):
+    for day, type, customer in (("01", "task_run", "kunde-a"), ("02", "usage", "kunde-b"), ("03", "task_run", "kunde-b")):
+        _write(log_file, _event(f"2024-03-{day}T08:00:00", type, customer), _event(f"2024-03-{day}T18:00:00", type, customer))
+        segments.rotate(log_file)
+    manifest = segments.load_manifest(log_file)
+
+    def days(lo_hi=(None, None), **kw):
+        return [s["min_ts"][8:10] for s in segments.select(manifest, *lo_hi, **kw)]
+
+    assert days() == ["01", "02", "03"]
+    assert days(segments.bounds("2024-03-02", "2024-03-02")) == ["02"]
+    assert days(segments.bounds("2024-03-01T19:00:00", None)) == ["02", "03"]
+    assert days(segments.bounds(None, "2024-03-01T08:00:00")) == []
+    assert days(type="task_run") == ["01", "03"]
+    assert days(customer_id="kunde-b") == ["02", "03"]
+    assert days(segments.bounds("2024-03-02", None), type="task_run", customer_id="kunde-a") == []
+
+
+def test_retention_archives_old_segments(log_file, monkeypatch, tmp_path):
+    for day in ("01", "02"):
+        _write(log_file, _event(f"2024-03-{day}T08:00:00"))
+        segments.rotate(log_file)
+    old, new = segments.load_manifest(log_file)
+    now = datetime(2024, 3, 11, 20, tzinfo=timezone.utc)  # Grenze: 01.03. 20:00
+
+    archive = tmp_path / "archiv"
+    monkeypatch.setattr(segments, "ARCHIVE_DIR", str(archive))
+    with segments.log_lock(log_file):
+        assert segments._retention_locked(log_file, days=10, now=now) == [old["file"]]
+    assert segments.load_manifest(log_file) == [new]
+    assert (archive / old["file"]).exists()
+    assert not os.path.exists(segments.segment_path(log_file, old))
@@ -0,0 +1,68 @@
+# test_llm_cache.py
+
+from agent import llm_cache
+
+
+def _setup(monkeypatch, tmp_path, ttl=3600):
+    events = []
+    monkeypatch.setattr(llm_cache, "log_event", events.append)
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache.LLMResponseCache(str(tmp_path / "cache.sqlite"), ttl=ttl))
+    return events
+
+
+def test_miss_then_hit(monkeypatch, tmp_path):
+    events = _setup(monkeypatch, tmp_path)
+    key, entry = llm_cache.lookup("gpt-4o", {"temperature": 0}, "Hallo", task="seo_audit")
+    assert key and entry is None
+
+    llm_cache.store(key, "gpt-4o", "Antwort", {"input_tokens": 12, "output_tokens": 34})
+    key2, entry = llm_cache.lookup("gpt-4o", {"temperature": 0}, "Hallo", task="seo_audit")
+    assert key2 == key
+    assert entry == {"response": "Antwort", "usage": {"input_tokens": 12, "output_tokens": 34}}
+
+    assert [e["cache_hit"] for e in events] == [False, True]
+    assert events[1]["saved_output_tokens"] == 34
+
+
+def test_key_depends_on_model_params_and_prompt(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path)
+    key, _ = llm_cache.lookup("gpt-4o", {"temperature": 0}, [{"role": "user", "content": "x"}])
+    llm_cache.store(key, "gpt-4o", "Antwort")
+
+    assert llm_cache.lookup("gpt-4o-mini", {"temperature": 0}, [{"role": "user", "content": "x"}])[1] is None
+    assert llm_cache.lookup("gpt-4o", {"temperature": 1}, [{"role": "user", "content": "x"}])[1] is None
+    assert llm_cache.lookup("gpt-4o", {"temperature": 0}, [{"role": "user", "content": "y"}])[1] is None
+
+
+def test_expired_entry_is_a_miss(monkeypatch, tmp_path):
+    _setup(monkeypatch, tmp_path, ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    key, _ = llm_cache.lookup("gpt-4o", {}, "Hallo")
+    llm_cache.store(key, "gpt-4o", "Antwort")
+
+    now[0] += 59
+    assert llm_cache.lookup("gpt-4o", {}, "Hallo")[1] is not None
+    now[0] += 2
+    assert llm_cache.lookup("gpt-4o", {}, "Hallo")[1] is None
+
+
+def test_lru_eviction(tmp_path):
+    cache = llm_cache.LLMResponseCache(str(tmp_path / "cache.sqlite"), ttl=0, max_entries=2)
+    cache.set("a", "m", "A")
+    cache.set("b", "m", "B")
+    assert cache.get("a") is not None  # a zuletzt genutzt → b fliegt
+    cache.set("c", "m", "C")
+    assert cache.get("b") is None
+    assert cache.get("a")["response"] == "A"
+    assert cache.get("c")["response"] == "C"
+
+
+def test_bypass(monkeypatch, tmp_path):
+    events = _setup(monkeypatch, tmp_path)
+    assert llm_cache.lookup("gpt-4o", {}, "Hallo", use_cache=False) == (None, None)
+    llm_cache.store(None, "gpt-4o", "Antwort")  # no-op
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", False)
+    assert llm_cache.lookup("gpt-4o", {}, "Hallo") == (None, None)
+    assert events == []
@@ -0,0 +1,48 @@
+# test_llm_gateway.py
+
+import pytest
+
+from agent.llm_gateway import TokenBucket
+
+
+def test_starts_full_and_drains():
+    bucket = TokenBucket(60)  # 1 Token pro Sekunde
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.consume(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(10, now) == pytest.approx(10.0)
+
+
+def test_refills_linearly_up_to_capacity():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    bucket.consume(60)
+    assert bucket.wait_time(5, now + 5) == 0.0
+    assert bucket.level == pytest.approx(5.0)
+    bucket.wait_time(1, now + 1000)
+    assert bucket.level == pytest.approx(60.0)
+
+
+def test_oversized_request_is_capped_at_capacity():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    assert bucket.wait_time(500, now) == 0.0  # würde sonst nie passen
+    bucket.consume(500)
+    assert bucket.level == pytest.approx(0.0)
+    assert bucket.wait_time(500, now) == pytest.approx(60.0)
+
+
+def test_refund_does_not_exceed_capacity():
+    bucket = TokenBucket(60)
+    bucket.consume(10)
+    bucket.refund(4)
+    assert bucket.level == pytest.approx(54.0)
+    bucket.refund(100)
+    assert bucket.level == pytest.approx(60.0)
+
+
+def test_minimum_capacity_is_one():
+    bucket = TokenBucket(0)
+    assert bucket.capacity == 1.0
+    assert bucket.rate == pytest.approx(1 / 60)
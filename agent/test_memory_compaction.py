@@ -0,0 +1,64 @@
+# test_memory_compaction.py
+
+import json
+
+import pytest
+
+from agent import memory_compaction as mc
+from agent import memory_segments as ms
+
+
+@pytest.fixture(autouse=True)
+def memory_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(ms, "MEMORY_FOLDER", str(tmp_path))
+    monkeypatch.setattr(ms, "MEMORY_FSYNC", "never")
+    monkeypatch.setattr(mc, "MEMORY_KEEP_RAW", 3)
+    return tmp_path
+
+
+def _fill(n, size=10):
+    for i in range(n):
+        ms.append_entry("kunde", {"timestamp": f"2024-01-{i + 1:02d}", "content": f"{i:02d}" + "x" * (size - 2)})
+
+
+def test_everything_fits_in_chronological_order():
+    _fill(7)
+    assert mc.load_slice("kunde", 1000).split("\n\n") == [f"{i:02d}" + "x" * 8 for i in range(7)]
+
+
+def test_budget_keeps_newest_raw_entries():
+    _fill(7)
+    # 10 Tokens = 40 Zeichen → drei Einträge à 10 Zeichen + 2 Trenner
+    assert [s[:2] for s in mc.load_slice("kunde", 10).split("\n\n")] == ["04", "05", "06"]
+    assert mc.load_slice("kunde", 0) == ""
+
+
+def test_oversized_newest_entry_is_truncated():
+    _fill(1, size=100)
+    out = mc.load_slice("kunde", 5)
+    assert out.startswith("00xxx") and out.endswith(" …")
+    assert len(out) <= 20
+
+
+def test_summaries_replace_covered_entries(memory_folder):
+    _fill(6)
+    summary = {"from_idx": 0, "to_idx": 4, "from_ts": "2024-01-01", "to_ts": "2024-01-04",
+               "content": "Frühere Notizen", "created_at": "2024-02-01"}
+    (memory_folder / "kunde" / "summaries.jsonl").write_text(json.dumps(summary) + "\n", encoding="utf-8")
+
+    parts = mc.load_slice("kunde", 1000).split("\n\n")
+    assert parts[0] == "[Zusammenfassung 2024-01-01 – 2024-01-04, 4 Einträge]\nFrühere Notizen"
+    assert [p[:2] for p in parts[1:]] == ["04", "05"]
+
+
+def test_terminates_when_entries_are_missing(monkeypatch):
+    _fill(10)
+    real_read = mc.read_entries
+    # unlesbare Zeilen: jede Seite liefert einen Eintrag weniger als angefragt
+    monkeypatch.setattr(mc, "read_entries", lambda cid, start, stop: real_read(cid, start, stop)[1:])
+    parts = mc.load_slice("kunde", 1000).split("\n\n")
+    assert [p[:2] for p in parts] == ["02", "03", "05", "06", "08", "09"]
+
+    monkeypatch.setattr(mc, "count", lambda cid: 50)  # Index zwischendurch geschrumpft
+    monkeypatch.setattr(mc, "read_entries", real_read)
+    assert mc.load_slice("kunde", 1000) == ""
@@ -0,0 +1,136 @@
+# test_memory_segments.py
+
+import json
+import os
+
+import pytest
+
+from agent import memory_segments as ms
+
+
+@pytest.fixture(autouse=True)
+def memory_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(ms, "MEMORY_FOLDER", str(tmp_path))
+    monkeypatch.setattr(ms, "MEMORY_FSYNC", "never")
+    return tmp_path
+
+
+def _entry(content, ts):
+    return {"timestamp": ts, "content": content}
+
+
+def test_append_and_read(memory_folder):
+    for i in range(5):
+        idx, before, after = ms.append_entry("kunde", _entry(f"Notiz {i}", f"2024-01-0{i + 1}"))
+        assert idx == i and before != after
+
+    assert ms.count("kunde") == 5
+    assert [e["content"] for e in ms.read_entries("kunde", -2)] == ["Notiz 3", "Notiz 4"]
+    assert ms.read_entries("kunde", 1, 2)[0]["timestamps"] == ["2024-01-02"]
+    assert ms.list_customers() == ["kunde"]
+
+
+def test_new_segment_after_max_bytes(memory_folder, monkeypatch):
+    monkeypatch.setattr(ms, "SEGMENT_MAX_BYTES", 200)
+    for i in range(6):
+        ms.append_entry("kunde", _entry("x" * 40 + str(i), "2024-01-01"))
+    segments = sorted(fn for fn in os.listdir(memory_folder / "kunde") if fn.startswith("seg-"))
+    assert len(segments) == 3
+    assert [e["content"][-1] for e in ms.read_entries("kunde")] == list("012345")
+
+
+def test_torn_tail_is_ignored_and_repaired(memory_folder):
+    ms.append_entry("kunde", _entry("eins", "t1"))
+    folder = memory_folder / "kunde"
+    with open(folder / "seg-00001.jsonl", "ab") as f:
+        f.write(b'{"timestamp": "t2", "cont')  # Absturz vor der Indexzeile
+    with open(folder / "index.jsonl", "ab") as f:
+        f.write(b"[1,")
+
+    assert ms.count("kunde") == 1
+    ms.append_entry("kunde", _entry("zwei", "t3"))
+    assert [e["content"] for e in ms.read_entries("kunde")] == ["eins", "zwei"]
+
+
+def test_migrate_legacy_json(memory_folder):
+    legacy = memory_folder / "kunde.json"
+    legacy.write_text(json.dumps([_entry("alt 1", "t1"), "kein dict", _entry("alt 2", "t2")]), encoding="utf-8")
+    assert ms.list_customers() == ["kunde"]
+
+    assert [e["content"] for e in ms.read_entries("kunde")] == ["alt 1", "alt 2"]
+    assert not legacy.exists()
+    assert (memory_folder / "kunde.json.migrated").exists()
+
+    ms.append_entry("kunde", _entry("neu", "t3"))
+    assert ms.count("kunde") == 3
+
+
+def test_migrate_all(memory_folder):
+    for cid in ("a", "b"):
+        (memory_folder / f"{cid}.json").write_text(json.dumps([_entry(cid, "t")]), encoding="utf-8")
+    assert ms.migrate_all() == 2
+    assert ms.migrate_all() == 0
+    assert ms.read_entries("b")[0]["content"] == "b"
+
+
+def test_invalid_customer_id():
+    for cid in ("", "../x", ".versteckt"):
+        with pytest.raises(ValueError):
+            ms.append_entry(cid, _entry("x", "t"))
+
+
+def _write_legacy_segments(folder, contents):
+    """Stand vor der Deduplizierung: jeder Inhalt als eigener Eintrag, auch doppelte."""
+    folder.mkdir(parents=True)
+    offset = 0
+    with open(folder / "seg-00001.jsonl", "wb") as seg, open(folder / "index.jsonl", "w") as idx:
+        for i, content in enumerate(contents):
+            line = (json.dumps(_entry(content, f"t{i}")) + "\n").encode("utf-8")
+            seg.write(line)
+            idx.write(json.dumps([1, offset, len(line), f"t{i}", ms.content_hash(content)]) + "\n")
+            offset += len(line)
+
+
+def test_repeated_content_only_adds_timestamp(memory_folder):
+    first, _, _ = ms.append_entry("kunde", _entry("gleich", "t1"))
+    ms.append_entry("kunde", _entry("anders", "t2"))
+    again, before, after = ms.append_entry("kunde", _entry("  gleich ", "t3"))
+
+    assert again == first
+    assert before == after
+    assert ms.count("kunde") == 2
+    assert ms.read_entries("kunde")[0]["timestamps"] == ["t1", "t3"]
+
+
+def test_dedup_merges_and_reports(memory_folder):
+    _write_legacy_segments(memory_folder / "kunde", ["a", "b", "a", "c", "b"])
+    (memory_folder / "kunde" / "summaries.jsonl").write_text("{}\n")
+    generation = ms.generation("kunde")
+
+    dry = ms.dedup("kunde", dry_run=True)
+    assert (dry["entries_before"], dry["entries_after"]) == (5, 3)
+    assert dry["reclaimed_bytes"] > 0
+    assert ms.count("kunde") == 5  # dry_run ändert nichts
+
+    report = ms.dedup("kunde")
+    assert (report["entries_before"], report["entries_after"]) == (5, 3)
+    assert report["reclaimed_bytes"] > 0
+    entries = ms.read_entries("kunde")
+    assert [e["content"] for e in entries] == ["a", "b", "c"]
+    assert [e["timestamps"] for e in entries] == [["t0", "t2"], ["t1", "t4"], ["t3"]]
+    assert ms.generation("kunde") != generation
+    assert not (memory_folder / "kunde" / "summaries.jsonl").exists()
+
+    assert ms.dedup("kunde")["reclaimed_bytes"] == 0
+
+
+def test_reading_never_dedups_next_append_does(memory_folder):
+    _write_legacy_segments(memory_folder / "kunde", ["a", "a", "b"])
+    before = sorted(os.listdir(memory_folder / "kunde"))
+
+    assert ms.count("kunde") == 3
+    assert len(ms.read_entries("kunde")) == 3
+    assert sorted(os.listdir(memory_folder / "kunde")) == before
+
+    ms.append_entry("kunde", _entry("c", "t9"))
+    assert [e["content"] for e in ms.read_entries("kunde")] == ["a", "b", "c"]
@@ -0,0 +1,89 @@
+# test_pipeline.py
+
+import threading
+
+import pytest
+
+pipeline = pytest.importorskip("agent.pipeline")
+from agent import tracing
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    seen = {}
+    lock = threading.Lock()
+    started = []
+
+    def fake_run_agent(task, conversation_id=None, save_to_memory=False, **kwargs):
+        with lock:
+            seen[task] = {"conversation_id": conversation_id, **kwargs}
+        if task == "broken":
+            raise RuntimeError("kaputt")
+        return {"response": f"{task}-ergebnis", "questions": [], "conversation_id": conversation_id}
+
+    monkeypatch.setattr(pipeline, "run_agent", fake_run_agent)
+    monkeypatch.setattr(pipeline.conversation_store, "start", lambda *a, **k: started.append((a, k)))
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    seen["_started"] = started
+    return seen
+
+
+def test_param_precedence_shared_upstream_node(calls):
+    nodes = [
+        {"id": "audit", "task": "seo_audit"},
+        {"id": "opt", "task": "seo_optimization", "depends_on": ["audit"],
+         "params": {"zielgruppe": "knoten", "seo_summary": "manuell"}},
+    ]
+    params = {"zielgruppe": "gemeinsam", "seo_audit_summary": "gemeinsam", "seo_summary": "gemeinsam"}
+    out = pipeline.run_pipeline(nodes, params=params, merged_context="KONTEXT")
+
+    opt = calls["seo_optimization"]
+    assert opt["text"] == "KONTEXT"
+    assert opt["seo_audit_summary"] == "seo_audit-ergebnis"  # Upstream schlägt gemeinsame params
+    assert opt["seo_summary"] == "manuell"                   # Knoten-params schlagen Upstream
+    assert opt["zielgruppe"] == "knoten"
+    assert calls["seo_audit"]["zielgruppe"] == "gemeinsam"
+    assert [r["status"] for r in out["results"].values()] == ["ok", "ok"]
+
+
+def test_explicit_inputs(calls):
+    nodes = [
+        {"id": "topics", "task": "extract_topics"},
+        {"id": "write", "task": "content_write", "inputs": {"briefing": "topics"}},
+    ]
+    out = pipeline.run_pipeline(nodes, merged_context="")
+    assert calls["content_write"]["briefing"] == "extract_topics-ergebnis"
+    assert out["results"]["write"]["status"] == "ok"
+
+
+def test_own_conversation_per_node_and_one_pipeline_conversation(calls):
+    nodes = [{"id": "a", "task": "seo_audit"}, {"id": "b", "task": "seo_lighthouse"}]
+    out = pipeline.run_pipeline(nodes, merged_context="", conversation_id="pipe-1")
+
+    node_ids = {calls["seo_audit"]["conversation_id"], calls["seo_lighthouse"]["conversation_id"]}
+    assert len(node_ids) == 2 and "pipe-1" not in node_ids
+    assert out["conversation_id"] == "pipe-1"
+    assert [args[0] for args, _ in calls["_started"]] == ["pipe-1"]
+
+
+def test_failed_node_skips_dependents(calls):
+    nodes = [
+        {"id": "x", "task": "broken"},
+        {"id": "y", "task": "seo_optimization", "depends_on": ["x"]},
+        {"id": "z", "task": "seo_audit"},
+    ]
+    out = pipeline.run_pipeline(nodes, merged_context="")
+    assert out["results"]["x"]["status"] == "error"
+    assert out["results"]["y"]["status"] == "skipped"
+    assert out["results"]["z"]["status"] == "ok"
+    assert "seo_optimization" not in calls
+
+
+def test_invalid_graphs():
+    with pytest.raises(ValueError):
+        pipeline.run_pipeline([{"id": "a", "task": "t", "depends_on": ["b"]},
+                               {"id": "b", "task": "t", "depends_on": ["a"]}], merged_context="")
+    with pytest.raises(ValueError):
+        pipeline.run_pipeline([{"id": "a", "task": "t", "depends_on": ["fehlt"]}], merged_context="")
+    with pytest.raises(ValueError):
+        pipeline.run_pipeline([{"id": "a", "task": "t"}, {"id": "a", "task": "u"}], merged_context="")
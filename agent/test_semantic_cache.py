@@ -0,0 +1,64 @@
+# test_semantic_cache.py
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from agent import semantic_cache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    events = []
+    monkeypatch.setattr(semantic_cache, "log_event", events.append)
+    monkeypatch.setattr(semantic_cache, "CACHE_PATH", str(tmp_path / "semantic.sqlite"))
+    monkeypatch.setattr(semantic_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(semantic_cache, "CACHE_TTL", 3600)
+    return events
+
+
+def test_hit_for_close_question_miss_for_distant(cache):
+    semantic_cache.store([1.0, 0.0, 0.0], "docs", "qa", "Was kostet X?", "10 €", ["Und Y?"])
+
+    hit = semantic_cache.lookup([0.99, 0.05, 0.0], "docs", "qa", max_distance=0.05)
+    assert hit["response"] == "10 €"
+    assert hit["questions"] == ["Und Y?"]
+    assert hit["distance"] < 0.05
+
+    assert semantic_cache.lookup([0.0, 1.0, 0.0], "docs", "qa") is None
+    assert semantic_cache.lookup([1.0, 0.0, 0.0], "docs", "other_mode") is None
+    assert [e["cache_hit"] for e in cache] == [True, False, False]
+
+
+def test_expired_entries_are_misses(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    semantic_cache.store([1.0, 0.0], "docs", "qa", "Frage", "Antwort")
+
+    now[0] += 3600
+    assert semantic_cache.lookup([1.0, 0.0], "docs", "qa") is not None
+    now[0] += 1
+    assert semantic_cache.lookup([1.0, 0.0], "docs", "qa") is None
+
+
+def test_invalidation_and_stale_store(cache):
+    version = semantic_cache.collection_version("docs")
+    semantic_cache.store([1.0, 0.0], "docs", "qa", "Frage", "alt", version=version)
+    semantic_cache.invalidate_collection("docs")
+    assert semantic_cache.lookup([1.0, 0.0], "docs", "qa") is None
+
+    # Antwort gegen die alte Version erzeugt → wird verworfen
+    semantic_cache.store([1.0, 0.0], "docs", "qa", "Frage", "veraltet", version=version)
+    assert semantic_cache.lookup([1.0, 0.0], "docs", "qa") is None
+
+
+def test_broken_rows_are_skipped(cache):
+    semantic_cache.store([1.0, 0.0], "docs", "qa", "Frage", "Antwort")
+    with semantic_cache._connect() as conn:
+        conn.execute(
+            "INSERT INTO semantic_cache (collection, mode, version, question, embedding, response, created_at) "
+            "VALUES ('docs', 'qa', 0, 'kaputt', ?, 'x', ?), ('docs', 'qa', 0, 'alt', ?, 'y', ?)",
+            (b"\x00\x01\x02", semantic_cache.time.time(),
+             np.ones(3, dtype=np.float32).tobytes(), semantic_cache.time.time()),
+        )
+    assert semantic_cache.lookup([1.0, 0.0], "docs", "qa")["response"] == "Antwort"
@@ -3,6 +3,7 @@
 import os
 from agent.loader import load_pdf, load_html
 from agent.customer_memory import load_customer_memory
+from agent.memory_compaction import MEMORY_CONTEXT_TOKENS
 
 def get_context_from_text_or_url(text, url, customer_id=None, pdf_path=None):
     context_parts = []
@@ -25,7 +26,7 @@ def get_context_from_text_or_url(text, url, customer_id=None, pdf_path=None):
             context_parts.append(f"[Fehler beim Laden des PDFs: {e}]")
 
     if customer_id:
-        memory = load_customer_memory(customer_id)
+        memory = load_customer_memory(customer_id, token_budget=MEMORY_CONTEXT_TOKENS)
         if memory:
             context_parts.append(memory)
 
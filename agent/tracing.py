@@ -0,0 +1,294 @@
+# agent/tracing.py
+"""
+Leichtgewichtige Tracing-Spans für run_agent, Context Merger & externe Fetches.
+
+- span(name, **attrs): Context-Manager; Eltern-Span & Trace-ID laufen über contextvars mit
+  (verschachtelte Spans bilden automatisch einen Baum)
+- Export:
+  * JSONL (TRACE_FILE, Default .cache/traces.jsonl) – ein Datensatz pro beendetem Span,
+    Felder analog OpenTelemetry (trace_id, span_id, parent_id, name, start, duration_ms, status, attributes)
+    plus timestamp (ISO, UTC). Geschrieben wird gepuffert im Hintergrund (activity_log.BufferedWriter)
+    und rotiert wie das Activity-Log in gzip-Segmente (activity_segments, ACTIVITY_LOG_ROTATE/
+    ACTIVITY_LOG_MAX_BYTES/ACTIVITY_LOG_RETENTION_DAYS); load_spans() liest Segmente + aktive Datei
+  * OpenTelemetry: ist das opentelemetry-Paket installiert (und TRACE_OTEL nicht 0), wird jeder Span
+    zusätzlich über den global konfigurierten TracerProvider emittiert (z. B. OTLP-Exporter)
+- TRACING_ENABLED=0 schaltet alles ab (span() liefert dann einen No-op-Span)
+
+CLI:
+  python -m agent.tracing waterfall [--trace-id ID]   → Latenz-Wasserfall eines Runs (Default: letzter)
+  python -m agent.tracing phases [--root run_agent]   → p50/p95 je Phase über alle Runs
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from agent import activity_segments as segments
+    from agent.activity_log import BufferedWriter
+    from agent.stats import percentile, print_table
+except Exception:  # pragma: no cover
+    import activity_segments as segments
+    from activity_log import BufferedWriter
+    from stats import percentile, print_table
+
+try:  # optionaler OpenTelemetry-Export
+    from opentelemetry import trace as otel_trace  # type: ignore
+except Exception:  # pragma: no cover
+    otel_trace = None
+
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(".cache", "traces.jsonl"))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1").lower() not in ("0", "false", "no")
+TRACE_OTEL = os.getenv("TRACE_OTEL", "1").lower() not in ("0", "false", "no")
+
+_LOCK = threading.Lock()
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_otel_tracer = otel_trace.get_tracer("marketing-ki-agent") if (otel_trace is not None and TRACE_OTEL) else None
+
+
+class Span:
+    """Ein Zeitabschnitt innerhalb eines Traces."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start", "_t0", "duration_ms", "status", "error", "_otel")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]) -> None:
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._otel = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+        if self._otel is not None:
+            try:
+                self._otel.set_attribute(key, _otel_value(value))
+            except Exception:
+                pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "timestamp": datetime.fromtimestamp(self.start, timezone.utc).isoformat().replace("+00:00", "Z"),
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def _otel_value(value: Any) -> Any:
+    return value if isinstance(value, (str, bool, int, float)) else str(value)
+
+
+def _write_batch(items: List[tuple]) -> None:
+    """Ein write() pro Batch (O_APPEND), vorher ggf. Rotation – wie activity_log._write_batch."""
+    if not items:
+        return
+    data = "".join(line for line, _ in items).encode("utf-8")
+    with _LOCK, segments.log_lock(TRACE_FILE):
+        segments.maybe_rotate(TRACE_FILE)
+        fd = os.open(TRACE_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+
+_writer = BufferedWriter(_write_batch, "trace-writer")
+
+
+def _write(record: Dict[str, Any]) -> None:
+    try:
+        _writer.put((json.dumps(record, ensure_ascii=False, default=str) + "\n", None))
+    except Exception:
+        # Tracing darf den eigentlichen Lauf nie stören
+        pass
+
+
+def flush() -> None:
+    """Wartet, bis alle gepufferten Spans geschrieben sind."""
+    _writer.flush()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, *, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Span]:
+    """Misst den umschlossenen Block als Span.
+
+    parent: expliziter Eltern-Span (z. B. wenn ein Generator später in anderem Kontext läuft);
+    sonst der aktuelle Span aus dem contextvar.
+    """
+    parent = parent or _current.get()
+    s = Span(name, parent, {k: v for k, v in attributes.items() if v is not None})
+    if not TRACING_ENABLED:
+        yield s
+        return
+
+    otel_cm = None
+    if _otel_tracer is not None:
+        try:
+            otel_cm = _otel_tracer.start_as_current_span(name, attributes={k: _otel_value(v) for k, v in s.attributes.items()})
+            s._otel = otel_cm.__enter__()
+        except Exception:
+            otel_cm = None
+
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        if not isinstance(e, GeneratorExit):
+            s.status = "error"
+            s.error = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        s.duration_ms = round((time.perf_counter() - s._t0) * 1000, 2)
+        try:
+            _current.reset(token)
+        except ValueError:
+            # Token aus anderem Kontext (z. B. abgebrochener Stream-Generator)
+            _current.set(parent)
+        if otel_cm is not None:
+            try:
+                otel_cm.__exit__(None, None, None)
+            except Exception:
+                pass
+        _write(s.to_dict())
+
+
+# ---------------------------
+# Auswertung
+# ---------------------------
+def _parse_lines(lines: Any, spans: List[Dict[str, Any]]) -> None:
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            spans.append(json.loads(line))
+        except (ValueError, UnicodeDecodeError):
+            continue
+
+
+def load_spans(path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Alle Spans: rotierte Segmente (älteste zuerst), dann die aktive Datei."""
+    if path is None:
+        flush()
+    path = path or TRACE_FILE
+    spans: List[Dict[str, Any]] = []
+    for segment in segments.load_manifest(path):
+        try:
+            with segments.open_segment(path, segment) as f:
+                _parse_lines(f, spans)
+        except FileNotFoundError:
+            continue  # per Aufbewahrungsfrist entfernt
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            _parse_lines(f, spans)
+    return spans
+
+
+def waterfall(spans: List[Dict[str, Any]], trace_id: Optional[str] = None, width: int = 40) -> str:
+    """Textueller Latenz-Wasserfall eines Traces (Default: zuletzt beendeter Root-Span)."""
+    if trace_id is None:
+        roots = [s for s in spans if not s.get("parent_id")]
+        if not roots:
+            return "Keine Traces gefunden."
+        trace_id = roots[-1]["trace_id"]
+    items = [s for s in spans if s.get("trace_id") == trace_id]
+    if not items:
+        return f"Trace {trace_id} nicht gefunden."
+
+    children: Dict[Optional[str], List[Dict[str, Any]]] = defaultdict(list)
+    ids = {s["span_id"] for s in items}
+    for s in items:
+        # Eltern außerhalb des Traces (sollte nicht vorkommen) → als Root behandeln
+        children[s.get("parent_id") if s.get("parent_id") in ids else None].append(s)
+    for lst in children.values():
+        lst.sort(key=lambda s: s["start"])
+
+    t0 = min(s["start"] for s in items)
+    total_ms = max(s["start"] * 1000 + (s.get("duration_ms") or 0) for s in items) - t0 * 1000
+    scale = width / total_ms if total_ms > 0 else 0
+
+    rows: List[tuple] = []
+
+    def _walk(parent_id: Optional[str], depth: int) -> None:
+        for s in children.get(parent_id, []):
+            rows.append((depth, s))
+            _walk(s["span_id"], depth + 1)
+
+    _walk(None, 0)
+    label_w = max(len("  " * d + s["name"]) for d, s in rows)
+    lines = [f"Trace {trace_id} — {total_ms:.0f} ms"]
+    for depth, s in rows:
+        offset = int(((s["start"] - t0) * 1000) * scale)
+        length = max(1, int((s.get("duration_ms") or 0) * scale))
+        bar = (" " * offset + "█" * length)[:width].ljust(width)
+        flag = " ✗" if s.get("status") == "error" else ""
+        lines.append(f"{('  ' * depth + s['name']).ljust(label_w)}  {s.get('duration_ms') or 0:>9.1f} ms |{bar}|{flag}")
+    return "\n".join(lines)
+
+
+def phase_stats(spans: List[Dict[str, Any]], root: Optional[str] = None) -> List[Dict[str, Any]]:
+    """p50/p95/max je Span-Name über alle Runs (optional nur Traces mit bestimmtem Root-Span)."""
+    if root:
+        traces = {s["trace_id"] for s in spans if not s.get("parent_id") and s.get("name") == root}
+        spans = [s for s in spans if s.get("trace_id") in traces]
+    by_name: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    for s in spans:
+        by_name[s["name"]].append(float(s.get("duration_ms") or 0))
+        if s.get("status") == "error":
+            errors[s["name"]] += 1
+    return [
+        {
+            "phase": name,
+            "count": len(vals),
+            "p50_ms": round(percentile(vals, 50), 1),
+            "p95_ms": round(percentile(vals, 95), 1),
+            "max_ms": round(max(vals), 1),
+            "errors": errors[name],
+        }
+        for name, vals in sorted(by_name.items(), key=lambda x: -percentile(x[1], 95))
+    ]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Latenz-Auswertung der Tracing-Spans")
+    parser.add_argument("--file", default=None, help="JSONL-Datei (Default: TRACE_FILE)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_w = sub.add_parser("waterfall", help="Wasserfall eines Runs")
+    p_w.add_argument("--trace-id", default=None)
+    p_p = sub.add_parser("phases", help="p50/p95 je Phase")
+    p_p.add_argument("--root", default=None, help="nur Traces mit diesem Root-Span (z. B. run_agent)")
+    args = parser.parse_args()
+
+    data = load_spans(args.file)
+    if args.cmd == "waterfall":
+        print(waterfall(data, args.trace_id))
+    else:
+        print_table(phase_stats(data, args.root), "Keine Spans gefunden.")
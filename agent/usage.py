@@ -0,0 +1,123 @@
+# agent/usage.py
+"""
+Einheitliche Usage-Erfassung für alle LLM-Calls (Task, Context-Merger Planner/Executor, /ask).
+
+- extract_usage(resp): Prompt-, Completion- und gecachte Prompt-Tokens aus einer LangChain-Antwort
+  (usage_metadata bevorzugt, sonst response_metadata["token_usage"])
+- record_usage(...): Tokens + Latenz + Kosten (model_routing.estimate_cost) als "usage"-Event
+  über activity_log.log_usage – mit Task, Kunde, Conversation und Modell
+- timed_invoke(...): Gateway-Call messen und direkt erfassen (für Call-Sites ohne eigenen Cache)
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional
+
+try:
+    from agent.activity_log import log_usage
+except Exception:  # pragma: no cover
+    def log_usage(*args: Any, **kwargs: Any):
+        pass
+
+try:
+    from agent.model_routing import estimate_cost
+    from agent.llm_gateway import get_gateway
+except Exception:  # pragma: no cover
+    from model_routing import estimate_cost
+    from llm_gateway import get_gateway
+
+
+def extract_usage(resp: Any) -> Dict[str, int]:
+    """Prompt-/Completion-/gecachte Prompt-Tokens aus einer LangChain-Antwort (0, wenn nicht verfügbar).
+
+    cached_tokens: Teil der input_tokens, den der Provider aus seinem Prompt-Cache bedient hat.
+    """
+    usage = getattr(resp, "usage_metadata", None) or {}
+    token_usage = (getattr(resp, "response_metadata", None) or {}).get("token_usage") or {}
+    cached = (
+        (usage.get("input_token_details") or {}).get("cache_read")
+        or (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        or 0
+    )
+    if usage:
+        return {
+            "input_tokens": int(usage.get("input_tokens") or 0),
+            "output_tokens": int(usage.get("output_tokens") or 0),
+            "cached_tokens": int(cached),
+        }
+    return {
+        "input_tokens": int(token_usage.get("prompt_tokens") or 0),
+        "output_tokens": int(token_usage.get("completion_tokens") or 0),
+        "cached_tokens": int(cached),
+    }
+
+
+def record_usage(
+    usage: Dict[str, Any],
+    *,
+    task: Optional[str],
+    model: Optional[str],
+    latency_ms: Optional[int] = None,
+    customer_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Schreibt ein usage-Event und liefert die Felder zurück (für task_run/call_info).
+
+    usage: Ergebnis von extract_usage() (oder geschätzte Stream-Usage mit "estimated": True).
+    """
+    record: Dict[str, Any] = {
+        "input_tokens": int(usage.get("input_tokens") or 0),
+        "output_tokens": int(usage.get("output_tokens") or 0),
+        "cached_tokens": int(usage.get("cached_tokens") or 0),
+        "latency_ms": latency_ms,
+        "cost_usd": estimate_cost(
+            model,
+            int(usage.get("input_tokens") or 0),
+            int(usage.get("output_tokens") or 0),
+            int(usage.get("cached_tokens") or 0),
+        ),
+    }
+    try:
+        log_usage(
+            customer_id,
+            record["input_tokens"],
+            record["output_tokens"],
+            mode,
+            task=task,
+            conversation_id=conversation_id,
+            model=model,
+            cached_tokens=record["cached_tokens"],
+            latency_ms=latency_ms,
+            cost_usd=record["cost_usd"],
+            estimated=bool(usage.get("estimated")),
+        )
+    except Exception:
+        pass
+    return record
+
+
+def timed_invoke(
+    prompt: Any,
+    *,
+    task: str,
+    route: Dict[str, Any],
+    customer_id: Optional[str] = None,
+    conversation_id: Optional[str] = None,
+    mode: Optional[str] = None,
+) -> Any:
+    """Gateway-Call mit der Route eines Tasks; Usage/Latenz/Kosten werden erfasst."""
+    started = time.perf_counter()
+    resp = get_gateway().invoke(
+        prompt, model=route["model"], max_tokens=route["max_tokens"], temperature=route["temperature"]
+    )
+    record_usage(
+        extract_usage(resp),
+        task=task,
+        model=route["model"],
+        latency_ms=round((time.perf_counter() - started) * 1000),
+        customer_id=customer_id,
+        conversation_id=conversation_id,
+        mode=mode,
+    )
+    return resp
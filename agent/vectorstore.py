@@ -1,15 +1,11 @@
 # agent/vectorstore.py
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct
-
-import os
-
-client = QdrantClient(
-    url=os.getenv("QDRANT_URL"),
-    api_key=os.getenv("QDRANT_API_KEY")
-)
+from agent.clients import get_qdrant
+from agent.semantic_cache import invalidate_collection
 
 def upsert_chunks(chunks, collection_name="agent_chunks"):
+    from qdrant_client.http.models import PointStruct
+
+    client = get_qdrant()
     if not client.collection_exists(collection_name=collection_name):
         client.create_collection(
             collection_name=collection_name,
@@ -23,3 +19,5 @@ def upsert_chunks(chunks, collection_name="agent_chunks"):
         points.append(PointStruct(id=i, vector=embedding, payload=payload))
 
     client.upsert(collection_name=collection_name, points=points)
+    # Gecachte Antworten beziehen sich auf den alten Collection-Inhalt
+    invalidate_collection(collection_name)
@@ -4,7 +4,8 @@ set -e
 echo "✅ Starte FastAPI (Uvicorn) auf Port 8000"
 uvicorn agent.api:app \
     --host 0.0.0.0 \
-    --port 8000 &
+    --port 8000 \
+    --workers "${API_WORKERS:-1}" &
 
 echo "✅ Starte Streamlit auf Port 8080"
 streamlit run streamlit_app.py \
@@ -14,7 +14,6 @@ import streamlit as st
 import random
 import string
 import pandas as pd
-from collections import Counter
 
 from agent.context_merger import ContextMerger
 from agent.customer_memory import (
@@ -25,10 +24,11 @@ from agent.customer_memory import (
 )
 from agent.loader import load_pdf
 from agent.activity_log import (
-    get_events,
+    iter_events,
     log_event,
 )
-from agent.base_agent import run_agent
+from agent.activity_rollups import get_rollups
+from agent.base_agent import run_agent, stream_agent
 
 load_dotenv()
 
@@ -82,35 +82,31 @@ page = st.sidebar.selectbox("Ansicht wählen:", ["🎯 User-Tasks", "⚙️ Admi
 # ===============================
 if page == "⚙️ Admin-Dashboard":
     st.title("⚙️ Admin-Dashboard")
-    try:
-        df = pd.DataFrame(get_events())
-    except Exception:
-        df = pd.DataFrame(columns=["type","timestamp","customer_id","task","rating","comment","mode","input_tokens","output_tokens"]) 
+    # Aggregate werden beim Schreiben fortgeschrieben (agent/activity_rollups.py) → kein Scan über alle Events
+    rollups = get_rollups()
+    customers = rollups.customers()
 
     st.subheader("🔹 Kunden-Übersicht")
-    if not df.empty:
-        customers = sorted(set(df[df["customer_id"].notna()]["customer_id"]))
-        tasks_df = df[df["type"] == "task_run"]
-        feedback = df[df["type"] == "rating"]
-        usage   = df[df["type"] == "usage"]
-
+    if customers or rollups.usage_summary():
         st.write("Anzahl Kunden:", len(customers))
-        words = Counter()
-        if not feedback.empty:
-            for c in feedback["comment"].dropna().astype(str):
-                for w in c.lower().split():
-                    words[w] += 1
-            st.write("Top 5 Feedback-Begriffe:", words.most_common(5))
+        usage_by_task = rollups.usage_summary(group_by="task")
+        if usage_by_task:
+            st.write("LLM-Kosten gesamt (USD):", round(rollups.total_cost(), 4))
+            st.write("Usage pro Task", pd.DataFrame(usage_by_task).set_index("task"))
+        top_terms = rollups.top_terms(5)
+        if top_terms:
+            st.write("Top 5 Feedback-Begriffe:", top_terms)
         else:
             st.info("Noch kein Feedback vorhanden.")
 
         st.subheader("🔍 Details pro Kunde")
         for cid in customers:
             with st.expander(f"Kunde {cid}"):
-                st.write("Letzte Tasks", tasks_df[tasks_df["customer_id"] == cid][['task','timestamp']])
-                st.write("Token Usage", usage[usage["customer_id"] == cid][['input_tokens','output_tokens','timestamp']])
-                st.write("Feedback", feedback[feedback["customer_id"] == cid][['rating','comment','timestamp']])
-                st.write("Rohes Log", df[df["customer_id"] == cid])
+                st.write("Tasks pro Tag (letzte 14 Tage mit Aktivität)", pd.DataFrame(rollups.tasks_per_day(cid, days=14)))
+                st.write("Token Usage pro Modell", pd.DataFrame(rollups.usage_summary(cid, group_by="model")))
+                st.write("Bewertungen", rollups.rating_histogram(cid))
+                if st.checkbox("Rohes Log laden", key=f"raw_log_{cid}"):
+                    st.write(pd.DataFrame(list(iter_events(customer_id=cid))))
     else:
         st.info("Noch keine Events vorhanden.")
     st.stop()
@@ -315,17 +311,26 @@ if st.button("🤖 KI Agent starten"):
         "customer_id": customer_id,
     })
     try:
-        result = run_agent(
+        # Tokens live anzeigen, statt bis zur kompletten Antwort zu warten
+        live = st.empty()
+        streamed = ""
+        result = {}
+        for event in stream_agent(
             task=task_id,
             reasoning_mode=mode,
             conversation_id=st.session_state.get("conv_id"),
             clarifications={},
             **params
-        )
-        st.session_state.response = result.get("response", "")
+        ):
+            if event["type"] == "token":
+                streamed += event["content"]
+                live.markdown(streamed + "▌")
+            elif event["type"] == "final":
+                result = event
+        live.empty()  # Ergebnis wird unten im "✨ Ergebnis"-Block gerendert
+        st.session_state.response = result.get("response", streamed)
         st.session_state.questions = result.get("questions", [])
         st.session_state.conv_id = result.get("conversation_id")
-        log_event({"type":"task_run","customer_id": customer_id, "task": task_id})
         st.success("Task abgeschlossen.")
     except Exception as e:
         st.error(f"Fehler beim Agentenlauf: {e}")
@@ -351,7 +356,7 @@ if st.session_state.get('response'):
             q = st.text_input("🔎 Im Gedächtnis suchen")
             if st.button("Suchen") and q:
                 try:
-                    res = run_agent(task="memory_search", reasoning_mode="deep", query=q)
+                    res = run_agent(task="memory_search", reasoning_mode="deep", query=q, customer_id=customer_id)
                     st.write(res.get("response","–"))
                 except Exception as e:
                     st.error(f"Fehler bei der Suche: {e}")
@@ -372,12 +377,13 @@ if st.session_state.get('response'):
                     "customer_id": customer_id,
                 })
                 try:
+                    # Nur Rückfrage + Antwort gehen raus; Verlauf kommt aus dem conversation_store
+                    # (params dienen nur als Fallback, falls kein Verlauf mehr existiert)
                     result = run_agent(
                         task=selected_task,
                         reasoning_mode=mode,
                         conversation_id=st.session_state.get("conv_id"),
-                        follow_up=ans,
-                        is_follow_up=True,
+                        follow_up=f"Rückfrage: {q}\nAntwort: {ans}",
                         **params
                     )
                     st.session_state["response"] += (